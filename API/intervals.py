@@ -0,0 +1,122 @@
+"""
+A static interval tree over the date intervals of events, answering "which
+events overlap this range" for the read API's date filters (see API/snapshot.py).
+
+Each node holds the intervals that contain its center (the median start of the
+intervals below it); those ending before the center go to its left subtree and
+those starting after it to its right subtree. A node's intervals are kept
+sorted by start and by end, so the events overlapping a range [first, last] are:
+    last < center     the node's intervals starting on or before `last`, then the left subtree
+    first > center    the node's intervals ending on or after `first`, then the right subtree
+    otherwise         all the node's intervals, then both subtrees
+each found with one binary search. Intervals are laid out in pre-order, so a
+subtree lying entirely inside the range is returned as one slice, and a subtree
+entirely outside it is skipped. Every node holds at least one interval (its
+center is the start of one), so a query costs O(log n + k) for k matches.
+
+Usage:
+    index = IntervalIndex(starts, ends)               # int64 day numbers, one pair per event
+    numbers = index.overlapping(first_day, last_day)  # either bound may be None
+"""
+import numpy as np
+
+# Bounds of an open-ended query
+_FIRST_DAY = np.iinfo(np.int64).min
+_LAST_DAY = np.iinfo(np.int64).max
+
+
+class IntervalIndex:
+    """The tree over one set of intervals (see the module docstring)."""
+
+    def __init__(self, starts, ends, numbers=None):
+        """
+        Parameters:
+            starts (ndarray): The start of each interval (int64, e.g. day numbers).
+            ends (ndarray): The end of each interval (not before its start).
+            numbers (ndarray): The number returned for each interval (defaults to its position).
+        """
+        starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        numbers = np.arange(len(starts), dtype=np.int32) if numbers is None else np.asarray(numbers, dtype=np.int32)
+        count = len(starts)
+        # Pre-order layout: a node's own intervals, then its left subtree, then its right subtree.
+        # Within a node's own segment the start_* arrays are sorted by start and the end_* arrays by end.
+        self.start_values, self.start_numbers = np.empty(count, np.int64), np.empty(count, np.int32)
+        self.end_values, self.end_numbers = np.empty(count, np.int64), np.empty(count, np.int32)
+        # Per node: center, its own segment [low, middle), its subtree [low, high), children (-1 if none),
+        # and the earliest and latest start and end in its subtree (to return or skip it whole)
+        self.centers, self.lows, self.middles, self.highs, self.lefts, self.rights = [], [], [], [], [], []
+        self.earliest_starts, self.latest_starts, self.earliest_ends, self.latest_ends = [], [], [], []
+
+        pending = [(np.arange(count), 0, None, None)] if count else []
+        while pending:
+            members, low, parent, side = pending.pop()
+            node = len(self.centers)
+            if parent is not None:
+                (self.lefts if side == 'left' else self.rights)[parent] = node
+            member_starts, member_ends = starts[members], ends[members]
+            center = int(np.sort(member_starts)[len(members) // 2])
+            here = members[(member_starts <= center) & (member_ends >= center)]
+            before = members[member_ends < center]
+            after = members[member_starts > center]
+
+            middle = low + len(here)
+            by_start = here[np.argsort(starts[here], kind='stable')]
+            by_end = here[np.argsort(ends[here], kind='stable')]
+            self.start_values[low:middle], self.start_numbers[low:middle] = starts[by_start], numbers[by_start]
+            self.end_values[low:middle], self.end_numbers[low:middle] = ends[by_end], numbers[by_end]
+
+            self.centers.append(center)
+            self.lows.append(low)
+            self.middles.append(middle)
+            self.highs.append(low + len(members))
+            self.lefts.append(-1)
+            self.rights.append(-1)
+            self.earliest_starts.append(int(member_starts.min()))
+            self.latest_starts.append(int(member_starts.max()))
+            self.earliest_ends.append(int(member_ends.min()))
+            self.latest_ends.append(int(member_ends.max()))
+            if len(before):
+                pending.append((before, middle, node, 'left'))
+            if len(after):
+                pending.append((after, middle + len(before), node, 'right'))
+
+    def __len__(self):
+        return len(self.start_numbers)
+
+    def overlapping(self, first=None, last=None):
+        """
+        Finds the intervals overlapping a range (both bounds inclusive).
+        Parameters:
+            first (int): The first day of the range (None for no lower bound).
+            last (int): The last day of the range (None for no upper bound).
+        Returns:
+            ndarray: The numbers of the overlapping intervals (int32, in no particular order).
+        """
+        first = _FIRST_DAY if first is None else int(first)
+        last = _LAST_DAY if last is None else int(last)
+        parts = []
+        pending = [0] if self.centers else []
+        while pending:
+            node = pending.pop()
+            if self.earliest_starts[node] > last or self.latest_ends[node] < first:
+                # No interval in the subtree overlaps the range
+                continue
+            low, middle = self.lows[node], self.middles[node]
+            if self.latest_starts[node] <= last and self.earliest_ends[node] >= first:
+                # Every interval in the subtree overlaps the range
+                parts.append(self.start_numbers[low:self.highs[node]])
+                continue
+            center = self.centers[node]
+            if last < center:
+                found = int(np.searchsorted(self.start_values[low:middle], last, side='right'))
+                parts.append(self.start_numbers[low:low + found])
+                children = (self.lefts[node],)
+            elif first > center:
+                found = int(np.searchsorted(self.end_values[low:middle], first, side='left'))
+                parts.append(self.end_numbers[low + found:middle])
+                children = (self.rights[node],)
+            else:
+                parts.append(self.start_numbers[low:middle])
+                children = (self.lefts[node], self.rights[node])
+            pending.extend(child for child in children if child >= 0)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
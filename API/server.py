@@ -0,0 +1,202 @@
+"""
+Read-only HTTP API over the cleaned events, served from an in-memory snapshot
+(see API/snapshot.py) in one process.
+
+Endpoints:
+    GET /events     The events, in pages. Filters: location (resolved suburb or
+                    region), state, source, from and to (ISO dates; events
+                    overlapping the range). Paging: limit and cursor (the
+                    next_cursor of the previous page).
+    GET /health     The snapshot's version, size and load time.
+
+Responses carry an ETag made of the snapshot's version and the request's query,
+so a client repeating a request with If-None-Match gets a 304 until the data
+changes. Every response is built from the snapshot's pre-encoded events.
+
+The server watches the cleaned file (the newer of cleaned_combined_data.json
+and .parquet, as insert_events.py loads) and, once a new version has stopped
+changing, builds a snapshot of it in a worker thread and swaps it in. Requests
+keep being served from the old snapshot while the new one is built, and each
+request reads one snapshot from start to end. A file that cannot be read is
+reported and the old snapshot is kept.
+
+Usage:
+    python API/server.py                                  Serve on 127.0.0.1:8080
+    python API/server.py --port 9000 --host 0.0.0.0
+    python API/server.py --file /path/to/events.json      Serve another file (still watched)
+
+    curl 'http://127.0.0.1:8080/events?state=NSW&from=2024-10-01&to=2024-10-31&limit=20'
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+
+from aiohttp import web
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.combine import newest_file
+from API.snapshot import InvalidCursor, InvalidDate, Query, load_snapshot
+
+SQL_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SQL')
+
+# The cleaner's outputs, newest first (see Cleaner/combine.newest_file)
+CLEANED_FILES = [os.path.join(SQL_DIRECTORY, 'cleaned_combined_data.json'),
+                 os.path.join(SQL_DIRECTORY, 'cleaned_combined_data.parquet')]
+
+HOST = '127.0.0.1'
+PORT = 8080
+
+# Seconds between checks of the cleaned file; a new version is loaded once it is
+# unchanged over one interval (the cleaner may still be writing it)
+WATCH_INTERVAL = 2.0
+
+# Events per page when the request does not set a limit, and the largest limit allowed
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Query parameters of /events, and the Query field each one sets
+FILTERS = {'location': 'location', 'state': 'state', 'source': 'source', 'from': 'date_from', 'to': 'date_to'}
+
+JSON_HEADERS = {'Content-Type': 'application/json; charset=utf-8', 'Cache-Control': 'no-cache'}
+
+
+def _error(status, message):
+    return web.Response(status=status, body=json.dumps({'error': message}).encode('utf-8'), headers=JSON_HEADERS)
+
+
+class EventService:
+    """The current snapshot, and the watcher that replaces it when the cleaned file changes."""
+
+    def __init__(self, paths=CLEANED_FILES, watch_interval=WATCH_INTERVAL):
+        """
+        Parameters:
+            paths (list): Files holding the same data in different formats; the newest is served.
+            watch_interval (float): Seconds between checks of the files.
+        """
+        self.paths = paths
+        self.watch_interval = watch_interval
+        self.snapshot = None
+        self.loaded_at = None
+        self.signature = None
+
+    def file_signature(self):
+        """Returns (path, modification time, size) of the file to serve, or None if there is none."""
+        path = newest_file(self.paths)
+        try:
+            status = os.stat(path)
+        except OSError:
+            return None
+        return path, status.st_mtime_ns, status.st_size
+
+    def load(self, signature):
+        """Builds a snapshot of the file described by a signature and swaps it in."""
+        start_time = time.perf_counter()
+        snapshot = load_snapshot(signature[0])
+        # One reference assignment: a request sees either the old snapshot or the new one
+        self.snapshot, self.loaded_at, self.signature = snapshot, time.time(), signature
+        print(f"Serving {len(snapshot)} events from {signature[0]} (version {snapshot.version}, "
+              f"built in {time.perf_counter() - start_time:.2f}s)", flush=True)
+
+    async def watch(self):
+        """Reloads the snapshot whenever the cleaned file changes; runs until cancelled."""
+        loop = asyncio.get_running_loop()
+        pending = None
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            signature = self.file_signature()
+            if signature is None or signature == self.signature:
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last check: wait for the writer to finish
+                pending = signature
+                continue
+            try:
+                # Built off the event loop, so requests are served from the old snapshot meanwhile
+                await loop.run_in_executor(None, self.load, signature)
+            except Exception as e:
+                # Keep serving the old snapshot, and only retry once the file changes again
+                print(f"Could not load {signature[0]}: {e}; still serving version "
+                      f"{self.snapshot.version if self.snapshot else None}", flush=True)
+                self.signature = signature
+            pending = None
+
+    async def events(self, request):
+        snapshot = self.snapshot
+        parameters = request.query
+        etag = f'"{snapshot.version}-{hashlib.sha1(request.query_string.encode("utf-8")).hexdigest()[:16]}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            return web.Response(status=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+        try:
+            limit = int(parameters.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return _error(400, "limit must be a number")
+        if not 1 <= limit <= MAX_LIMIT:
+            return _error(400, f"limit must be between 1 and {MAX_LIMIT}")
+        query = Query(**{field: parameters[name] for name, field in FILTERS.items() if parameters.get(name)})
+        try:
+            page = snapshot.page(query, parameters.get('cursor'), limit)
+        except InvalidCursor:
+            return _error(400, "invalid cursor")
+        except InvalidDate as e:
+            return _error(400, f"invalid date {e}; dates are YYYY-MM-DD")
+
+        body = b''.join((b'{"events":[', b','.join(page.documents), b'],"next_cursor":',
+                         json.dumps(page.next_cursor).encode('ascii'), b',"total":', str(page.total).encode('ascii'),
+                         b',"version":"', snapshot.version.encode('ascii'), b'"}'))
+        return web.Response(body=body, headers=dict(JSON_HEADERS, ETag=etag))
+
+    async def health(self, request):
+        snapshot = self.snapshot
+        return web.json_response({'version': snapshot.version, 'events': len(snapshot),
+                                  'file': self.signature[0], 'loaded_at': self.loaded_at})
+
+
+def create_app(service):
+    """
+    Builds the web application.
+    Parameters:
+        service (EventService): A service with a snapshot loaded.
+    Returns:
+        web.Application: The application, which watches the cleaned file while it runs.
+    """
+    app = web.Application()
+    app.router.add_get('/events', service.events)
+    app.router.add_get('/health', service.health)
+
+    async def watch_files(app):
+        watcher = asyncio.ensure_future(service.watch())
+        yield
+        watcher.cancel()
+
+    app.cleanup_ctx.append(watch_files)
+    return app
+
+
+# Command-line options that take a value
+OPTIONS = ('--host', '--port', '--file')
+
+
+if __name__ == '__main__':
+    # A server is not a pipeline run, so no metrics are written
+    metrics.disable()
+    options = {}
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument not in OPTIONS:
+            raise SystemExit(f"Unknown option {argument}. Options: {', '.join(OPTIONS)}")
+        options[argument] = next(arguments, None)
+
+    service = EventService([os.path.abspath(options['--file'])] if options.get('--file') else CLEANED_FILES)
+    signature = service.file_signature()
+    if signature is None:
+        raise SystemExit(f"No cleaned events at {service.paths[0]}; run the cleaner (Cleaner/cleaner.py) first.")
+    service.load(signature)
+    web.run_app(create_app(service), host=options.get('--host') or HOST, port=int(options.get('--port') or PORT),
+                access_log=None, print=lambda message: print(message, flush=True))
@@ -0,0 +1,282 @@
+"""
+An immutable in-memory snapshot of the cleaned events, indexed for the read API
+(see API/server.py).
+
+Events are numbered in the order of their natural key (see events.NATURAL_KEY), and every
+index maps a value to a sorted numpy array of the numbers of the events that
+have it:
+    locations  resolved suburb or region, lowercased (see Cleaner/locations.py)
+    states     state abbreviation
+    sources    every source the event was found in
+Dated events are also kept in an interval tree (see API/intervals.py), which
+finds the events overlapping a date range without scanning the others.
+
+A query (any combination of filters) is answered by intersecting the index
+arrays and the date range, and its result is memoized per snapshot, so paging
+through a result only costs a binary search and a slice per page. Each event's JSON is encoded once, when
+the snapshot is built, and responses are assembled from those bytes.
+
+Pages are addressed by a cursor holding the natural key of the last event
+returned, so a cursor stays valid when the server swaps to a newer snapshot.
+
+Usage:
+    snapshot = load_snapshot('SQL/cleaned_combined_data.json')
+    page = snapshot.page(Query(state='NSW', date_from='2024-10-01'), limit=20)
+"""
+import os
+import re
+import sys
+import json
+import heapq
+import base64
+import hashlib
+import binascii
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Cleaner.combine import iter_events
+from events import NATURAL_KEY
+from API.intervals import IntervalIndex
+
+# Distinct queries whose matching events are memoized by each snapshot
+CACHE_SIZE = 256
+
+# Keys sorted per call when numbering the events (see sorted_positions)
+SORT_CHUNK_SIZE = 8192
+
+# Filters of the events endpoint; a None field does not filter
+Query = namedtuple('Query', ['location', 'state', 'source', 'date_from', 'date_to'], defaults=(None,) * 5)
+
+# One page of a query: the encoded events, the cursor of the next page (None on the
+# last page) and the number of events matching the query
+Page = namedtuple('Page', ['documents', 'next_cursor', 'total'])
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not issued by this API."""
+
+
+class InvalidDate(ValueError):
+    """A date filter that is not an ISO date (YYYY-MM-DD)."""
+
+
+def event_dates(event):
+    """
+    Returns the (start, end) ISO dates of an event: the cleaner's date_start and
+    date_end, else its scraped date if that is already ISO, else (None, None).
+    """
+    start = event.date_start or (event.date if isinstance(event.date, str) and _ISO_DATE.match(event.date) else None)
+    return start, event.date_end or start
+
+
+def parse_date(value):
+    """
+    Parameters:
+        value (str): An ISO date, or None.
+    Returns:
+        numpy.datetime64: The day, or NaT if the value is None or not a valid ISO date.
+    """
+    if isinstance(value, str) and _ISO_DATE.match(value):
+        try:
+            return np.datetime64(value, 'D')
+        except ValueError:
+            pass
+    return np.datetime64('NaT', 'D')
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Parameters:
+        cursor (str): A cursor from a previous page.
+    Returns:
+        tuple: The natural key and occurrence of the last event of that page.
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not (isinstance(key, list) and len(key) == len(NATURAL_KEY) + 1 and isinstance(key[-1], int)
+                and all(isinstance(value, str) for value in key[:-1])):
+            raise ValueError(cursor)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(cursor) from None
+    return tuple(key)
+
+
+def _index(index, name, position):
+    if isinstance(name, str) and name:
+        index.setdefault(name, []).append(position)
+
+
+def _arrays(index, numbers):
+    """Turns {value: positions in the file} into {value: sorted event numbers}."""
+    return {name: np.sort(numbers[positions]) for name, positions in index.items()}
+
+
+def sorted_positions(keys, chunk_size=SORT_CHUNK_SIZE):
+    """
+    Returns the positions of the keys in key order (equal keys in position order).
+    Chunks are sorted separately and merged in Python, so a snapshot built in a worker
+    thread never holds the GIL (and stalls requests) for more than one chunk's sort.
+    """
+    chunks = [sorted(range(start, min(start + chunk_size, len(keys))), key=keys.__getitem__)
+              for start in range(0, len(keys), chunk_size)]
+    return list(heapq.merge(*chunks, key=keys.__getitem__))
+
+
+class Snapshot:
+    """The events of one cleaned file and their indexes (see the module docstring)."""
+
+    def __init__(self, events, cache_size=CACHE_SIZE):
+        """
+        Parameters:
+            events (iterable): Event objects.
+            cache_size (int): Distinct queries whose matching events are memoized.
+        """
+        # One pass in file order, keeping only what is served and indexed (not the events)
+        keys, documents = [], []
+        locations, states, sources = {}, {}, {}
+        starts, ends = [], []
+        for position, event in enumerate(events):
+            # Strings only, so any two keys compare and every key fits in a cursor
+            keys.append(tuple(value if isinstance(value, str) else str(value) for value in event.key()))
+            documents.append(json.dumps(event.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            for name in dict.fromkeys((event.get('suburb'), event.get('region'))):
+                _index(locations, name.lower() if isinstance(name, str) else None, position)
+            _index(states, event.get('state'), position)
+            for source in event.sources or ([event.source] if event.source else []):
+                _index(sources, source, position)
+            start, end = event_dates(event)
+            starts.append(parse_date(start))
+            ends.append(parse_date(end))
+
+        # Number the events in natural key order
+        order = sorted_positions(keys)
+        numbers = np.empty(len(keys), dtype=np.int32)
+        numbers[order] = np.arange(len(keys), dtype=np.int32)
+        self.keys = []
+        occurrences = {}
+        for position in order:
+            # Sources sometimes list an event twice: the occurrence keeps every key unique
+            key = keys[position]
+            occurrence = occurrences[key] = occurrences.get(key, -1) + 1
+            self.keys.append(key + (occurrence,))
+        self.documents = [documents[position] for position in order]
+        digest = hashlib.sha1()
+        for document in self.documents:
+            digest.update(document)
+            digest.update(b'\n')
+
+        self.locations, self.states, self.sources = (_arrays(index, numbers) for index in (locations, states, sources))
+        starts = np.array(starts, dtype='datetime64[D]')[order]
+        # An end before the start (or an unreadable one) is treated as the start
+        ends = np.fmax(np.array(ends, dtype='datetime64[D]')[order], starts)
+        # Day numbers; an undated event starts after and ends before every day, so no range
+        # matches it (comparing integers is several times faster than datetime64 with NaT)
+        undated = np.isnat(starts)
+        self.starts = np.where(undated, np.iinfo(np.int64).max, starts.astype(np.int64))
+        self.ends = np.where(undated, np.iinfo(np.int64).min, ends.astype(np.int64))
+        dated = np.flatnonzero(~undated)
+        self.intervals = IntervalIndex(self.starts[dated], self.ends[dated], dated)
+
+        # Identifies the content: an unchanged dataset gets the same version (and ETags) when reloaded
+        self.version = digest.hexdigest()[:16]
+        # Memoized per snapshot (a method wrapped in lru_cache would share one cache between instances)
+        self.matches = lru_cache(maxsize=cache_size)(self._matches)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _overlap(self, numbers, first, last):
+        """Returns the events of `numbers` overlapping a range of day numbers (either end may be None)."""
+        if first is not None:
+            numbers = numbers[self.ends[numbers] >= first]
+        if last is not None:
+            numbers = numbers[self.starts[numbers] <= last]
+        return numbers
+
+    def _matches(self, query):
+        """
+        Finds the events matching every filter of a query (memoized as `matches`).
+        Parameters:
+            query (Query): The filters.
+        Returns:
+            numpy.ndarray: The numbers of the matching events, in ascending order.
+        Raises:
+            InvalidDate: If a date filter is not an ISO date.
+        """
+        empty = np.empty(0, dtype=np.int32)
+        candidates = []
+        if query.location:
+            candidates.append(self.locations.get(query.location.lower(), empty))
+        if query.state:
+            candidates.append(self.states.get(query.state.upper(), empty))
+        if query.source:
+            candidates.append(self.sources.get(query.source, empty))
+        bounds = None
+        if query.date_from or query.date_to:
+            bounds = []
+            for value in (query.date_from, query.date_to):
+                day = parse_date(value) if value else None
+                if day is not None and np.isnat(day):
+                    raise InvalidDate(value)
+                bounds.append(None if day is None else int(day.astype(np.int64)))
+        if not candidates:
+            if bounds is None:
+                return np.arange(len(self.documents), dtype=np.int32)
+            return np.sort(self.intervals.overlapping(*bounds))
+
+        # Filter the smallest index array by the others, then by the date range
+        candidates.sort(key=len)
+        matches = candidates[0]
+        for other in candidates[1:]:
+            member = np.zeros(len(self.documents), dtype=bool)
+            member[other] = True
+            matches = matches[member[matches]]
+        return self._overlap(matches, *bounds) if bounds is not None else matches
+
+    def page(self, query, cursor=None, limit=50):
+        """
+        Returns one page of the events matching a query, in natural key order.
+        Parameters:
+            query (Query): The filters.
+            cursor (str): The next_cursor of the previous page (None for the first page).
+            limit (int): Maximum number of events.
+        Returns:
+            Page: The page.
+        Raises:
+            InvalidCursor: If the cursor cannot be decoded.
+            InvalidDate: If a date filter is not an ISO date.
+        """
+        matches = self.matches(query)
+        start = 0
+        if cursor:
+            # The first event after the cursor's key, even if that event is not in this snapshot
+            start = int(np.searchsorted(matches, bisect_right(self.keys, decode_cursor(cursor))))
+        numbers = matches[start:start + limit].tolist()
+        documents = [self.documents[number] for number in numbers]
+        next_cursor = encode_cursor(self.keys[numbers[-1]]) if start + limit < len(matches) else None
+        return Page(documents, next_cursor, len(matches))
+
+
+def load_snapshot(file_path, cache_size=CACHE_SIZE):
+    """
+    Builds a snapshot of a file of cleaned events.
+    Parameters:
+        file_path (str): A JSON array, NDJSON or Parquet file of events.
+        cache_size (int): Distinct queries whose matching events are memoized.
+    Returns:
+        Snapshot: The snapshot.
+    """
+    return Snapshot(iter_events(file_path), cache_size)
@@ -0,0 +1,73 @@
+"""
+Checks that date standardization (Cleaner/dates.py) parses strings of one
+shape that need different formats, whatever order they come in and whatever
+was parsed before in the same process.
+
+"1 Sep" ('%d %b') and "12 October" ('%d %B') have the same shape, as do the
+other cases below. Each case is standardized in every order of its strings,
+both with no formats known yet and after a batch that only needs the first
+format, and the run fails (exit code 1) on any string that does not come out
+as its expected ISO date.
+
+Usage:
+    python Benchmarks/dates_check.py
+"""
+import os
+import sys
+from itertools import permutations
+
+import pandas as pd
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner import dates
+
+# Date the missing years are resolved against
+REFERENCE = '2024-09-01'
+
+# Each case: strings of one shape and their expected ISO dates, and a batch that
+# only needs the first of the formats (the strings its shape was first seen with)
+CASES = [
+    ({"1 Sep": '2024-09-01', "12 October": '2024-10-12', "20 October": '2024-10-20', "5 Oct": '2024-10-05'},
+     ["1 Sep", "2 Sep", "3 Sep", "4 Sep"]),
+    ({"Sun at 10:00 PM": '2024-09-01', "Monday at 9:30 AM": '2024-09-02', "Tue at 6:00 PM": '2024-09-03'},
+     ["Sun at 10:00 PM", "Mon at 10:00 PM", "Tue at 10:00 PM"]),
+    ({"Sunday, 20 October 2024": '2024-10-20', "Sun, 20 Oct 2024": '2024-10-20'},
+     ["Sun, 20 Oct 2024", "Mon, 21 Oct 2024", "Tue, 22 Oct 2024"]),
+]
+
+
+def reset_formats():
+    """Forgets the formats and unparsed strings of earlier calls."""
+    dates._format_cache.clear()
+    dates._unparsed_cache.clear()
+
+
+def check_case(expected, warm_up):
+    """Returns a description of every order (and cache state) in which a string came out wrong."""
+    problems = []
+    for order in permutations(expected):
+        for warmed in (False, True):
+            reset_formats()
+            if warmed:
+                dates.standardize_dates(pd.Series(warm_up, dtype=object), 'check', REFERENCE)
+            result = dates.standardize_dates(pd.Series(order, dtype=object), 'check', REFERENCE)
+            wrong = {value: iso for value, iso in zip(order, result) if iso != expected[value]}
+            if wrong:
+                problems.append(f"{list(order)}{' after ' + str(warm_up) if warmed else ''}: {wrong}")
+    return problems
+
+
+if __name__ == '__main__':
+    # A check is not a pipeline run, so no metrics are written
+    metrics.disable()
+    problems = []
+    for expected, warm_up in CASES:
+        case_problems = check_case(expected, warm_up)
+        print(f"{', '.join(expected)}: {'ok' if not case_problems else 'WRONG'}", flush=True)
+        problems.extend(case_problems)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,70 @@
+"""
+Checks that deduplication (Cleaner/dedup.py) treats records with the same
+title at least as strongly as records with similar titles.
+
+Each case lists records and the number of events they should clean to. The
+case is deduplicated directly, and cleaned incrementally after an incremental
+clean of only its first record (so the others are matched against stored
+clusters, as in Cleaner/incremental.py). The run fails (exit code 1) when any
+of them gives another number of events.
+
+Usage:
+    python Benchmarks/dedup_check.py
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import pandas as pd
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.cleaner import clean_event_data_incremental
+from Cleaner.dedup import deduplicate
+from Cleaner.incremental import CleanState
+
+# Each case: a description, the records and the number of events they are
+UNDATED = {'title': "Dog Day Out", 'location': "Centennial Park"}
+DATED = {'title': "Dog Day Out", 'location': "Centennial Park", 'date': '2024-10-12'}
+CASES = [
+    ("same title, one undated", [DATED, UNDATED], 1),
+    ("same title, one undated, plus a similar title", [DATED, UNDATED, dict(UNDATED, title="Dog Day Outs")], 1),
+    ("same title, different dates", [DATED, dict(DATED, date='2024-10-19')], 2),
+    ("same title, different places", [DATED, dict(DATED, location="Bondi Beach")], 2),
+]
+
+
+def incremental_events(records, directory):
+    """Cleans the first record incrementally, then all of them; returns the number of events."""
+    state = CleanState(os.path.join(directory, 'state.json'))
+    input_path = os.path.join(directory, 'combined_data.json')
+    output_path = os.path.join(directory, 'cleaned.json')
+    for step in (records[:1], records):
+        with open(input_path, 'w', encoding='utf-8') as f:
+            json.dump(step, f)
+        clean_event_data_incremental(input_path, output_path, state)
+    with open(output_path, 'r', encoding='utf-8') as f:
+        return len(json.load(f))
+
+
+if __name__ == '__main__':
+    # A check is not a pipeline run, so no metrics are written
+    metrics.disable()
+    problems = []
+    for description, records, expected in CASES:
+        directory = tempfile.mkdtemp(prefix='woofya-dedup-')
+        try:
+            full = len(deduplicate(pd.DataFrame(records)))
+            incremental = incremental_events(records, directory)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{description}: {full} events, {incremental} incrementally (expected {expected})", flush=True)
+        if full != expected or incremental != expected:
+            problems.append(f"{description}: {full} events, {incremental} incrementally, expected {expected}")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
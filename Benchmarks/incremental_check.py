@@ -0,0 +1,130 @@
+"""
+Checks that the incremental cleaner (Cleaner/cleaner.py --incremental) writes
+exactly what a full clean writes for the same input, whatever order the
+records come in.
+
+Starting from an incremental clean of the combined data, each step changes the
+input the way a new scrape does (reordered listings, removed and edited
+records) and cleans it both ways into a temporary folder. The run fails (exit
+code 1) at the first step where the two outputs differ.
+
+Usage:
+    python Benchmarks/incremental_check.py                     The combined data (SQL/combined_data.json)
+    python Benchmarks/incremental_check.py --file <file>       Another combined JSON or NDJSON file
+    python Benchmarks/incremental_check.py --seed 7            Other shuffles and edits
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.cleaner import clean_event_data, clean_event_data_incremental, load_records
+from Cleaner.incremental import CleanState
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMBINED_FILE = os.path.join(PROJECT_ROOT, 'SQL', 'combined_data.json')
+
+# Share of the records removed, and edited, by the steps that remove or edit records
+CHANGE_FRACTION = 0.05
+
+
+def input_steps(records, seed):
+    """
+    Yields (description, records) for each step, each built from the previous one.
+    Parameters:
+        records (list): The combined records.
+        seed (int): Seed of the shuffles and of the records removed and edited.
+    """
+    randomness = random.Random(seed)
+    records = list(records)
+    randomness.shuffle(records)
+    yield 'shuffled', records
+
+    records = list(records)
+    randomness.shuffle(records)
+    yield 'shuffled again', records
+
+    count = max(1, int(len(records) * CHANGE_FRACTION))
+    records = randomness.sample(records, len(records) - count)
+    yield f"{count} removed, shuffled", records
+
+    records = [dict(record) for record in records]
+    for record in randomness.sample(records, count):
+        record['description'] = f"{record.get('description') or ''} (updated)"
+    randomness.shuffle(records)
+    yield f"{count} edited, shuffled", records
+
+
+def clean_both_ways(records, directory, state_path):
+    """
+    Cleans the records with a full clean and with the incremental cleaner (from its state).
+    Returns:
+        tuple: (full output, incremental output), each a list of encoded events.
+    """
+    input_path = os.path.join(directory, 'combined_data.json')
+    with open(input_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+    outputs = []
+    for name, clean in (('full', clean_event_data), ('incremental', clean_event_data_incremental)):
+        output_path = os.path.join(directory, f"cleaned_{name}.json")
+        if name == 'full':
+            clean(input_path, output_path)
+        else:
+            clean(input_path, output_path, CleanState(state_path))
+        with open(output_path, 'r', encoding='utf-8') as f:
+            outputs.append(json.load(f))
+    return outputs
+
+
+def first_difference(expected, actual):
+    """Returns a description of the first event that differs (None if the outputs are equal)."""
+    if len(expected) != len(actual):
+        return f"{len(expected)} events from the full clean, {len(actual)} from the incremental one"
+    for position, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            fields = sorted(field for field in set(a) | set(b) if a.get(field) != b.get(field))
+            return f"event {position} differs in {', '.join(fields)}:\n    full:        {a}\n    incremental: {b}"
+    return None
+
+
+# Command-line options that take a value
+OPTIONS = ('--file', '--seed')
+
+
+if __name__ == '__main__':
+    # A check is not a pipeline run, so no metrics are written
+    metrics.disable()
+    options = {}
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument not in OPTIONS:
+            raise SystemExit(f"Unknown option {argument}. Options: {', '.join(OPTIONS)}")
+        options[argument] = next(arguments, None)
+    records = load_records(options.get('--file') or COMBINED_FILE)
+    seed = int(options.get('--seed') or 1)
+
+    directory = tempfile.mkdtemp(prefix='woofya-incremental-')
+    state_path = os.path.join(directory, 'state.json')
+    problems = []
+    try:
+        # The first incremental run cleans every record and saves the state the steps start from
+        clean_both_ways(records, directory, state_path)
+        for description, step_records in input_steps(records, seed):
+            expected, actual = clean_both_ways(step_records, directory, state_path)
+            difference = first_difference(expected, actual)
+            print(f"{description}: {len(step_records)} records, {len(actual)} events, "
+                  f"{'identical' if difference is None else 'DIFFERENT'}", flush=True)
+            if difference is not None:
+                problems.append(f"{description}: {difference}")
+                break
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,110 @@
+"""
+Checks that the bulk loader (SQL/insert_events.py) is idempotent on a table
+that earlier loaders filled.
+
+The original loader inserted every record as is, so events without a link or
+a location were stored with NULL in those natural key columns, which the
+upsert never matches. The check fills a SQLite events table that way (plus a
+copy of some of those rows with '' keys, as a load made before the
+backfill did), then loads the same file twice with SQLiteBackend. The run
+fails (exit code 1) unless the table holds exactly one row per natural key
+after each load.
+
+Usage:
+    python Benchmarks/load_check.py                   The cleaned data (SQL/cleaned_combined_data.json)
+    python Benchmarks/load_check.py --file <file>     Another cleaned JSON, NDJSON or Parquet file
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+# Make the project root importable so the shared SQL/ and Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.combine import iter_events
+from SQL.db_backends import SQLiteBackend
+from SQL.insert_events import insert_data_into_db
+from events import EVENT_COLUMNS, NATURAL_KEY
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEANED_FILE = os.path.join(PROJECT_ROOT, 'SQL', 'cleaned_combined_data.json')
+
+# Every this many NULL-key rows is also stored with '' keys, as a load before the backfill did
+COPY_EVERY = 3
+
+
+def fill_like_earlier_loaders(database_path, events):
+    """
+    Creates the events table and inserts the events with missing values as NULL.
+    Returns:
+        int: The number of rows with a NULL natural key value.
+    """
+    connection = sqlite3.connect(database_path)
+    columns = ', '.join(EVENT_COLUMNS)
+    placeholders = ', '.join('?' * len(EVENT_COLUMNS))
+    connection.execute(f"CREATE TABLE events ({', '.join(f'{column} TEXT' for column in EVENT_COLUMNS)})")
+    key_positions = [EVENT_COLUMNS.index(column) for column in NATURAL_KEY]
+    null_rows = 0
+    for event in events:
+        row = tuple(None if position in key_positions and getattr(event, EVENT_COLUMNS[position]) is None
+                    else value for position, value in enumerate(event.to_row()))
+        connection.execute(f"INSERT INTO events ({columns}) VALUES ({placeholders})", row)
+        if None in row:
+            if null_rows % COPY_EVERY == 0:
+                connection.execute(f"INSERT INTO events ({columns}) VALUES ({placeholders})", event.to_row())
+            null_rows += 1
+    connection.commit()
+    connection.close()
+    return null_rows
+
+
+def table_counts(database_path):
+    """Returns (rows, distinct natural keys, rows with a NULL natural key value) of the events table."""
+    connection = sqlite3.connect(database_path)
+    key = ', '.join(NATURAL_KEY)
+    nulls = ' OR '.join(f"{column} IS NULL" for column in NATURAL_KEY)
+    counts = (connection.execute("SELECT COUNT(*) FROM events").fetchone()[0],
+              connection.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {key} FROM events)").fetchone()[0],
+              connection.execute(f"SELECT COUNT(*) FROM events WHERE {nulls}").fetchone()[0])
+    connection.close()
+    return counts
+
+
+# Command-line options that take a value
+OPTIONS = ('--file',)
+
+
+if __name__ == '__main__':
+    # A check is not a pipeline run, so no metrics are written
+    metrics.disable()
+    options = {}
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument not in OPTIONS:
+            raise SystemExit(f"Unknown option {argument}. Options: {', '.join(OPTIONS)}")
+        options[argument] = next(arguments, None)
+    input_file = options.get('--file') or CLEANED_FILE
+
+    directory = tempfile.mkdtemp(prefix='woofya-load-')
+    database_path = os.path.join(directory, 'events.db')
+    problems = []
+    try:
+        events = list(iter_events(input_file, EVENT_COLUMNS))
+        null_rows = fill_like_earlier_loaders(database_path, events)
+        rows, keys, nulls = table_counts(database_path)
+        print(f"Before: {rows} rows, {null_rows} with a NULL natural key value", flush=True)
+        for load in ('first load', 'second load'):
+            loaded = insert_data_into_db(input_file, SQLiteBackend(database_path))
+            rows, keys, nulls = table_counts(database_path)
+            print(f"After the {load}: {rows} rows, {keys} natural keys, {nulls} with a NULL key value", flush=True)
+            if rows != keys or nulls or keys < loaded:
+                problems.append(f"{load}: {rows} rows for {keys} natural keys ({loaded} loaded), "
+                                f"{nulls} with a NULL key value")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
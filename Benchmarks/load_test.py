@@ -0,0 +1,250 @@
+"""
+Local load test of the read API (API/server.py): starts the server on the
+cleaned events (or on a synthetic dataset of a given size), drives it from
+several client processes over keep-alive connections, and reports requests/sec
+and latency percentiles.
+
+The requests are a mix of first pages, filtered queries (location, state,
+source, date range), follow-up pages through cursors and revalidations with
+If-None-Match, built from the values found in the dataset.
+
+The run fails (exit code 1) when any request gets an unexpected status, or the
+p99 latency is above --p99-ms.
+
+Usage:
+    python Benchmarks/load_test.py                          10s against the cleaned events
+    python Benchmarks/load_test.py --events 200000          Against 200,000 synthetic events
+    python Benchmarks/load_test.py --seconds 30 --workers 4 --connections 16
+    python Benchmarks/load_test.py --url http://127.0.0.1:8080   Against a server that is already running
+
+The clients share the machine with the server, so leave a core free for it
+(the server itself uses one).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import asyncio
+import tempfile
+import subprocess
+from collections import Counter
+from urllib.parse import urlencode
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.combine import iter_records, newest_file
+from API.server import CLEANED_FILES
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8089
+
+# Defaults of the command-line options
+SECONDS = 10.0
+WORKERS = 2
+CONNECTIONS = 4
+P99_MS = 10.0
+
+# Share of requests sent with the ETag of an earlier response to the same URL
+REVALIDATE = 0.3
+
+# Seconds to wait for the server to load its snapshot
+STARTUP_TIMEOUT = 300
+
+
+def synthesize(file_path, count, directory):
+    """
+    Writes a dataset of `count` events made by repeating the events of a file, each
+    copy with a numbered title (so every event has its own natural key).
+    Parameters:
+        file_path (str): A JSON array or NDJSON file of cleaned events.
+        count (int): Number of events to write.
+        directory (str): Where to write the dataset.
+    Returns:
+        str: The path of the dataset (a JSON array).
+    """
+    records = [record for record in iter_records(file_path) if isinstance(record, dict)]
+    path = os.path.join(directory, 'events.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for number in range(count):
+            record = dict(records[number % len(records)])
+            copy = number // len(records)
+            if copy:
+                record['title'] = f"{record.get('title')} ({copy})"
+            f.write((',' if number else '') + json.dumps(record, ensure_ascii=False))
+        f.write(']')
+    return path
+
+
+def build_paths(file_path, count=2000, seed=1):
+    """
+    Builds the request mix from the values found in a dataset.
+    Parameters:
+        file_path (str): The dataset the server serves.
+        count (int): Number of distinct URLs.
+        seed (int): Seed of the random choices.
+    Returns:
+        list: URL paths (with query strings) of /events.
+    """
+    locations, states, sources, dates = set(), set(), set(), set()
+    for record in iter_records(file_path):
+        extras = record.get('extras') or {}
+        locations.update(name for name in (extras.get('suburb'), extras.get('region')) if name)
+        if extras.get('state'):
+            states.add(extras['state'])
+        sources.update(record.get('sources') or ([record['source']] if record.get('source') else []))
+        if record.get('date_start'):
+            dates.add(record['date_start'])
+    locations, states, sources, dates = (sorted(values) for values in (locations, states, sources, dates))
+
+    choose = random.Random(seed).choice
+    filters = [lambda: {}, lambda: {'limit': choose((10, 20, 100))}]
+    if locations:
+        filters.append(lambda: {'location': choose(locations)})
+    if states:
+        filters.append(lambda: {'state': choose(states)})
+        if dates:
+            filters.append(lambda: {'state': choose(states), 'from': choose(dates)})
+    if sources:
+        filters.append(lambda: {'source': choose(sources)})
+    if dates:
+        filters.append(lambda: dict(zip(('from', 'to'), sorted((choose(dates), choose(dates))))))
+    return sorted({'/events?' + urlencode(choose(filters)()) for _ in range(count)})
+
+
+async def _fetch_cursors(base_url, paths, count=200):
+    """Returns URLs of second pages, reached through the cursor of some of the first pages."""
+    next_pages = []
+    async with aiohttp.ClientSession() as session:
+        for path in paths[:count]:
+            async with session.get(base_url + path) as response:
+                cursor = (await response.json()).get('next_cursor')
+            if cursor:
+                next_pages.append(path + ('&' if path[-1] != '?' else '') + urlencode({'cursor': cursor}))
+    return next_pages
+
+
+async def _drive(base_url, paths, seconds, connections, seed):
+    """Sends requests over `connections` connections for `seconds`; returns (latencies in ms, status counts)."""
+    latencies, statuses, etags = [], Counter(), {}
+    choose, chance = random.Random(seed).choice, random.Random(seed + 1).random
+    deadline = time.perf_counter() + seconds
+
+    async def client(session):
+        while time.perf_counter() < deadline:
+            path = choose(paths)
+            headers = {'If-None-Match': etags[path]} if path in etags and chance() < REVALIDATE else {}
+            start_time = time.perf_counter()
+            try:
+                async with session.get(base_url + path, headers=headers) as response:
+                    await response.read()
+                    status = response.status
+                    if status == 200:
+                        etags[path] = response.headers.get('ETag')
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            statuses[status] += 1
+
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(connections)))
+    return latencies, statuses
+
+
+def run_worker(base_url, paths, seconds, connections, seed):
+    return asyncio.run(_drive(base_url, paths, seconds, connections, seed))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def start_server(file_path, port):
+    """Starts API/server.py on a file and waits until it answers; returns the process."""
+    process = subprocess.Popen([sys.executable, os.path.join(PROJECT_ROOT, 'API', 'server.py'),
+                                '--file', file_path, '--port', str(port)], cwd=PROJECT_ROOT)
+
+    async def wait():
+        deadline = time.perf_counter() + STARTUP_TIMEOUT
+        async with aiohttp.ClientSession() as session:
+            while time.perf_counter() < deadline and process.poll() is None:
+                try:
+                    async with session.get(f"http://127.0.0.1:{port}/health") as response:
+                        if response.status == 200:
+                            return True
+                except aiohttp.ClientError:
+                    await asyncio.sleep(0.2)
+        return False
+
+    if not asyncio.run(wait()):
+        process.kill()
+        raise SystemExit("The server did not start.")
+    return process
+
+
+# Command-line options that take a value
+OPTIONS = ('--url', '--file', '--events', '--seconds', '--workers', '--connections', '--p99-ms')
+
+
+if __name__ == '__main__':
+    # A load test is not a pipeline run, so no metrics are written
+    metrics.disable()
+    options = {}
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument not in OPTIONS:
+            raise SystemExit(f"Unknown option {argument}. Options: {', '.join(OPTIONS)}")
+        options[argument] = next(arguments, None)
+    seconds = float(options.get('--seconds') or SECONDS)
+    workers = int(options.get('--workers') or WORKERS)
+    connections = int(options.get('--connections') or CONNECTIONS)
+    p99_limit = float(options.get('--p99-ms') or P99_MS)
+
+    file_path = os.path.abspath(options.get('--file') or newest_file(CLEANED_FILES))
+    if file_path.endswith('.parquet'):
+        raise SystemExit("The load test reads JSON or NDJSON; pass the cleaned JSON file with --file.")
+    directory = tempfile.mkdtemp(prefix='woofya-load-')
+    server = None
+    try:
+        if options.get('--events'):
+            file_path = synthesize(file_path, int(options['--events']), directory)
+        base_url = (options.get('--url') or '').rstrip('/')
+        if not base_url:
+            server = start_server(file_path, PORT)
+            base_url = f"http://127.0.0.1:{PORT}"
+
+        paths = build_paths(file_path)
+        paths += asyncio.run(_fetch_cursors(base_url, paths))
+        print(f"{len(paths)} distinct requests, {workers} worker(s) x {connections} connection(s), {seconds:.0f}s")
+
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(run_worker, *zip(*[(base_url, paths, seconds, connections, seed)
+                                                          for seed in range(workers)])))
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    statuses = sum((worker_statuses for _, worker_statuses in results), Counter())
+    p99 = percentile(latencies, 0.99)
+    print(f"Requests: {len(latencies)} ({len(latencies) / seconds:.0f}/s)  "
+          f"statuses: {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}")
+    print(f"Latency ms: p50 {percentile(latencies, 0.5):.2f}  p90 {percentile(latencies, 0.9):.2f}  "
+          f"p99 {p99:.2f}  max {latencies[-1] if latencies else 0:.2f}")
+
+    problems = [f"{count} request(s) got {status}" for status, count in statuses.items() if status not in (200, 304)]
+    if p99 > p99_limit:
+        problems.append(f"p99 latency {p99:.2f} ms is above {p99_limit} ms")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
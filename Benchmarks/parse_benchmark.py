@@ -0,0 +1,255 @@
+"""
+Offline parse benchmark: runs every source's extractor (see Scrapers/extractors.py)
+on its recorded HTML fixture with every parsing backend, and reports pages/sec
+and records/sec.
+
+The run fails (exit code 1) when an extractor returns a different number of
+records than recorded in baseline.json, when the backends disagree on the
+records, or when relative throughput drops more than TOLERANCE below the
+baseline.
+
+Pages/sec depends on the machine, so it is not what the baseline compares.
+The timing rounds of each extractor alternate with rounds of a calibration
+loop on the same machine and the same fixture: the backend's own library
+parsing the page, with none of the project's code involved. An extractor's
+relative throughput is its pages/sec divided by the calibration's, i.e. the
+share of its time that the bare parse accounts for, and the median over the
+rounds is reported. A slower, faster or busier machine moves both numbers
+alike, so only a change in the extraction code (or in how it uses the
+library) moves the ratio.
+
+Usage:
+    python Benchmarks/parse_benchmark.py                     Benchmark and compare with the baseline
+    python Benchmarks/parse_benchmark.py --source Humantix   Only these sources (comma-separated)
+    python Benchmarks/parse_benchmark.py --update-baseline   Save this run as the new baseline
+    python Benchmarks/parse_benchmark.py --record            Re-capture the fixtures from the live sites
+                                                             (needs network access; then --update-baseline)
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import statistics
+
+# Make the project root importable so the shared Scrapers/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Scrapers.extractors import EXTRACTORS
+from Scrapers.parsing import BACKENDS
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# Minimum seconds spent parsing each fixture with each backend (repeated until reached)
+MIN_SECONDS = 1.0
+
+# Rounds the parsing time is split into; the fastest round's pages/sec and the median relative throughput are reported
+ROUNDS = 5
+
+# Fraction of the baseline relative throughput a run may lose before it counts as a regression
+TOLERANCE = 0.3
+
+
+def _calibration_parsers():
+    # Each backend's library called directly, so the calibration never runs the code being benchmarked
+    from bs4 import BeautifulSoup
+    parsers = {'html.parser': lambda text: BeautifulSoup(text, 'html.parser')}
+    if 'lxml' in BACKENDS:
+        import lxml.html
+        parsers['lxml'] = lxml.html.document_fromstring
+    return parsers
+
+
+def fixture_path(source):
+    return os.path.join(FIXTURE_DIR, f"{source}.html")
+
+
+def load_fixture(source):
+    with open(fixture_path(source), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def record_fixtures(sources):
+    """
+    Captures the first page of each source from the live site into its fixture file,
+    fetched or rendered the way the source's scraper does it (see Scrapers/sources.py).
+    Parameters:
+        sources (list): Source names (keys of EXTRACTORS).
+    """
+    # Imported here so benchmarking never needs the network stack or a browser
+    from Scrapers.framework import ScrapeSession
+    from Scrapers.http_cache import HTTPCache
+    from Scrapers.sources import SCRAPERS
+
+    scrapers = {scraper.source: scraper() for scraper in SCRAPERS.values()}
+
+    async def record():
+        # A throwaway cache, so the live page is always downloaded
+        async with ScrapeSession(cache=HTTPCache(ttl=0)) as session:
+            for source in sources:
+                scraper = scrapers[source]
+                url = scraper.page_url(list(scraper.pages)[0])
+                page = await scraper.get(session, url)
+                if page.status_code != 200 or not page.text:
+                    print(f"Could not record {source} from {url}: {page.error or page.status_code}")
+                    continue
+                with open(fixture_path(source), 'w', encoding='utf-8') as f:
+                    f.write(page.text)
+                print(f"Recorded {source} ({len(page.text)} characters)")
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    asyncio.run(record())
+
+
+def _round(function, text, seconds):
+    """Returns the pages per second of `function` on one page, run repeatedly for at least `seconds`."""
+    runs = 0
+    start_time = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < seconds:
+        function(text)
+        runs += 1
+        elapsed = time.perf_counter() - start_time
+    return runs / elapsed
+
+
+def benchmark(extract, text, min_seconds=MIN_SECONDS, calibration=None):
+    """
+    Parses one page repeatedly for at least `min_seconds`, in ROUNDS rounds, and
+    keeps the fastest round (other processes only ever slow a round down). With a
+    calibration parser, each round is followed by one of the same length that only
+    parses the page with the library, so both are timed under the same conditions,
+    and the median of the rounds' ratios is kept.
+    Parameters:
+        extract (callable): The extractor to time.
+        text (str): The page HTML.
+        min_seconds (float): Minimum time to spend on the extractor.
+        calibration (callable): The backend's library parser (see _calibration_parsers).
+    Returns:
+        tuple: (pages per second, relative throughput (None without a calibration
+                parser), the result of the first run)
+    """
+    records = extract(text)
+    best = 0.0
+    ratios = []
+    for _ in range(ROUNDS):
+        pages_per_sec = _round(extract, text, min_seconds / ROUNDS)
+        best = max(best, pages_per_sec)
+        if calibration:
+            ratios.append(pages_per_sec / _round(calibration, text, min_seconds / ROUNDS))
+    return best, statistics.median(ratios) if ratios else None, records
+
+
+def run_benchmarks(sources, min_seconds=MIN_SECONDS):
+    """
+    Benchmarks every source with every backend.
+    Parameters:
+        sources (list): Source names (keys of EXTRACTORS).
+        min_seconds (float): Minimum time per source and backend.
+    Returns:
+        tuple: ({source: {backend: {'relative', 'pages_per_sec', 'records_per_sec', 'records'}}},
+                list of problems found, such as backends disagreeing on the records).
+            'relative' is the median ratio of the extractor's pages/sec to the
+            calibration's (None for a backend without a calibration parser).
+    """
+    calibration_parsers = _calibration_parsers()
+    results = {}
+    problems = []
+    for source in sources:
+        text = load_fixture(source)
+        results[source] = {}
+        records_by_backend = {}
+        for backend in BACKENDS:
+            pages_per_sec, relative, records = benchmark(EXTRACTORS[source](backend), text, min_seconds,
+                                                            calibration_parsers.get(backend))
+            records = records or []
+            records_by_backend[backend] = records
+            relative = round(relative, 4) if relative else None
+            results[source][backend] = {
+                'relative': relative,
+                'pages_per_sec': round(pages_per_sec, 2),
+                'records_per_sec': round(pages_per_sec * len(records), 1),
+                'records': len(records),
+            }
+            print(f"{source:<30} {backend:<12} {pages_per_sec:9.1f} pages/s "
+                  f"{pages_per_sec * len(records):11.1f} records/s  ({len(records)} records), relative {relative}")
+
+        # Every backend must extract exactly the same records
+        first_backend, expected = next(iter(records_by_backend.items()))
+        for backend, records in records_by_backend.items():
+            if records != expected:
+                problems.append(f"{source}: {backend} and {first_backend} extract different records")
+    return results, problems
+
+
+def compare_with_baseline(results, baseline, tolerance=TOLERANCE):
+    """
+    Parameters:
+        results (dict): Output of run_benchmarks.
+        baseline (dict): The saved baseline, in the same format.
+        tolerance (float): Allowed fractional drop in relative throughput.
+    Returns:
+        list: A description of each regression (empty if there are none).
+    """
+    regressions = []
+    for source, backends in results.items():
+        for backend, result in backends.items():
+            expected = baseline.get(source, {}).get(backend)
+            if expected is None:
+                print(f"No baseline for {source} with {backend}; run with --update-baseline to add one.")
+                continue
+            if result['records'] != expected['records']:
+                regressions.append(f"{source} ({backend}): {result['records']} records, "
+                                   f"baseline has {expected['records']}")
+            if result['relative'] is None or expected.get('relative') is None:
+                print(f"No relative throughput for {source} with {backend}; only its records are compared.")
+            elif result['relative'] < expected['relative'] * (1 - tolerance):
+                regressions.append(f"{source} ({backend}): relative throughput {result['relative']}, "
+                                   f"baseline is {expected['relative']} ({result['pages_per_sec']} pages/s here)")
+    return regressions
+
+
+def parse_sources(argv):
+    """Returns the sources selected with --source (all of them by default)."""
+    if '--source' not in argv:
+        return list(EXTRACTORS)
+    index = argv.index('--source')
+    selected = argv[index + 1].split(',') if index + 1 < len(argv) else []
+    unknown = [name for name in selected if name not in EXTRACTORS]
+    if unknown:
+        raise SystemExit(f"Unknown source(s): {', '.join(unknown)}. Choose from: {', '.join(EXTRACTORS)}")
+    return selected
+
+
+if __name__ == '__main__':
+    # The extractors record parse metrics; a benchmark run is not a pipeline run, so none are written
+    metrics.disable()
+
+    sources = parse_sources(sys.argv)
+
+    if '--record' in sys.argv:
+        record_fixtures(sources)
+        sys.exit(0)
+
+    results, problems = run_benchmarks(sources)
+
+    if '--update-baseline' in sys.argv:
+        baseline = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=4)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    elif os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            problems += compare_with_baseline(results, json.load(f))
+    else:
+        print("No baseline yet; run with --update-baseline to create one.")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
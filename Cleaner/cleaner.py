@@ -1,80 +1,157 @@
 import os
+import sys
 import pandas as pd
 import re
 import json
-from datetime import datetime
+from collections import Counter
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.combine import iter_records, newest_file
+from Cleaner.dates import standardize_dates, standardize_date_columns
+from Cleaner.dedup import deduplicate, cluster_duplicates, find_matches, merge_clusters, normalize_text, title_band_keys
+from Cleaner.incremental import CleanState, record_keys
+from Cleaner.locations import add_location_fields
+from events import CORE_FIELDS, REQUIRED_FIELDS, Event
+from columnar import read_columns, read_events, write_events
 
 # Define paths for input and output files relative to the current script directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 input_file_path = os.path.join(current_dir, "../SQL/combined_data.json")
+ndjson_input_file_path = os.path.join(current_dir, "../SQL/combined_data.ndjson")
+parquet_input_file_path = os.path.join(current_dir, "../SQL/combined_data.parquet")
 output_file_path = os.path.join(current_dir, "../SQL/cleaned_combined_data.json")
+parquet_output_file_path = os.path.join(current_dir, "../SQL/cleaned_combined_data.parquet")
+
+def events_to_frame(events):
+    """
+    Builds the cleaner's DataFrame from events: one column per core field that any
+    event has (see events.py), plus an 'extras' column holding each event's extras dict.
+    Parameters:
+        events (list): Event objects.
+    Returns:
+        DataFrame: One row per event.
+    """
+    return columns_to_frame({field: [getattr(event, field) for event in events] for field in CORE_FIELDS + ('extras',)},
+                            len(events))
+
+def columns_to_frame(columns, size):
+    """
+    Builds the cleaner's DataFrame from whole columns (see events_to_frame), leaving
+    out the columns that have no values at all.
+    Parameters:
+        columns (dict): {field: list of values}.
+        size (int): Number of events.
+    Returns:
+        DataFrame: One row per event.
+    """
+    return pd.DataFrame({field: pd.Series(values, dtype=object) for field, values in columns.items()
+                         if any(value is not None for value in values)},
+                        index=pd.RangeIndex(size))
+
+def frame_to_events(df):
+    """
+    Converts the cleaner's DataFrame back into events.
+    Parameters:
+        df (DataFrame): Columns named after core fields, plus 'extras'.
+    Returns:
+        list: One Event per row.
+    """
+    df = df.astype(object).where(df.notna(), None)
+    events = []
+    for record in df.to_dict('records'):
+        if record.get('duplicate_count') is not None:
+            record['duplicate_count'] = int(record['duplicate_count'])
+        events.append(Event(**record))
+    return events
 
 def load_json_file(file_path):
     """
-    Loads a JSON file into a pandas DataFrame.
+    Loads a JSON file of events into a pandas DataFrame (see events_to_frame).
     Parameters:
-        file_path (str): The file path to the JSON file.
+        file_path (str): The file path to the JSON file (a JSON array, newline-delimited
+            JSON if it ends in '.ndjson', or Parquet if it ends in '.parquet').
     Returns:
         DataFrame: DataFrame with the loaded data.
     """
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    return pd.DataFrame(data)
+    if file_path.endswith('.parquet'):
+        # Read column by column, without building an Event per row
+        columns = read_columns(file_path)
+        return columns_to_frame(columns, len(next(iter(columns.values()))))
+    return events_to_frame([Event.from_dict(record) for record in iter_records(file_path)])
+
+def load_records(file_path):
+    """
+    Loads a JSON or Parquet file of events as encoded records (see Event.to_dict).
+    Parameters:
+        file_path (str): The input file (see load_json_file).
+    Returns:
+        list: One dict per event.
+    """
+    if file_path.endswith('.parquet'):
+        return [event.to_dict() for event in read_events(file_path)]
+    return [Event.from_dict(record).to_dict() for record in iter_records(file_path)]
+
+def record_order(record):
+    """Sort key of an encoded event: its natural key (see events.py), then its content."""
+    return (tuple(str(value) for value in Event.from_dict(record).key()),
+            json.dumps(record, sort_keys=True, ensure_ascii=False, default=str))
+
+def save_records(records, output_file_path):
+    """
+    Saves encoded events (see Event.to_dict) as a JSON file, or as Parquet if the
+    path ends in '.parquet'. The events are saved in natural key order, so the file
+    does not depend on the order the sources listed them in (full and incremental
+    cleans of the same records write the same file). The file is replaced in one
+    step, so a reader (such as the read API, API/server.py) never sees it half written.
+    Parameters:
+        records (list): The encoded events.
+        output_file_path (str): Path to save the output file.
+    """
+    records = sorted(records, key=record_order)
+    temporary_path = f"{output_file_path}.{os.getpid()}.tmp"
+    if output_file_path.endswith('.parquet'):
+        write_events(temporary_path, (Event.from_dict(record) for record in records))
+    else:
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(records, file, indent=4, ensure_ascii=False)
+    os.replace(temporary_path, output_file_path)
+    print(f"Data has been cleaned and saved to {output_file_path}")
 
 def save_to_json(df, output_file_path):
     """
-    Saves a DataFrame as a JSON file.
+    Saves a DataFrame as a JSON file of encoded events, which hold only the fields
+    each event has (see Event.to_dict), or as Parquet if the path ends in '.parquet'.
     Parameters:
         df (DataFrame): DataFrame to be saved.
         output_file_path (str): Path to save the output JSON file.
     """
-    df.to_json(output_file_path, orient='records', indent=4)
-    print(f"Data has been cleaned and saved to {output_file_path}")
+    save_records([event.to_dict() for event in frame_to_events(df)], output_file_path)
 
 def remove_duplicates(df):
     """
-    Removes duplicate entries based on event name and date.
+    Merges duplicate events, including near-duplicates listed by more than one source
+    (see Cleaner/dedup.py), into one canonical record each.
     Parameters:
-        df (DataFrame): The input DataFrame with event details.
+        df (DataFrame): The input DataFrame with event details (dates already standardized).
     Returns:
-        DataFrame: DataFrame with duplicates removed.
+        DataFrame: DataFrame with one row per event, plus 'sources' and 'duplicate_count'.
     """
-    # If date is not present, create an empty column
-    if 'date' not in df.columns:
-        df['date'] = ''
-    
-    # Remove duplicates based on 'title' and 'date'
-    df_unique = df.drop_duplicates(subset=['title', 'date'], keep='first')
-    return df_unique
+    return deduplicate(df)
 
 def standardize_date_format(date_str):
     """
     Standardizes the date format to ISO 8601 (YYYY-MM-DD).
+    Single-value helper; whole columns go through standardize_date_columns (Cleaner/dates.py).
     Parameters:
         date_str (str): Input date string.
     Returns:
         str: Standardized date string in 'YYYY-MM-DD' format or original if not recognized.
     """
-    if not isinstance(date_str, str):
-        return None  # Return None if the input is not a string
-    
-    # Define common date formats
-    date_formats = [
-        "%a, %d %b %Y", "%a, %d %b, %Y", "%d %b %Y", "%b %d, %Y",
-        "%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y", "%m-%d-%Y",
-        "%A, %d %B %Y", "%A, %B %d, %Y"
-    ]
-
-    for date_format in date_formats:
-        try:
-            # Attempt to parse and convert to standardized format
-            standardized_date = datetime.strptime(date_str, date_format).strftime("%Y-%m-%d")
-            return standardized_date
-        except ValueError:
-            continue
-    return date_str  # Return original string if no format matches
-
-def validate_schema(df, required_columns=['title', 'location']):
+    return standardize_dates(pd.Series([date_str], dtype=object)).iloc[0]
+
+def validate_schema(df, required_columns=REQUIRED_FIELDS):
     """
     Validates the transformed data against the schema.
     Parameters:
@@ -90,6 +167,16 @@ def validate_schema(df, required_columns=['title', 'location']):
             return False
     return True
 
+def record_location_counts(resolutions):
+    """
+    Records how many records' locations were resolved to a suburb, a region or only a
+    state, and how many could not be resolved (see metrics.py and Cleaner/locations.py).
+    Parameters:
+        resolutions (Counter): Records by resolution, as returned by add_location_fields.
+    """
+    for resolution, count in resolutions.items():
+        metrics.count('clean_locations_total', count, resolution=resolution)
+
 def display_entry_count(original_df, cleaned_df):
     """
     Displays the number of entries in the original and cleaned JSON files.
@@ -102,39 +189,171 @@ def display_entry_count(original_df, cleaned_df):
     print(f"Number of entries in the original JSON file: {original_count}")
     print(f"Number of entries in the cleaned JSON file: {cleaned_count}")
 
+def record_source_counts(original_df, cleaned_df):
+    """
+    Records how many entries of each source were kept and how many were merged into
+    another entry (see metrics.py). Merged duplicates are counted against the source
+    of the entry that was dropped.
+    Parameters:
+        original_df (DataFrame): The original DataFrame loaded from the JSON file.
+        cleaned_df (DataFrame): The cleaned DataFrame after transformations.
+    """
+    if 'source' not in original_df.columns:
+        return
+    original_counts = original_df['source'].value_counts()
+    cleaned_counts = cleaned_df['source'].value_counts() if 'source' in cleaned_df.columns else {}
+    for source, original_count in original_counts.items():
+        cleaned_count = int(cleaned_counts.get(source, 0))
+        metrics.count('records_emitted_total', cleaned_count, source=source)
+        if original_count > cleaned_count:
+            metrics.count('records_dropped_total', int(original_count) - cleaned_count, source=source,
+                          reason='duplicate')
+
 # Main function to clean the data
 def clean_event_data(file_path, output_file_path):
     """
     Main function to clean the event data from a JSON file and save the cleaned version.
     1. Loads the JSON file into a DataFrame.
-    2. Removes duplicate entries.
-    3. Standardizes date formats.
-    4. Validates the schema.
-    5. Saves the cleaned data to a new JSON file.
+    2. Standardizes date formats (and splits date ranges into start and end dates).
+    3. Resolves locations to a suburb or region, state and coordinates.
+    4. Merges duplicate entries across sources.
+    5. Validates the schema.
+    6. Saves the cleaned data to a new JSON file.
     
     Parameters:
         file_path (str): Path to the input JSON file.
         output_file_path (str): Path to save the cleaned JSON file.
     """
     # Step 1: Load the JSON file
-    df = load_json_file(file_path)
+    with metrics.timed('clean_step_seconds', step='load'):
+        df = load_json_file(file_path)
+
+    # Step 2: Standardize date formats, one vectorized pass per column and source
+    with metrics.timed('clean_step_seconds', step='dates'):
+        df_cleaned = standardize_date_columns(df)
 
-    # Step 2: Remove duplicates based on title and date
-    df_cleaned = remove_duplicates(df)
+    # Step 3: Resolve locations against the gazetteer, once per distinct string
+    with metrics.timed('clean_step_seconds', step='locations'):
+        df_cleaned, resolutions = add_location_fields(df_cleaned)
 
-    # Step 3: Standardize date formats
-    if 'date' in df_cleaned.columns:
-        df_cleaned['date'] = df_cleaned['date'].apply(standardize_date_format)
+    # Step 4: Merge duplicates (dates and locations are compared once they are normalized)
+    with metrics.timed('clean_step_seconds', step='dedup'):
+        df_cleaned = remove_duplicates(df_cleaned)
 
-    # Step 4: Validate the transformed data against the schema
+    # Step 5: Validate the transformed data against the schema
     if validate_schema(df_cleaned):
-        # Step 5: Save the cleaned data to a new JSON file
-        save_to_json(df_cleaned, output_file_path)
-        
+        # Step 6: Save the cleaned data to a new JSON file
+        with metrics.timed('clean_step_seconds', step='save'):
+            save_to_json(df_cleaned, output_file_path)
+
         # Display the number of entries before and after cleaning
         display_entry_count(df, df_cleaned)
+        record_source_counts(df, df_cleaned)
+        record_location_counts(resolutions)
+    else:
+        print("Schema validation failed. Please review the input data.")
+
+def clean_event_data_incremental(file_path, output_file_path, state=None):
+    """
+    Cleans only what changed since the last incremental run (see Cleaner/incremental.py)
+    and merges it into the cleaned dataset:
+    1. Loads the records and finds the new and deleted ones by their content hash.
+    2. Standardizes the dates and resolves the locations of the new records.
+    3. Rebuilds the duplicate clusters that lost a record or that a new record may join.
+    4. Validates the schema.
+    5. Saves every cluster's merged record (if anything changed) and the state.
+    The output is the same as clean_event_data's, except that unchanged records keep
+    the dates and locations they were resolved to when they were first cleaned.
+
+    Parameters:
+        file_path (str): Path to the input JSON file.
+        output_file_path (str): Path to save the cleaned JSON file.
+        state (CleanState): Defaults to the saved state (an empty one on the first run).
+    """
+    state = state or CleanState()
+
+    # Step 1: Load the records and compare their hashes with the state
+    with metrics.timed('clean_step_seconds', step='load'):
+        records = load_records(file_path)
+        keys = record_keys(records)
+        positions = {key: position for position, key in enumerate(keys)}
+        new_keys = [key for key in keys if key not in state.records]
+        deleted_keys = [key for key in state.records if key not in positions]
+
+    # Step 2: Standardize the dates and resolve the locations of the new records only,
+    # and compute their title band keys
+    new_records, new_bands, df_new, resolutions = [], [], None, Counter()
+    if new_keys:
+        with metrics.timed('clean_step_seconds', step='dates'):
+            df_new = events_to_frame([Event.from_dict(records[positions[key]]) for key in new_keys])
+            df_new = standardize_date_columns(df_new)
+        with metrics.timed('clean_step_seconds', step='locations'):
+            df_new, resolutions = add_location_fields(df_new)
+        new_records = [event.to_dict() for event in frame_to_events(df_new)]
+        titles = normalize_text(pd.Series([record.get('title') for record in new_records], dtype=object))
+        bands = title_band_keys(titles.tolist())
+        new_bands = [[int(key) for key in bands[position]] if title else None
+                     for position, title in enumerate(titles)]
+
+    # Step 3: Recluster the affected records (in file order) and merge each rebuilt cluster
+    with metrics.timed('clean_step_seconds', step='dedup'):
+        # Rebuild the clusters that lost a record, and those a new record joins
+        affected = {state.records[key][0] for key in deleted_keys}
+        candidates = [key for key in state.candidate_keys(new_records, new_bands) if key in positions]
+        if candidates:
+            df_candidates = events_to_frame([Event.from_dict(state.records[key][1]) for key in candidates])
+            affected.update(state.records[candidates[position]][0]
+                            for position in find_matches(df_new, df_candidates,
+                                                         bands=[state.records[key][2] for key in candidates]))
+        entries = {key: state.records[key][1:] for key in state.members(affected) if key in positions}
+        entries.update((key, [record, bands]) for key, record, bands in zip(new_keys, new_records, new_bands))
+        recluster_keys = sorted(entries, key=positions.__getitem__)
+        reclustered, clusters = {}, {}
+        if recluster_keys:
+            df_affected = events_to_frame([Event.from_dict(entries[key][0]) for key in recluster_keys])
+            cluster_ids = cluster_duplicates(df_affected)
+            merged = merge_clusters(df_affected, cluster_ids)
+            # A cluster is identified by the key of its first record
+            for cluster_id, event in zip(merged.index, frame_to_events(merged)):
+                clusters[recluster_keys[cluster_id]] = event.to_dict()
+            for key, cluster_id in zip(recluster_keys, cluster_ids):
+                reclustered[key] = [recluster_keys[cluster_id], *entries[key]]
+        state.update(deleted_keys + recluster_keys, affected, reclustered, clusters)
+        cleaned_records = state.cleaned_records(positions)
+
+    print(f"{len(new_keys)} new or changed records, {len(deleted_keys)} removed; "
+          f"{len(clusters)} of {len(cleaned_records)} events rebuilt")
+    metrics.count('clean_records_new_total', len(new_keys))
+    metrics.count('clean_records_removed_total', len(deleted_keys))
+    metrics.count('clean_events_rebuilt_total', len(clusters))
+
+    # Step 4: Validate the fields of the cleaned data against the schema
+    fields = set().union(*(record.keys() for record in cleaned_records)) if cleaned_records else set()
+    if validate_schema(pd.DataFrame(columns=sorted(fields))):
+        # Step 5: Save the cleaned data (unless nothing changed) and the state
+        with metrics.timed('clean_step_seconds', step='save'):
+            if new_keys or deleted_keys or not os.path.exists(output_file_path):
+                save_records(cleaned_records, output_file_path)
+            state.save()
+
+        # Display the number of entries before and after cleaning
+        display_entry_count(records, cleaned_records)
+        record_source_counts(pd.DataFrame({'source': [record.get('source') for record in records]}),
+                             pd.DataFrame({'source': [record.get('source') for record in cleaned_records]}))
+        record_location_counts(resolutions)
     else:
         print("Schema validation failed. Please review the input data.")
 
-# Run the cleaning process to create the cleaned JSON file inside SQL folder
-clean_event_data(input_file_path, output_file_path)
+if __name__ == '__main__':
+    # Use whichever output of combine.py is newest (JSON array, --ndjson or --parquet);
+    # Parquet input is cleaned into Parquet as well
+    input_file_path = newest_file([input_file_path, ndjson_input_file_path, parquet_input_file_path])
+    if input_file_path.endswith('.parquet'):
+        output_file_path = parquet_output_file_path
+
+    # Run the cleaning process to create the cleaned JSON file inside SQL folder
+    # (pass --incremental to clean only the records that changed since the last incremental run)
+    if '--incremental' in sys.argv:
+        clean_event_data_incremental(input_file_path, output_file_path)
+    else:
+        clean_event_data(input_file_path, output_file_path)
@@ -1,37 +1,277 @@
 import os
+import re
+import sys
 import json
+import time
+import shutil
+import tempfile
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
 
-def combine_json_files(input_dir, output_file):
-    combined_data = []
+# Make the project root importable so the shared metrics and events modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from events import Event
+from columnar import concatenate_files, read_events, storage_columns, write_events
 
-    # Iterate through all files in the input directory
-    for filename in os.listdir(input_dir):
-        if filename.endswith('.json'):  # Check for JSON files only
+# Size of each read when streaming a JSON array from disk (1 MB)
+READ_CHUNK_SIZE = 1 << 20
+
+# Matches the whitespace and commas between elements of a JSON array
+ARRAY_SEPARATOR = re.compile(r'[\s,]*')
+
+def find_source_files(input_dir):
+    """
+    Lists the scraper output files to combine.
+    Scrapers write either a JSON array (.json) or newline-delimited JSON (.ndjson, see
+    Scrapers/ndjson_writer.py). If both exist for the same source, the most recently
+    written one is used.
+    Parameters:
+        input_dir (str): The Raw_Data directory.
+    Returns:
+        list: Paths of the files to combine, sorted by file name.
+    """
+    latest = {}
+    for filename in sorted(os.listdir(input_dir)):
+        stem, extension = os.path.splitext(filename)
+        if extension in ('.json', '.ndjson'):  # Check for JSON and NDJSON files only
             file_path = os.path.join(input_dir, filename)
-            
-            # Read each JSON file
-            with open(file_path, 'r', encoding='utf-8') as file:
-                try:
-                    data = json.load(file)
-                    if isinstance(data, list):
-                        combined_data.extend(data)  # Append data if it's a list
-                    else:
-                        combined_data.append(data)  # Append the whole object if not a list
-                except json.JSONDecodeError as e:
-                    print(f"Error loading {filename}: {e}")
-    
+            if stem not in latest or os.path.getmtime(file_path) > os.path.getmtime(latest[stem]):
+                latest[stem] = file_path
+    return sorted(latest.values())
+
+def newest_file(paths):
+    """
+    Returns the most recently written of several files holding the same data in
+    different formats (e.g. a stage's .json, .ndjson and .parquet output).
+    Parameters:
+        paths (list): Candidate paths, in order of preference when none exists.
+    Returns:
+        str: The newest existing path, or the first path if none exists.
+    """
+    existing = [path for path in paths if os.path.exists(path)]
+    return max(existing, key=os.path.getmtime) if existing else paths[0]
+
+def iter_ndjson_lines(file_path):
+    """
+    Yields the complete lines of an NDJSON file.
+    A scraper that crashed (or is still running) can leave a partly written last
+    line without a newline; it is skipped rather than breaking the combine.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.endswith('\n'):
+                print(f"Skipping incomplete last line in {os.path.basename(file_path)}")
+            elif line.strip():
+                yield line
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the elements of a JSON array one at a time, reading the file in chunks,
+    so arrays far larger than memory can be processed. A file holding a single
+    JSON object (not an array) yields that object.
+    Parameters:
+        file: A text file object positioned at the start of the JSON document.
+        chunk_size (int): Number of characters read at a time.
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    position = ARRAY_SEPARATOR.match(buffer).end()
+    if not buffer[position:position + 1] == '[':
+        # Not an array: the whole document is one record
+        yield json.loads(buffer + file.read())
+        return
+    position += 1
+    at_end_of_file = False
+
+    while True:
+        position = ARRAY_SEPARATOR.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+            # An element that runs right up to the end of the buffer may be cut short
+            complete = end < len(buffer) or at_end_of_file
+        except json.JSONDecodeError:
+            if at_end_of_file:
+                raise
+            complete = False
+
+        if complete:
+            yield record
+            position = end
+            continue
+
+        # Drop everything already consumed and read the next chunk
+        more = file.read(chunk_size)
+        at_end_of_file = not more
+        buffer = buffer[position:] + more
+        position = 0
+
+def iter_records(file_path):
+    """
+    Yields the records of one source file, one at a time, without loading the whole file.
+    Parameters:
+        file_path (str): A .json file (array or single object) or a .ndjson file.
+    """
+    if file_path.endswith('.ndjson'):
+        for line in iter_ndjson_lines(file_path):
+            yield json.loads(line)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield from iter_json_array(file)
+
+def iter_events(file_path, fields=None):
+    """
+    Yields the events of a stage's output, one at a time.
+    Parameters:
+        file_path (str): A JSON array, NDJSON or Parquet file of events.
+        fields (iterable): Fields needed; for Parquet only their columns are read (the
+            other fields are None). Defaults to every field.
+    """
+    if file_path.endswith('.parquet'):
+        yield from read_events(file_path, columns=storage_columns(fields) if fields else None)
+        return
+    for record in iter_records(file_path):
+        if isinstance(record, dict):
+            yield Event.from_dict(record)
+
+def source_name(file_path):
+    """Returns the source name a record is tagged with (the file name without its extension)."""
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+def output_format(output_file):
+    """Returns the format an output file name asks for: 'parquet', 'ndjson' or 'json'."""
+    extension = os.path.splitext(output_file)[1]
+    return extension[1:] if extension in ('.parquet', '.ndjson') else 'json'
+
+def combine_source_file(file_path, part_path, part_format):
+    """
+    Worker run in a separate process: streams one source file into a part file,
+    encoding every record as an Event (see events.py) tagged with its source.
+    Parameters:
+        file_path (str): The source file to read.
+        part_path (str): The part file to write.
+        part_format (str): 'ndjson' writes one compact record per line, 'json' indented
+            JSON array elements (separated by ',\\n') and 'parquet' a Parquet file
+            (see columnar.py; records that are not objects are dropped).
+    Returns:
+        tuple: (record count, seconds taken, error message or None). If the source
+            is not valid JSON the part is skipped.
+    """
+    start_time = time.perf_counter()
+    source = source_name(file_path)
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=None if part_format == 'ndjson' else 4)
+    count = 0
+
+    try:
+        if part_format == 'parquet':
+            count = write_events(part_path, (Event.from_dict(record, source=source)
+                                             for record in iter_records(file_path) if isinstance(record, dict)))
+            return count, time.perf_counter() - start_time, None
+        with open(part_path, 'w', encoding='utf-8') as part:
+            for record in iter_records(file_path):
+                if isinstance(record, dict):
+                    record = Event.from_dict(record, source=source).to_dict()
+                if part_format == 'ndjson':
+                    part.write(encoder.encode(record) + '\n')
+                else:
+                    if count:
+                        part.write(',\n')
+                    part.write(textwrap.indent(encoder.encode(record), '    '))
+                count += 1
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        open(part_path, 'w').close()
+        return 0, time.perf_counter() - start_time, str(e)
+
+    return count, time.perf_counter() - start_time, None
+
+def combine_json_files(input_dir, output_file, max_workers=None):
+    """
+    Combines every file in input_dir into one file in the SQL directory.
+    Source files are parsed in parallel (one process per file, streaming each file
+    rather than loading it), and their records are encoded as Events tagged with
+    their source (core fields plus the source-specific extras, see events.py).
+    The part files are then concatenated into the output, so no stage ever holds
+    the whole dataset in memory.
+    Parameters:
+        input_dir (str): The Raw_Data directory.
+        output_file (str): Output file name. A '.ndjson' name writes one record per line,
+            a '.parquet' name a columnar Parquet file (see columnar.py); any other name
+            writes an indented JSON array.
+        max_workers (int): Number of worker processes (defaults to the number of CPUs).
+    Returns:
+        list: One (file name, record count, seconds, error) tuple per source file.
+    """
+    start_time = time.perf_counter()
+
     # Construct the output file path in the SQL directory
-    output_file_path = os.path.join(os.path.dirname(input_dir), 'SQL', output_file)
+    output_directory = os.path.join(os.path.dirname(input_dir), 'SQL')
+    output_file_path = os.path.join(output_directory, output_file)
+    part_format = output_format(output_file)
+    ndjson_output = part_format == 'ndjson'
+    source_files = find_source_files(input_dir)
+
+    with tempfile.TemporaryDirectory(dir=output_directory) as parts_directory:
+        part_paths = [os.path.join(parts_directory, f"{index}.part") for index in range(len(source_files))]
+
+        # Parse the source files in parallel, each into its own part file
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(combine_source_file, source_files, part_paths,
+                                        [part_format] * len(source_files)))
+
+        # Concatenate the parts in file-name order
+        if part_format == 'parquet':
+            concatenate_files(output_file_path, [part_path for part_path, (count, _, _) in zip(part_paths, results)
+                                                 if count])
+        else:
+            with open(output_file_path, 'w', encoding='utf-8') as outfile:
+                if not ndjson_output:
+                    outfile.write('[\n')
+                first = True
+                for part_path, (count, _, _) in zip(part_paths, results):
+                    if not count:
+                        continue
+                    if not ndjson_output and not first:
+                        outfile.write(',\n')
+                    with open(part_path, 'r', encoding='utf-8') as part:
+                        shutil.copyfileobj(part, outfile)
+                    first = False
+                if not ndjson_output:
+                    outfile.write('\n]' if not first else ']')
+
+    # Report per-file timing and record counts (the workers' metrics are recorded here,
+    # since each worker process has its own registry)
+    report = [(os.path.basename(file_path), count, seconds, error)
+              for file_path, (count, seconds, error) in zip(source_files, results)]
+    for (filename, count, seconds, error), file_path in zip(report, source_files):
+        source = source_name(file_path)
+        metrics.observe('combine_source_seconds', seconds, source=source)
+        if error:
+            print(f"Error loading {filename}: {error}")
+            metrics.count('source_errors_total', source=source)
+        else:
+            print(f"{filename}: {count} records in {seconds:.3f}s")
+            metrics.count('records_emitted_total', count, source=source)
+    total_records = sum(count for _, count, _, _ in report)
+    print(f"Combined {total_records} records from {len(report)} files in {time.perf_counter() - start_time:.3f}s")
+    print(f"Combined data written to {output_file_path}")
+    return report
 
-    # Write the combined data to a single JSON file in the SQL directory
-    with open(output_file_path, 'w', encoding='utf-8') as outfile:
-        json.dump(combined_data, outfile, ensure_ascii=False, indent=4)
-    
-    print(f"Combined JSON data written to {output_file_path}")
+if __name__ == '__main__':
+    # Set the input directory to the absolute path of Raw_Data
+    current_dir = os.path.dirname(os.path.abspath(__file__))  # Get the current script directory
+    input_directory = os.path.join(current_dir, '..', 'Raw_Data')  # Correctly construct the path to Raw_Data
 
-# Set the input directory to the absolute path of Raw_Data
-current_dir = os.path.dirname(os.path.abspath(__file__))  # Get the current script directory
-input_directory = os.path.join(current_dir, '..', 'Raw_Data')  # Correctly construct the path to Raw_Data
-output_file = 'combined_data.json'  # Output file name
+    # Output file name (pass --ndjson to stream newline-delimited JSON instead of one big array,
+    # or --parquet to write a compressed columnar file, see columnar.py)
+    if '--parquet' in sys.argv:
+        output_file = 'combined_data.parquet'
+    elif '--ndjson' in sys.argv:
+        output_file = 'combined_data.ndjson'
+    else:
+        output_file = 'combined_data.json'
 
-combine_json_files(input_directory, output_file)
+    combine_json_files(input_directory, output_file)
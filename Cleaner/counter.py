@@ -1,40 +1,363 @@
-import json
+"""
+Aggregation engine: counts events along several dimensions in one pass.
+
+The records are streamed once (in batches of BATCH_SIZE), and every requested
+breakdown is updated from the same batch:
+    source     The source file an event came from.
+    location   The suburb or region the location resolves to (see
+               Cleaner/locations.py), so "Pub in Newtown" and "1 King St,
+               Newtown NSW 2042" are counted together; placeholders such as
+               "N/A", "TBA" or "Online" count as unknown, and other locations
+               are normalized text.
+    state      The state the location resolves to.
+    month      The month the event starts in (YYYY-MM), from the standardized
+               date if the data is cleaned, else by parsing the scraped date.
+    price      'Free', 'Paid' or 'Unknown'.
+Dimensions can be combined with '*' (e.g. 'source*month') for cross-tabs.
+
+The input can be any stage's output, JSON, NDJSON or Parquet (only the
+columns the dimensions need are read, see columnar.py), or the events table
+of a SQLite database (which has no source, scraped date or price, so only
+the location, state and month breakdowns are computed there). Every
+breakdown comes out of one read, so a dashboard can be served from a single
+--output snapshot instead of reloading the dataset for each metric.
+
+Usage:
+    python Cleaner/counter.py                               Newest SQL/combined_data .json/.ndjson/.parquet
+    python Cleaner/counter.py SQL/cleaned_combined_data.parquet
+    python Cleaner/counter.py --sqlite SQL/events.db
+    python Cleaner/counter.py --dimensions source,source*month --output aggregates.json
+"""
 import os
+import re
+import sys
+import json
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+
+import pandas as pd
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Cleaner.combine import iter_events, newest_file
+from Cleaner.dates import RANGE_SEPARATOR, standardize_dates
+from Cleaner.locations import record_state, resolve_location
+from events import CORE_FIELDS, EVENT_COLUMNS, Event
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQL_DIRECTORY = os.path.join(PROJECT_ROOT, 'SQL')
+
+# Records aggregated at a time (dates are parsed once per batch, for its distinct strings)
+BATCH_SIZE = 10000
+
+# Breakdowns computed when none are requested
+DEFAULT_DIMENSIONS = ('source', 'location', 'state', 'month', 'price')
+
+# Keys used when a record has no value for a dimension
+UNKNOWN_SOURCE = 'Unknown'
+UNKNOWN_LOCATION = 'Unknown Location'
+UNKNOWN_STATE = 'Unknown'
+UNDATED = 'Undated'
+UNKNOWN_PRICE = 'Unknown'
+
+# Trailing parts of a location that do not tell places apart: states, the country and postcodes
+_STATES = ('new south wales', 'victoria', 'queensland', 'south australia', 'western australia',
+           'tasmania', 'northern territory', 'australian capital territory',
+           'nsw', 'vic', 'qld', 'sa', 'wa', 'tas', 'nt', 'act', 'australia', 'au')
+_LOCATION_SUFFIX = re.compile(r'(?:[\s,]+(?:' + '|'.join(_STATES) + r'|\d{4}))+$')
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+# Locations that name no place (lowercase, punctuation as spaces): counted as UNKNOWN_LOCATION
+# rather than as a place called "N A" or "Online"
+PLACEHOLDER_LOCATIONS = frozenset((
+    '', 'n a', 'na', 'none', 'null', 'unknown', 'tba', 'tbc', 'tbd', 'to be announced',
+    'to be confirmed', 'to be determined', 'location tba', 'location tbc', 'online', 'online event',
+    'virtual', 'various', 'various locations', 'multiple locations', 'failed to scrape'))
+
+
+@lru_cache(maxsize=65536)
+def is_placeholder_location(location):
+    """Returns True if a location is empty or a placeholder such as 'N/A', 'TBA' or 'Online'."""
+    return ' '.join(re.sub(r'[^\w\s]+', ' ', location.lower()).split()) in PLACEHOLDER_LOCATIONS
+
+
+@lru_cache(maxsize=65536)
+def normalize_location(location):
+    """
+    Normalizes a location that the gazetteer cannot resolve for counting (placeholders
+    never get here, see is_placeholder_location): lowercases
+    it, strips punctuation and any trailing state, country or postcode, and
+    title-cases the rest.
+    Parameters:
+        location (str): The location as scraped.
+    Returns:
+        str: The normalized location ('' if nothing is left).
+    """
+    text = re.sub(r'[^\w\s,]+', ' ', location.lower())
+    text = _LOCATION_SUFFIX.sub('', ' '.join(text.split())).strip(' ,')
+    return text.title()
+
+
+def _resolve(event):
+    # Resolved as the cleaner does, with the state the event is otherwise known to be in
+    return resolve_location(event.location, record_state(event.extras, event.source))
+
+
+def _location_key(event):
+    location = event.location
+    if not isinstance(location, str) or is_placeholder_location(location):
+        return UNKNOWN_LOCATION
+    place = _resolve(event)
+    if place and (place.suburb or place.region):
+        return place.suburb or place.region
+    return normalize_location(location) or UNKNOWN_LOCATION
+
+
+def _state_key(event):
+    if not isinstance(event.location, str) or is_placeholder_location(event.location):
+        return UNKNOWN_STATE
+    place = _resolve(event)
+    return place.state if place else UNKNOWN_STATE
+
+
+def _price_bucket(price):
+    if not isinstance(price, str) or not price.strip():
+        return UNKNOWN_PRICE
+    if 'free' in price.lower():
+        return 'Free'
+    return 'Paid' if re.search(r'\d', price) else UNKNOWN_PRICE
+
+
+class _MonthResolver:
+    """Resolves events to the month they start in, parsing each distinct scraped date string once."""
+
+    def __init__(self):
+        self.months = {}
+
+    def __call__(self, events):
+        # The standardized start date of cleaned data, else the scraped date or the start of a date range
+        values = []
+        for event in events:
+            value = event.date_start or event.date
+            if not value and isinstance(event.date_range, str):
+                value = re.split(RANGE_SEPARATOR, event.date_range, maxsplit=1)[0]
+            values.append((event.source, value if isinstance(value, str) else None))
 
-def count_entries(json_file):
-    # Read the combined JSON file
+        # Parse the strings not seen before, one vectorized call per source (see Cleaner/dates.py)
+        pending = {}
+        for source, value in values:
+            if value and (source, value) not in self.months:
+                if _ISO_DATE.match(value):
+                    self.months[source, value] = value[:7]
+                else:
+                    pending.setdefault(source, set()).add(value)
+        for source, strings in pending.items():
+            strings = sorted(strings)
+            standardized = standardize_dates(pd.Series(strings, dtype=object), source)
+            for value, iso in zip(strings, standardized):
+                self.months[source, value] = iso[:7] if isinstance(iso, str) and _ISO_DATE.match(iso) else UNDATED
+
+        return [self.months[source, value] if value else UNDATED for source, value in values]
+
+
+# Each dimension: the fields it reads, and a function from a batch of events to their keys
+DIMENSIONS = {
+    'source': (('source',), lambda events: [event.source or UNKNOWN_SOURCE for event in events]),
+    'location': (('location', 'source', 'state', 'postcode'), lambda events: [_location_key(event) for event in events]),
+    'state': (('location', 'source', 'state', 'postcode'), lambda events: [_state_key(event) for event in events]),
+    'month': (('date_start', 'date', 'date_range', 'source'), None),
+    'price': (('price',), lambda events: [_price_bucket(event.get('price')) for event in events]),
+}
+
+
+class Aggregator:
+    """
+    Counts events along several dimensions at once.
+
+    Usage:
+        aggregator = Aggregator(['source', 'location', 'source*month'])
+        aggregator.add(events)          # Any number of times
+        aggregator.counts['location']   # Counter of suburb or region -> events
+    """
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        """
+        Parameters:
+            dimensions (iterable): Names from DIMENSIONS, or several joined with '*'
+                (counted by tuple of keys).
+        """
+        self.dimensions = list(dimensions)
+        self.parts = {dimension: dimension.split('*') for dimension in self.dimensions}
+        unknown = {part for parts in self.parts.values() for part in parts} - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimension(s): {', '.join(sorted(unknown))}. Choose from: {', '.join(DIMENSIONS)}")
+        # Each dimension's key function (the month resolver keeps its cache across batches)
+        self.key_functions = {name: function or _MonthResolver() for name, (_, function) in DIMENSIONS.items()}
+        self.counts = {dimension: Counter() for dimension in self.dimensions}
+        self.total = 0
+
+    def fields(self):
+        """Returns the event fields the dimensions read."""
+        return list(dict.fromkeys(field for parts in self.parts.values() for part in parts
+                                  for field in DIMENSIONS[part][0]))
+
+    def add(self, events):
+        """
+        Adds a batch of events to every breakdown.
+        Parameters:
+            events (list): Event objects.
+        """
+        # Compute each dimension's keys once, even when it is part of several breakdowns
+        keys = {part: self.key_functions[part](events) for part in dict.fromkeys(
+            part for parts in self.parts.values() for part in parts)}
+        for dimension, parts in self.parts.items():
+            if len(parts) == 1:
+                self.counts[dimension].update(keys[parts[0]])
+            else:
+                self.counts[dimension].update(zip(*(keys[part] for part in parts)))
+        self.total += len(events)
+
+    def to_dict(self):
+        """Returns the total and every breakdown (most common first) as a JSON-serializable dict."""
+        return {
+            'total': self.total,
+            'breakdowns': {dimension: [{'key': '*'.join(key) if isinstance(key, tuple) else key, 'count': count}
+                                       for key, count in counts.most_common()]
+                           for dimension, counts in self.counts.items()},
+        }
+
+
+def iter_database_events(database_path, fields=None):
+    """
+    Streams the events of the events table in a SQLite database (see SQL/db_backends.py).
+    Parameters:
+        database_path (str): The SQLite file.
+        fields (list): Fields needed; only the table's columns among them are selected.
+    """
+    connection = sqlite3.connect(database_path)
+    try:
+        table_columns = [row[1] for row in connection.execute("PRAGMA table_info(events)")]
+        columns = [column for column in table_columns if column in CORE_FIELDS and (not fields or column in fields)]
+        if not columns:
+            return
+        cursor = connection.execute(f"SELECT {', '.join(columns)} FROM events")
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield Event(**dict(zip(columns, row)))
+    finally:
+        connection.close()
+
+
+def aggregate(events, dimensions=DEFAULT_DIMENSIONS, aggregator=None):
+    """
+    Runs every breakdown over a stream of events in one pass.
+    Parameters:
+        events (iterable): Event objects (e.g. from Cleaner.combine.iter_events or iter_database_events).
+        dimensions (iterable): Breakdowns to compute (see Aggregator).
+        aggregator (Aggregator): Adds to this aggregator instead of a new one.
+    Returns:
+        Aggregator: The counts.
+    """
+    aggregator = aggregator or Aggregator(dimensions)
+    batch = []
+    for event in events:
+        batch.append(event)
+        if len(batch) >= BATCH_SIZE:
+            aggregator.add(batch)
+            batch = []
+    if batch:
+        aggregator.add(batch)
+    return aggregator
+
+
+def count_entries(json_file, dimensions=DEFAULT_DIMENSIONS):
+    """
+    Counts the events of a JSON, NDJSON or Parquet file and prints every breakdown.
+    Parameters:
+        json_file (str): The file to count.
+        dimensions (iterable): Breakdowns to compute (see Aggregator).
+    Returns:
+        tuple: (total entries, Counter of events per suburb or region), or None if
+            the file cannot be read. Every breakdown is in Aggregator.counts.
+    """
     if not os.path.exists(json_file):
         print(f"File {json_file} not found.")
-        return
+        return None
 
-    with open(json_file, 'r', encoding='utf-8') as file:
-        try:
-            data = json.load(file)
-        except json.JSONDecodeError as e:
-            print(f"Error reading {json_file}: {e}")
-            return
+    aggregator = Aggregator(dimensions)
+    try:
+        aggregate(iter_events(json_file, aggregator.fields()), aggregator=aggregator)
+    except json.JSONDecodeError as e:
+        print(f"Error reading {json_file}: {e}")
+        return None
+
+    print_breakdowns(aggregator)
+    return aggregator.total, aggregator.counts.get('location', Counter())
+
+
+def print_breakdowns(aggregator, limit=None):
+    """Prints the total and each breakdown (the `limit` most common keys of each, if given)."""
+    print(f"Total entries: {aggregator.total}")
+    for dimension, breakdown in aggregator.to_dict()['breakdowns'].items():
+        print(f"\n{dimension.title()} counts:")
+        for entry in breakdown[:limit]:
+            print(f"{entry['key']}: {entry['count']}")
 
-    # Check if the data is a list of entries
-    if not isinstance(data, list):
-        print("Invalid data format. Expected a list of entries.")
-        return
 
-    total_entries = len(data)
-    print(f"Total entries: {total_entries}")
+def database_dimensions(dimensions):
+    """Returns the dimensions that the events table can answer (it has no source or price columns)."""
+    return [dimension for dimension in dimensions
+            if all(set(DIMENSIONS[part][0]) & set(EVENT_COLUMNS) for part in dimension.split('*'))]
 
-    # Optional: Count occurrences of specific keys or attributes
-    location_count = {}
-    for entry in data:
-        location = entry.get("location", "Unknown Location")
-        location_count[location] = location_count.get(location, 0) + 1
 
-    print(f"\nLocation Counts:")
-    for loc, count in location_count.items():
-        print(f"{loc}: {count}")
-    
-    return total_entries, location_count
+def save_breakdowns(aggregator, output_file):
+    """Writes the total and every breakdown to a JSON file (see Aggregator.to_dict)."""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(aggregator.to_dict(), f, indent=4, ensure_ascii=False)
+    print(f"Breakdowns saved to {output_file}")
+
+
+# Command-line options that take a value
+OPTIONS = ('--dimensions', '--sqlite', '--output')
+
+
+def parse_arguments(argv):
+    """Returns ({option: value}, positional arguments) from the command line."""
+    options, positional = {}, []
+    arguments = iter(argv[1:])
+    for argument in arguments:
+        if argument in OPTIONS:
+            options[argument] = next(arguments, None)
+        else:
+            positional.append(argument)
+    return options, positional
+
 
-# Example usage:
 if __name__ == '__main__':
-    combined_json_file = os.path.join(os.path.dirname(__file__), 'combined_data.json')
-    count_entries(combined_json_file)
+    options, positional = parse_arguments(sys.argv)
+    dimensions = (options.get('--dimensions') or ','.join(DEFAULT_DIMENSIONS)).split(',')
+
+    if options.get('--sqlite'):
+        database_path = options['--sqlite']
+        aggregator = Aggregator(database_dimensions(dimensions))
+        print(f"Counting the events table of {database_path} ({', '.join(aggregator.dimensions)})")
+        events = iter_database_events(database_path, aggregator.fields())
+    else:
+        # The file given on the command line, else the newest output of combine.py
+        input_file = positional[0] if positional else newest_file(
+            [os.path.join(SQL_DIRECTORY, f"combined_data{extension}") for extension in ('.json', '.ndjson', '.parquet')])
+        if not os.path.exists(input_file):
+            print(f"File {input_file} not found.")
+            sys.exit(1)
+        aggregator = Aggregator(dimensions)
+        print(f"Counting {input_file}")
+        events = iter_events(input_file, aggregator.fields())
+
+    aggregate(events, aggregator=aggregator)
+    print_breakdowns(aggregator)
+    if options.get('--output'):
+        save_breakdowns(aggregator, options['--output'])
@@ -0,0 +1,306 @@
+"""
+Batched date normalization for the cleaner.
+
+Instead of trying every format on every row, each column is reduced to its
+distinct strings, the strings are grouped by their shape (letters -> 'a',
+digits -> '9'), and each group is parsed in one vectorized pandas call per
+format known for its source and shape. Strings of one shape can need several
+formats ("1 Sep" and "12 October" are both '9 a'), so the strings none of the
+known formats parses are used to infer another one. Results are mapped back
+onto the column, so repeated strings cost nothing extra.
+
+Most scraped dates have no year ("Sun, 20 Oct, 11:30 am", "5 Oct"). The year
+is taken from the weekday when there is one (the matching year closest to the
+reference date), and otherwise is the reference year unless that would put
+the date more than ROLLOVER_DAYS in the past, in which case it is next year.
+
+Every dated record also gets the interval it covers, as ISO 'date_start' and
+'date_end' days, whichever shape its dates came in:
+    date_range   "1 Sep - 30 Sep" (Yappack)
+    description  "Fri, 15 Nov, 10am - 16 Nov, 12pm NZDT" (Humanitix packs the
+                 event's times into its description)
+    date         "Sun, 20 Oct, 11:30 am" (Eventbrite): a single day
+An end without a year is the first such day on or after the start.
+"""
+import re
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Candidate formats, in the order they are tried for each (source, string shape)
+DATE_FORMATS = [
+    "%a, %d %b %Y", "%a, %d %b, %Y", "%d %b %Y", "%b %d, %Y",
+    "%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y", "%m-%d-%Y",
+    "%A, %d %B %Y", "%A, %B %d, %Y",
+    # Eventbrite cards: "Sun, 20 Oct, 11:30 am", "Sat, Oct 12, 9:00 AM"
+    "%a, %d %b, %I:%M %p", "%a, %b %d, %I:%M %p", "%a, %d %b",
+    # Yappack date ranges: "1 Sep", "12 October"
+    "%d %b", "%d %B",
+    # Eventbrite events later this week: "Sunday at 10:00 PM"
+    "%A at %I:%M %p", "%a at %I:%M %p",
+]
+
+# Suffix Eventbrite adds to recurring events, e.g. "Tue, 29 Oct, 8:00 pm + 4 more"
+RECURRENCE_SUFFIX = re.compile(r'\s*\+\s*\d+\s+more$')
+
+# Separator between the start and end of a Yappack date range ("1 Sep - 30 Sep")
+RANGE_SEPARATOR = r'\s+-\s+'
+
+# A Humanitix description holding only the event's times: "Sun, 17 Nov, 11am - 12pm AEDT",
+# "Fri, 15 Nov, 10am - 16 Nov, 12pm NZDT", "Fri, 14 Feb 2025, 3am - 4:30am UTC"
+DESCRIPTION_DATES = re.compile(
+    r'^(?P<start>[A-Za-z]+, \d{1,2} [A-Za-z]+(?: \d{4})?), \d{1,2}(?::\d{2})?\s?[ap]m\s+-\s+'
+    r'(?:(?P<end>\d{1,2} [A-Za-z]+(?: \d{4})?), )?\d{1,2}(?::\d{2})?\s?[ap]m(?:\s+[A-Z]{2,5})?$', re.IGNORECASE)
+
+# An ISO date, as standardize_dates writes it
+ISO_DATE = r'^\d{4}-\d{2}-\d{2}$'
+
+# Four-digit year in a date string
+_YEAR = re.compile(r'\b\d{4}\b')
+
+# Dates without a year or weekday further than this in the past are assumed to be next year
+ROLLOVER_DAYS = 60
+
+# Weekday names and abbreviations -> Monday=0 ... Sunday=6
+WEEKDAYS = {name.lower(): index for index in range(7)
+            for name in (date(2024, 1, 1 + index).strftime('%A'), date(2024, 1, 1 + index).strftime('%a'))}
+
+# Formats found to parse strings of each (source, shape), kept in DATE_FORMATS order
+_format_cache = {}
+
+# Strings of each (source, shape) that no candidate format parses, so they are not tried again
+_unparsed_cache = {}
+
+
+def _strings_only(series):
+    """Returns the column as objects with non-string values replaced by None (checked once per distinct value)."""
+    codes, distinct = pd.factorize(series.astype(object))
+    kept = np.array([value if isinstance(value, str) else None for value in distinct] + [None], dtype=object)
+    return pd.Series(kept[codes], index=series.index, dtype=object)
+
+
+def string_shape(values):
+    """Reduces strings to their shape, e.g. 'Sun, 20 Oct, 11:30 am' -> 'a, 9 a, 9:9 a'."""
+    return values.str.replace(r'[A-Za-z]+', 'a', regex=True).str.replace(r'\d+', '9', regex=True)
+
+
+def _matches(value, date_format):
+    # Formats without a year are checked against a leap year so that "29 Feb" is accepted
+    if '%Y' not in date_format:
+        value, date_format = f"2000 {value}", f"%Y {date_format}"
+    try:
+        datetime.strptime(value, date_format)
+        return True
+    except ValueError:
+        return False
+
+
+def known_formats(source, shape):
+    """Returns the formats found so far to parse strings of a shape (see infer_format)."""
+    return _format_cache.get((source, shape), [])
+
+
+def infer_format(source, shape, samples):
+    """
+    Finds the first candidate format not yet known for the (source, shape) that
+    parses any of the sample strings, and adds it to the known formats, so
+    inference runs once per pattern rather than once per row.
+    Parameters:
+        source (str): Source the strings come from.
+        shape (str): Their shape (see string_shape).
+        samples (list): The strings that none of the known formats parses.
+    Returns:
+        str: The new format, or None if no other candidate parses any sample (the
+            samples are then remembered and skipped from then on).
+    """
+    key = (source, shape)
+    formats = _format_cache.setdefault(key, [])
+    unparsed = _unparsed_cache.setdefault(key, set())
+    samples = [sample for sample in samples if sample not in unparsed]
+    for date_format in DATE_FORMATS:
+        if date_format not in formats and any(_matches(sample, date_format) for sample in samples):
+            formats.append(date_format)
+            formats.sort(key=DATE_FORMATS.index)
+            return date_format
+    unparsed.update(samples)
+    return None
+
+
+def _parse_group(values, date_format, reference):
+    """Parses strings that share one format, resolving missing years against the reference date."""
+    if '%Y' in date_format:
+        return pd.to_datetime(values, format=date_format, errors='coerce')
+
+    weekday = values.str.extract(r'^([A-Za-z]+)', expand=False).str.lower().map(WEEKDAYS) \
+        if date_format.startswith(('%a', '%A')) else None
+
+    if '%d' not in date_format:
+        # Weekday only ("Sunday at 10:00 PM"): the next such day on or after the reference date
+        return reference + pd.to_timedelta((weekday - reference.weekday()) % 7, unit='D')
+
+    parsed = pd.to_datetime("2000 " + values, format=f"%Y {date_format}", errors='coerce')
+    month, day = parsed.dt.month, parsed.dt.day
+    offsets = (0, 1, -1, 2, -2, 3, -3, 4, -4, 5, -5, 6, -6) if weekday is not None else (0, 1)
+
+    result = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for offset in offsets:
+        candidate = pd.to_datetime(pd.DataFrame({'year': reference.year + offset, 'month': month, 'day': day}),
+                                   errors='coerce')
+        if weekday is not None:
+            valid = candidate.dt.weekday == weekday
+        else:
+            valid = candidate >= reference - pd.Timedelta(days=ROLLOVER_DAYS)
+        result = result.fillna(candidate.where(valid))
+    return result
+
+
+def parse_dates(series, source=None, reference=None):
+    """
+    Parses a column of date strings into timestamps.
+    Parameters:
+        series (Series): The values to parse (non-strings are treated as missing).
+        source (str): Source the values come from; formats are inferred per source.
+        reference (date): Date used to resolve missing years (defaults to today).
+    Returns:
+        Series: Timestamps aligned with `series` (NaT where nothing matched).
+    """
+    reference = pd.Timestamp(reference or date.today()).normalize()
+
+    # Work on the distinct strings only (missing values get code -1)
+    codes, distinct = pd.factorize(_strings_only(series))
+    distinct = pd.Series(distinct, dtype=object)
+    cleaned = distinct.str.strip().str.replace(RECURRENCE_SUFFIX, '', regex=True)
+    parsed = pd.Series(pd.NaT, index=distinct.index, dtype='datetime64[ns]')
+
+    for shape, group in cleaned.groupby(string_shape(cleaned)):
+        # Each known format parses the strings still left, in DATE_FORMATS order, and the
+        # strings none of them parses may need another format
+        remaining, tried = group, set()
+        while len(remaining):
+            date_format = next((date_format for date_format in known_formats(source, shape)
+                                if date_format not in tried), None)
+            if date_format is None:
+                date_format = infer_format(source, shape, remaining.tolist())
+                if date_format is None:
+                    break
+            tried.add(date_format)
+            result = _parse_group(remaining, date_format, reference)
+            parsed[remaining.index] = result
+            remaining = remaining[result.isna()]
+
+    # Map the results back onto the column; the extra NaT at the end is picked up by code -1
+    lookup = np.append(parsed.to_numpy(), np.datetime64('NaT', 'ns'))
+    return pd.Series(lookup[codes], index=series.index)
+
+
+def standardize_dates(series, source=None, reference=None):
+    """
+    Standardizes a column of dates to ISO 8601 (YYYY-MM-DD).
+    Parameters:
+        series (Series): The values to standardize.
+        source (str): Source the values come from (see parse_dates).
+        reference (date): Date used to resolve missing years (see parse_dates).
+    Returns:
+        Series: 'YYYY-MM-DD' strings, the original string where no format matched,
+            or None for values that are not strings.
+    """
+    parsed = parse_dates(series, source, reference)
+    standardized = parsed.dt.strftime('%Y-%m-%d').astype(object)
+    return standardized.where(parsed.notna(), _strings_only(series))
+
+
+def parse_interval(starts, ends, source=None, reference=None):
+    """
+    Parses the start and end strings of intervals.
+    A missing end is the start. An end without a year ("3 Jan") is the first such
+    day on or after the start, so "28 Dec - 3 Jan" ends the following year.
+    Parameters:
+        starts (Series): The start strings.
+        ends (Series): The end strings (missing values are the start).
+        source (str): Source the values come from (see parse_dates).
+        reference (date): Date used to resolve missing years (see parse_dates).
+    Returns:
+        DataFrame: 'date_start' and 'date_end' columns of timestamps.
+    """
+    ends = ends.fillna(starts)
+    start = parse_dates(starts, source, reference)
+    end = parse_dates(ends, source, reference)
+    yearless = ~_strings_only(ends).str.contains(_YEAR, na=False)
+    in_start_year = pd.to_datetime(pd.DataFrame({'year': start.dt.year, 'month': end.dt.month, 'day': end.dt.day}),
+                                   errors='coerce')
+    in_start_year = in_start_year.where(~(in_start_year < start), in_start_year + pd.DateOffset(years=1))
+    end = end.where(~(yearless & in_start_year.notna()), in_start_year)
+    end = end.where(~(end < start), end + pd.DateOffset(years=1))
+    return pd.DataFrame({'date_start': start, 'date_end': end}, index=starts.index)
+
+
+def split_date_range(series, source=None, reference=None):
+    """
+    Splits "start - end" date ranges into parsed start and end dates.
+    A single date ("5 Oct") is both the start and the end (see parse_interval).
+    Parameters:
+        series (Series): The date range strings.
+        source (str): Source the values come from (see parse_dates).
+        reference (date): Date used to resolve missing years (see parse_dates).
+    Returns:
+        DataFrame: 'date_start' and 'date_end' columns of timestamps.
+    """
+    parts = _strings_only(series).str.split(RANGE_SEPARATOR, n=1, regex=True, expand=True).reindex(columns=[0, 1])
+    return parse_interval(parts[0], parts[1], source, reference)
+
+
+def split_description_dates(series, source=None, reference=None):
+    """
+    Parses the interval of descriptions that hold only an event's times (see
+    DESCRIPTION_DATES); other descriptions get no dates.
+    Parameters:
+        series (Series): The descriptions.
+        source (str): Source the values come from (see parse_dates).
+        reference (date): Date used to resolve missing years (see parse_dates).
+    Returns:
+        DataFrame: 'date_start' and 'date_end' columns of timestamps.
+    """
+    parts = _strings_only(series).str.strip().str.extract(DESCRIPTION_DATES)
+    return parse_interval(parts['start'], parts['end'], source, reference)
+
+
+def _fill_interval(df, index, bounds):
+    """Sets date_start and date_end of the rows in `index` that have no interval yet and have one in `bounds`."""
+    missing = df.loc[index, 'date_start'].isna() if 'date_start' in df.columns else pd.Series(True, index=index)
+    rows = bounds.index[missing.to_numpy() & bounds['date_start'].notna().to_numpy()]
+    for column in ('date_start', 'date_end'):
+        df.loc[rows, column] = bounds.loc[rows, column].dt.strftime('%Y-%m-%d').astype(object)
+
+
+def standardize_date_columns(df, reference=None):
+    """
+    Standardizes the 'date' column and sets the 'date_start' / 'date_end' interval
+    (ISO strings) of every dated record, from its date range, else the dates in its
+    description, else its date (see the module docstring). Each source is processed
+    separately when a 'source' column exists.
+    Parameters:
+        df (DataFrame): The event data.
+        reference (date): Date used to resolve missing years (see parse_dates).
+    Returns:
+        DataFrame: A copy of df with the standardized columns.
+    """
+    df = df.copy()
+    groups = df.groupby('source', dropna=False).groups if 'source' in df.columns else {None: df.index}
+
+    for source, index in groups.items():
+        source = None if pd.isna(source) else source
+        if 'date' in df.columns:
+            df.loc[index, 'date'] = standardize_dates(df.loc[index, 'date'], source, reference)
+        if 'date_range' in df.columns:
+            bounds = split_date_range(df.loc[index, 'date_range'], source, reference)
+            for column in ('date_start', 'date_end'):
+                df.loc[index, column] = bounds[column].dt.strftime('%Y-%m-%d').astype(object) \
+                    .where(bounds[column].notna(), None)
+        if 'description' in df.columns:
+            _fill_interval(df, index, split_description_dates(df.loc[index, 'description'], source, reference))
+        if 'date' in df.columns:
+            days = pd.to_datetime(df.loc[index, 'date'].where(df.loc[index, 'date'].astype(str).str.match(ISO_DATE)),
+                                  format='%Y-%m-%d', errors='coerce')
+            _fill_interval(df, index, pd.DataFrame({'date_start': days, 'date_end': days}))
+    return df
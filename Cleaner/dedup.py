@@ -0,0 +1,379 @@
+"""
+Fuzzy cross-source deduplication for the cleaner.
+
+Titles and locations are normalized (case, accents, punctuation, Yappack's
+"View:" prefix), and records are grouped in three steps:
+    1. Records that share a link, or share a normalized title, date and
+       location, are exact duplicates.
+    2. The remaining distinct titles are blocked with MinHash/LSH over
+       character 3-grams, so only titles that land in the same bucket are
+       ever compared. This keeps dedup sub-quadratic in the number of records.
+    3. Candidate pairs are kept when their 3-gram Jaccard similarity reaches
+       the threshold, their dates agree (or one is unknown) and their
+       locations share a word (or one is unknown). A location is compared by
+       its resolved suburb or region where the cleaner found one (see
+       Cleaner/locations.py), so "Pub in Newtown" and "Pub in Enmore" differ.
+       Records with the same title but a different date or location are
+       checked the same way, so an exact title is never weaker evidence than
+       a similar one.
+Each cluster is merged into one canonical record (the most complete one, with
+missing fields and extras filled from the others) that lists the sources it
+came from. Ties are broken by a hash of each record's content, never by the
+order of the records, since scraped listings reorder on every run.
+"""
+import json
+import zlib
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Minimum 3-gram Jaccard similarity for two titles to be the same event
+SIMILARITY_THRESHOLD = 0.8
+
+# MinHash signature length, split into LSH bands of BAND_ROWS rows each.
+# 16 bands x 4 rows makes titles with a similarity of roughly 0.5 or more likely to share a bucket.
+NUM_PERMUTATIONS = 64
+BAND_ROWS = 4
+
+# Prime modulus for the MinHash permutations (larger than any 32-bit shingle hash)
+_PRIME = 4294967311
+_random = np.random.default_rng(20241012)
+_PERMUTATION_A = _random.integers(1, 2 ** 31, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _random.integers(0, 2 ** 31, NUM_PERMUTATIONS, dtype=np.uint64)
+
+# ISO date produced by Cleaner/dates.py; anything else in 'date' ("Sales end soon") is not a date
+ISO_DATE = r'^\d{4}-\d{2}-\d{2}$'
+
+
+def normalize_text(series):
+    """
+    Normalizes free text for comparison: strips accents and the "View:" prefix,
+    lowercases, and turns punctuation into single spaces.
+    Parameters:
+        series (Series): Titles or locations.
+    Returns:
+        Series: Normalized strings ('' for missing values).
+    """
+    text = series.where(series.notna(), '').astype(str)
+    text = text.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii').str.lower()
+    text = text.str.replace(r'^view:\s*', '', regex=True)
+    return text.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+
+
+def event_dates(df):
+    """Returns the best known date of each record ('date_start', else an ISO 'date'), or '' if none."""
+    when = pd.Series('', index=df.index, dtype=object)
+    for column in ('date', 'date_start'):
+        if column in df.columns:
+            values = df[column].where(df[column].astype(str).str.match(ISO_DATE), None)
+            when = values.where(values.notna(), when)
+    return when
+
+
+def shingles(text):
+    """Character 3-grams of a normalized string (the string itself if shorter)."""
+    return {text[i:i + 3] for i in range(len(text) - 2)} or {text}
+
+
+# Number of titles hashed per vectorized MinHash batch (bounds the size of the hash matrix)
+MINHASH_BATCH_SIZE = 2048
+
+
+def minhash_signatures(shingle_sets):
+    """
+    Returns the MinHash signatures of a list of shingle sets.
+    Parameters:
+        shingle_sets (list): Sets of shingles, one per title.
+    Returns:
+        ndarray: One row of NUM_PERMUTATIONS values per set.
+    """
+    signatures = np.empty((len(shingle_sets), NUM_PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(shingle_sets), MINHASH_BATCH_SIZE):
+        batch = shingle_sets[start:start + MINHASH_BATCH_SIZE]
+        # Hash every shingle of the batch into one flat array; offsets mark where each set starts
+        sizes = np.fromiter((len(shingle_set) for shingle_set in batch), dtype=np.int64, count=len(batch))
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle_set in batch for shingle in shingle_set),
+                             dtype=np.uint64, count=int(sizes.sum()))
+        permuted = (np.outer(_PERMUTATION_A, hashes) + _PERMUTATION_B[:, None]) % _PRIME
+        signatures[start:start + len(batch)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+def _band_keys(shingle_sets):
+    # Fold each band of BAND_ROWS signature values into one key (a collision only adds a
+    # candidate, which the exact Jaccard check rejects)
+    signatures = minhash_signatures(shingle_sets)
+    bands = signatures.reshape(len(shingle_sets), NUM_PERMUTATIONS // BAND_ROWS, BAND_ROWS)
+    band_keys = bands[:, :, 0].copy()
+    for row in range(1, BAND_ROWS):
+        band_keys = band_keys * np.uint64(1000003) ^ bands[:, :, row]
+    return band_keys
+
+
+def title_band_keys(titles):
+    """
+    Returns the LSH band keys of normalized titles: titles that share a key in the
+    same band are the candidate near-duplicates compared by similar_title_pairs.
+    Parameters:
+        titles (list): Normalized titles.
+    Returns:
+        ndarray: One row of NUM_PERMUTATIONS // BAND_ROWS keys per title.
+    """
+    return _band_keys([shingles(title) for title in titles])
+
+
+def similar_title_pairs(titles, threshold=SIMILARITY_THRESHOLD):
+    """
+    Finds pairs of distinct titles that are near-duplicates using MinHash/LSH.
+    Parameters:
+        titles (list): Distinct normalized titles.
+        threshold (float): Minimum 3-gram Jaccard similarity.
+    Returns:
+        set: Pairs (i, j) of indexes into `titles`, with i < j.
+    """
+    shingle_sets = [shingles(title) for title in titles]
+    band_keys = _band_keys(shingle_sets)
+
+    pairs = set()
+    for keys in band_keys.T:
+        # Titles sharing a bucket are runs of equal keys once sorted; only runs longer than one are compared
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        run_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        run_ends = np.r_[run_starts[1:], len(keys)]
+        shared = run_ends - run_starts > 1
+        for run_start, run_end in zip(run_starts[shared], run_ends[shared]):
+            members = sorted(order[run_start:run_end].tolist())
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    if (i, j) in pairs:
+                        continue
+                    a, b = shingle_sets[i], shingle_sets[j]
+                    if len(a & b) / len(a | b) >= threshold:
+                        pairs.add((i, j))
+    return pairs
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def _group_positions(keys):
+    """Returns the positions of each distinct key, skipping empty keys."""
+    groups = defaultdict(list)
+    for position, key in enumerate(keys):
+        if key:
+            groups[key].append(position)
+    return groups
+
+
+def _union_groups(union_find, groups):
+    for positions in groups.values():
+        for position in positions[1:]:
+            union_find.union(positions[0], position)
+
+
+def _locations(df):
+    """Returns each row's resolved suburb or region (see Cleaner/locations.py), else its scraped location."""
+    locations = df['location'] if 'location' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    if 'extras' not in df.columns:
+        return locations
+    resolved = [(extras.get('suburb') or extras.get('region')) if isinstance(extras, dict) else None
+                for extras in df['extras']]
+    return pd.Series([place or location for place, location in zip(resolved, locations)], index=df.index, dtype=object)
+
+
+def _comparison_keys(df):
+    """Returns the normalized titles, locations, best known dates and usable links ('' if none) of each row."""
+    size = len(df)
+    titles = normalize_text(df['title']).to_numpy(dtype=object) if 'title' in df.columns else np.full(size, '')
+    locations = normalize_text(_locations(df)).to_numpy(dtype=object)
+    when = event_dates(df).to_numpy(dtype=object)
+    links = np.full(size, '', dtype=object)
+    if 'link' in df.columns:
+        links = df['link'].where(df['link'].notna() & ~df['link'].isin(["N/A"]), '').to_numpy(dtype=object)
+    return titles, locations, when, links
+
+
+def _compatible(date_a, date_b, location_a, location_b):
+    """True if two records with similar titles are the same event: dates agree and locations share a word."""
+    dates_agree = not date_a or not date_b or date_a == date_b
+    locations_agree = not location_a or not location_b or bool(set(location_a.split()) & set(location_b.split()))
+    return dates_agree and locations_agree
+
+
+def cluster_duplicates(df, threshold=SIMILARITY_THRESHOLD):
+    """
+    Assigns every record to a duplicate cluster.
+    Parameters:
+        df (DataFrame): The event data.
+        threshold (float): Minimum title similarity for near-duplicates.
+    Returns:
+        ndarray: The cluster id (position of the cluster's first record) for each row.
+    """
+    size = len(df)
+    titles, locations, when, links = _comparison_keys(df)
+    union_find = _UnionFind(size)
+
+    # Step 1: exact duplicates (same link, or same normalized title, date and location)
+    _union_groups(union_find, _group_positions(links))
+    exact_groups = _group_positions((title, date, location) if title else None
+                                   for title, date, location in zip(titles, when, locations))
+    _union_groups(union_find, exact_groups)
+
+    # Step 2: block the distinct titles with MinHash/LSH
+    title_positions = defaultdict(list)
+    for (title, _, _), positions in exact_groups.items():
+        title_positions[title].append(positions[0])
+    distinct_titles = sorted(title_positions)
+
+    # Step 3: verify candidate pairs (the same or a similar title, compatible date and location)
+    for title in distinct_titles:
+        positions = title_positions[title]
+        for index, a in enumerate(positions):
+            for b in positions[index + 1:]:
+                if _compatible(when[a], when[b], locations[a], locations[b]):
+                    union_find.union(a, b)
+    for i, j in similar_title_pairs(distinct_titles, threshold):
+        for a in title_positions[distinct_titles[i]]:
+            for b in title_positions[distinct_titles[j]]:
+                if _compatible(when[a], when[b], locations[a], locations[b]):
+                    union_find.union(a, b)
+
+    return np.array([union_find.find(position) for position in range(size)])
+
+
+def find_matches(new_df, df, threshold=SIMILARITY_THRESHOLD, bands=None):
+    """
+    Finds the records of `df` that cluster_duplicates would pair directly with a
+    record of `new_df`, by the same rules: a shared link, or the same or a similar
+    title (in the same LSH bucket) with a compatible date and location. Used by the
+    incremental cleaner to tell which existing clusters a new record joins.
+    Parameters:
+        new_df (DataFrame): The new records.
+        df (DataFrame): The existing records to check.
+        threshold (float): Minimum title similarity for near-duplicates.
+        bands (list): The title band keys of each row of `df` (see title_band_keys),
+            if already known.
+    Returns:
+        set: Positions in `df` of the records that match a new record.
+    """
+    new_titles, new_locations, new_when, new_links = _comparison_keys(new_df)
+    titles, locations, when, links = _comparison_keys(df)
+    new_shingles = [shingles(title) for title in new_titles]
+    new_bands = _band_keys(new_shingles)
+    if bands is None:
+        bands = title_band_keys(titles.tolist())
+
+    by_link = _group_positions(new_links)
+    by_band = defaultdict(set)
+    for position, title in enumerate(new_titles):
+        if title:
+            for band, key in enumerate(new_bands[position]):
+                by_band[band, key].add(position)
+
+    matches = set()
+    for position, title in enumerate(titles):
+        if links[position] in by_link:
+            matches.add(position)
+            continue
+        if not title:
+            continue
+        candidates = set().union(*(by_band.get((band, key), ()) for band, key in enumerate(bands[position])))
+        title_shingles = shingles(title)
+        for candidate in candidates:
+            a = new_shingles[candidate]
+            similar = title == new_titles[candidate] or len(a & title_shingles) / len(a | title_shingles) >= threshold
+            if similar and _compatible(when[position], new_when[candidate],
+                                       locations[position], new_locations[candidate]):
+                matches.add(position)
+                break
+    return matches
+
+
+def deduplicate(df, threshold=SIMILARITY_THRESHOLD):
+    """
+    Merges duplicate and near-duplicate records into one canonical record per event
+    (see merge_clusters).
+    Parameters:
+        df (DataFrame): The event data.
+        threshold (float): Minimum title similarity for near-duplicates.
+    Returns:
+        DataFrame: One row per event, with provenance columns 'sources' (the
+            sources the event was found in) and 'duplicate_count' (records merged).
+    """
+    if df.empty:
+        return df.copy()
+    return merge_clusters(df, cluster_duplicates(df, threshold)).reset_index(drop=True)
+
+
+def content_ranks(df):
+    """
+    Ranks the rows of a DataFrame by a hash of their content, so rows can be ordered
+    the same way whatever order they come in (identical rows share a rank). Only the
+    values that are set are hashed, so a row hashes the same in any frame it is part of.
+    Returns:
+        ndarray: The rank of each row.
+    """
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    digests = [hashlib.sha1(json.dumps({field: value for field, value in record.items() if value is not None},
+                                       sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+               for record in records]
+    ranks = {digest: rank for rank, digest in enumerate(sorted(set(digests)))}
+    return np.array([ranks[digest] for digest in digests], dtype=np.int64)
+
+
+def merge_clusters(df, clusters):
+    """
+    Merges each cluster of records into one canonical record: the cluster's most
+    complete record, with any missing fields filled in from the other records in
+    the cluster. An 'extras' column of dicts (see events.py) is merged key by key
+    the same way. Records that are equally complete are taken in the order of their
+    content hash (see content_ranks), so the result does not depend on the order of
+    the rows.
+    Parameters:
+        df (DataFrame): The event data.
+        clusters (ndarray): The cluster id of each row (see cluster_duplicates).
+    Returns:
+        DataFrame: One row per cluster, indexed by cluster id, with provenance
+            columns 'sources' and 'duplicate_count'.
+    """
+    completeness = df.notna().sum(axis=1).to_numpy()
+
+    # Order each cluster most complete first, so groupby().first() picks its fields,
+    # then falls back to the other records for anything still missing
+    order = np.lexsort((content_ranks(df), -completeness, clusters))
+    ordered = df.iloc[order].reset_index(drop=True)
+    cluster_ids = clusters[order]
+
+    merged = ordered.groupby(cluster_ids, sort=True).first()
+    if 'source' in df.columns:
+        sources = defaultdict(set)
+        for cluster_id, source in zip(cluster_ids, ordered['source'].to_numpy(dtype=object)):
+            if isinstance(source, str):
+                sources[cluster_id].add(source)
+        merged['sources'] = [sorted(sources[cluster_id]) for cluster_id in merged.index]
+    if 'extras' in df.columns:
+        extras = defaultdict(dict)
+        for cluster_id, values in zip(cluster_ids, ordered['extras'].to_numpy(dtype=object)):
+            if isinstance(values, dict):
+                for key, value in values.items():
+                    extras[cluster_id].setdefault(key, value)
+        merged['extras'] = [extras[cluster_id] or None for cluster_id in merged.index]
+    merged['duplicate_count'] = ordered.groupby(cluster_ids, sort=True).size()
+    return merged
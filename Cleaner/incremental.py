@@ -0,0 +1,182 @@
+"""
+State of the incremental cleaner (cleaner.py --incremental).
+
+Every combined record is identified by a hash of its content. The state keeps,
+for every record cleaned so far, its date-standardized form, the duplicate
+cluster it belongs to and the LSH band keys of its title (see dedup.py), plus
+the merged record of every cluster, and indexes the records by link, by LSH
+bucket and by cluster so a run never scans them all. A run then only has to:
+    1. standardize the dates of records whose hash is new,
+    2. recluster the clusters that lost a record (deleted or changed records)
+       and the clusters a new record joins (found among the records with the
+       same link or a title in the same LSH bucket, which covers every pair
+       dedup would ever compare),
+    3. keep every other cluster's merged record as it is.
+Clusters are whole connected components, so reclustering the affected ones
+gives the same clusters as deduplicating the whole dataset again.
+
+Only incremental runs read and write the state; a full clean never touches it.
+The first incremental run (or one after Cache/clean is cleared) starts from an
+empty state and so cleans every record.
+"""
+import os
+import json
+import hashlib
+from collections import Counter
+
+# State folder in the project root (clearing the cache forces a full clean)
+STATE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Cache', 'clean')
+STATE_FILE = os.path.join(STATE_DIRECTORY, 'state.json')
+
+
+def record_keys(records):
+    """
+    Builds the identity key of every record: a hash of its content, plus the number
+    of earlier records with the same content (sources sometimes list an event twice).
+    Parameters:
+        records (list): Encoded events (see Event.to_dict).
+    Returns:
+        list: One key per record, e.g. "3f7a...:0".
+    """
+    occurrences = Counter()
+    keys = []
+    for record in records:
+        content = json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        digest = hashlib.sha1(content).hexdigest()
+        keys.append(f"{digest}:{occurrences[digest]}")
+        occurrences[digest] += 1
+    return keys
+
+
+def _link(record):
+    link = record.get('link')
+    return link if link and link != "N/A" else None
+
+
+def _buckets(bands):
+    # An LSH bucket as a JSON object key: "band:band key"
+    return [f"{band}:{key}" for band, key in enumerate(bands)] if bands else []
+
+
+def _add_to(index, name, key):
+    index.setdefault(name, []).append(key)
+
+
+def _remove_from(index, name, key):
+    keys = index.get(name)
+    if keys is not None and key in keys:
+        keys.remove(key)
+        if not keys:
+            del index[name]
+
+
+class CleanState:
+    """
+    The records and clusters of the last incremental clean:
+        records:  {record key: [cluster key, date-standardized record, title band keys or None]}
+        clusters: {cluster key: merged record}
+    A cluster's key is the key of its first record. The records are also indexed
+    (and saved with the state, so loading it does not rebuild them):
+        links:           {link: [record keys]}
+        buckets:         {"band:band key": [record keys]}
+        cluster_members: {cluster key: [record keys]}
+    """
+
+    def __init__(self, path=STATE_FILE):
+        """
+        Parameters:
+            path (str): The state file (an empty state is used if it is missing or unreadable).
+        """
+        self.path = path
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.records, self.clusters = state['records'], state['clusters']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.records, self.clusters = {}, {}
+            state = {}
+        try:
+            self.links, self.buckets, self.cluster_members = state['links'], state['buckets'], state['cluster_members']
+        except KeyError:
+            # A state saved before the indexes were kept
+            self.links, self.buckets, self.cluster_members = {}, {}, {}
+            for key, entry in self.records.items():
+                self._index(key, entry)
+
+    def _index(self, key, entry):
+        cluster, record, bands = entry
+        link = _link(record)
+        if link:
+            _add_to(self.links, link, key)
+        for bucket in _buckets(bands):
+            _add_to(self.buckets, bucket, key)
+        _add_to(self.cluster_members, cluster, key)
+
+    def _unindex(self, key, entry):
+        cluster, record, bands = entry
+        link = _link(record)
+        if link:
+            _remove_from(self.links, link, key)
+        for bucket in _buckets(bands):
+            _remove_from(self.buckets, bucket, key)
+        _remove_from(self.cluster_members, cluster, key)
+
+    def candidate_keys(self, new_records, new_bands):
+        """
+        Finds the existing records a new record could be a duplicate of: those with the
+        same link, or whose title shares an LSH bucket with a new record's title. Whether
+        they really match is checked by dedup.find_matches.
+        Parameters:
+            new_records (list): Date-standardized new records.
+            new_bands (list): Title band keys of each new record (None for records without a title).
+        Returns:
+            list: Record keys.
+        """
+        links = {_link(record) for record in new_records} - {None}
+        buckets = {bucket for bands in new_bands for bucket in _buckets(bands)}
+        found = [self.links.get(link, ()) for link in links] + [self.buckets.get(bucket, ()) for bucket in buckets]
+        # dict.fromkeys drops the keys found more than once and keeps the order
+        return list(dict.fromkeys(key for keys in found for key in keys))
+
+    def members(self, clusters):
+        """Returns the keys of the records in the given clusters."""
+        return [key for cluster in clusters for key in self.cluster_members.get(cluster, ())]
+
+    def update(self, removed_keys, removed_clusters, records, clusters):
+        """
+        Replaces part of the state with the result of a run.
+        Parameters:
+            removed_keys (iterable): Records that were deleted or reclustered.
+            removed_clusters (iterable): Clusters that were rebuilt.
+            records (dict): {record key: [cluster key, record, band keys]} of the reclustered records.
+            clusters (dict): {cluster key: merged record} of the rebuilt clusters.
+        """
+        for key in removed_keys:
+            entry = self.records.pop(key, None)
+            if entry is not None:
+                self._unindex(key, entry)
+        for cluster in removed_clusters:
+            self.clusters.pop(cluster, None)
+        for key, entry in records.items():
+            if key in self.records:
+                self._unindex(key, self.records[key])
+            self.records[key] = entry
+            self._index(key, entry)
+        self.clusters.update(clusters)
+
+    def cleaned_records(self, positions):
+        """
+        Returns every cluster's merged record, in the order of the cluster's first record.
+        Parameters:
+            positions (dict): {record key: position in the combined file}.
+        """
+        return [self.clusters[cluster] for cluster in sorted(self.clusters, key=positions.__getitem__)]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            # json.dumps encodes in one C call; json.dump would stream through the pure Python encoder
+            f.write(json.dumps({'records': self.records, 'clusters': self.clusters, 'links': self.links,
+                                'buckets': self.buckets, 'cluster_members': self.cluster_members}, ensure_ascii=False))
+        os.replace(temporary_path, self.path)
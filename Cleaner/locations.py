@@ -0,0 +1,328 @@
+"""
+Location resolution for the cleaner, backed by the offline gazetteer in
+gazetteer.csv (Australian states, tourism regions and suburbs, each with its
+state and coordinates).
+
+Sources fill `location` very differently: Pupsy has "Venue | Dog Friendly Pub
+in Newtown", South Australia has regions ("Yorke Peninsula"), Yappack has
+suburbs and Humanitix has full addresses ("1 Browns Ln, Aspendale VIC 3195,
+Australia"). A location is resolved in this order:
+    1. A Google-style address ("..., Suburb STATE 1234") gives its suburb and
+       state directly, even when the gazetteer does not list the suburb.
+    2. Otherwise every run of words that is a gazetteer name (or alias) is
+       found with a token trie, and the best match wins: one in the state the
+       text names (else the record's own state or postcode, else the state its
+       source covers, see SOURCE_STATES), a suburb or region over a whole
+       state, a name not followed by a street type ("Sydney Rd"), then the
+       match furthest right (the place comes after the venue), then the longest.
+    3. A state abbreviation on its own ("QLD 4000") gives just the state.
+Overseas addresses and text with no known place ("Online") resolve to None.
+A name shared by places in several states ("Queenscliff" is in NSW and VIC)
+is not guessed when none of those states is known: the location resolves to
+a region or state the text also names, or to None.
+
+Each distinct string is resolved once per process (resolutions are memoized),
+and the cleaner only resolves a column's distinct strings, so the same few
+thousand venue lines cost next to nothing however many records repeat them.
+
+Usage:
+    resolve_location("The Erko | Dog Friendly Pub in Erskineville")
+    # Place(suburb='Erskineville', region=None, state='NSW', latitude=-33.902, longitude=151.186)
+"""
+import os
+import re
+import csv
+import unicodedata
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+import pandas as pd
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+
+# Distinct location strings remembered by each gazetteer's resolver
+CACHE_SIZE = 65536
+
+# Fields added to the extras of every resolved record (see add_location_fields)
+LOCATION_FIELDS = ('suburb', 'region', 'state', 'latitude', 'longitude')
+
+# A resolved location: the suburb or the region (or neither, if only the state is known),
+# its state's abbreviation and the coordinates of the most specific gazetteer entry found
+Place = namedtuple('Place', LOCATION_FIELDS)
+
+STATE_CODES = ('NSW', 'VIC', 'QLD', 'SA', 'WA', 'TAS', 'NT', 'ACT')
+
+# The state each single-state source's events are in (by Raw_Data source name), used to choose
+# between places of the same name when the location itself names no state
+SOURCE_STATES = {
+    'SouthAustralia_Dog_Services': 'SA',
+    'VisitNSW_Events_with_Details': 'NSW',
+    'VisitNSW_Details': 'NSW',
+    'VisitNSW_Hikes': 'NSW',
+    'Yappack_Dog_Events_Updated': 'VIC',
+}
+
+# First and last postcode of each state's ranges (the ACT ranges come before the NSW range around them)
+POSTCODE_RANGES = (
+    (200, 299, 'ACT'), (800, 999, 'NT'), (2600, 2619, 'ACT'), (2900, 2920, 'ACT'), (1000, 2999, 'NSW'),
+    (3000, 3999, 'VIC'), (8000, 8999, 'VIC'), (4000, 4999, 'QLD'), (9000, 9999, 'QLD'),
+    (5000, 5999, 'SA'), (6000, 6999, 'WA'), (7000, 7999, 'TAS'),
+)
+
+# Words that make the name before them a street rather than a place ("Sydney Rd, Brunswick")
+STREET_TYPES = frozenset((
+    'st', 'street', 'rd', 'road', 'ave', 'avenue', 'hwy', 'highway', 'dr', 'drive', 'ln', 'lane',
+    'pl', 'place', 'pde', 'parade', 'tce', 'terrace', 'blvd', 'boulevard', 'cres', 'crescent', 'way',
+))
+
+# Addresses outside Australia: a trailing country, or a US state and ZIP code
+_FOREIGN = re.compile(r'\b(?:USA|United States|New Zealand)\s*$|\b[A-Z]{2} \d{5}\b')
+
+# The last part of a Google-style address: "Aspendale VIC 3195" (the suburb may be missing)
+_ADDRESS = re.compile(r"^(?P<suburb>(?:[A-Za-z][A-Za-z .'’-]*?)?)\s*\b(?P<state>" + '|'.join(STATE_CODES) + r')(?:\s+\d{4})?$')
+_COUNTRY = re.compile(r',?\s*Australia\s*$', re.IGNORECASE)
+_WORD = re.compile(r'[A-Za-z0-9]+')
+
+
+def _ascii(text):
+    # "Gray’s Point" and "Gray's Point" both become "Grays Point"
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return text.replace("'", '')
+
+
+def _tokens(text):
+    return tuple(word.lower() for word in _WORD.findall(_ascii(text)))
+
+
+def postcode_state(postcode):
+    """Returns the state (abbreviation) of an Australian postcode, or None if it is not one."""
+    text = str(postcode).strip()
+    if not re.fullmatch(r'\d{3,4}', text):
+        return None
+    number = int(text)
+    return next((state for first, last, state in POSTCODE_RANGES if first <= number <= last), None)
+
+
+class Gazetteer:
+    """
+    The places of a gazetteer file, indexed by the words of their names.
+
+    The index is a trie over name tokens: trie['north']['bondi'][''] lists the
+    entries named "North Bondi". Scanning a location from each word finds every
+    name it contains in one walk per word, however large the gazetteer.
+    """
+
+    def __init__(self, path=GAZETTEER_FILE, cache_size=CACHE_SIZE):
+        """
+        Parameters:
+            path (str): A CSV file with the columns name, kind (state, region or suburb),
+                state, latitude, longitude and aliases ('|'-separated). A name may belong to
+                places in several states (see the module docstring for how one is chosen).
+            cache_size (int): Distinct strings whose resolution is memoized.
+        """
+        self.entries = []
+        self.states = {}
+        self.trie = {}
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                entry = (row['name'], row['kind'], row['state'], float(row['latitude']), float(row['longitude']))
+                self.entries.append(entry)
+                if row['kind'] == 'state':
+                    self.states[row['state']] = entry
+                names = [row['name']] + [alias for alias in (row['aliases'] or '').split('|') if alias]
+                for name in names:
+                    node = self.trie
+                    for token in _tokens(name):
+                        node = node.setdefault(token, {})
+                    node.setdefault('', []).append(len(self.entries) - 1)
+        # Memoized per gazetteer (a method wrapped in lru_cache would share one cache between instances)
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _place(self, entry):
+        name, kind, state, latitude, longitude = entry
+        return Place(name if kind == 'suburb' else None, name if kind == 'region' else None, state, latitude, longitude)
+
+    def _state_place(self, state):
+        _, _, _, latitude, longitude = self.states[state]
+        return Place(None, None, state, latitude, longitude)
+
+    def lookup(self, name, state=None):
+        """
+        Finds a place by its exact name or alias.
+        Parameters:
+            name (str): The name, in any case or punctuation.
+            state (str): Only a place in this state (abbreviation).
+        Returns:
+            tuple: The gazetteer entry (name, kind, state, latitude, longitude), or None.
+        """
+        node = self.trie
+        for token in _tokens(name):
+            node = node.get(token)
+            if node is None:
+                return None
+        for index in node.get('', ()):
+            if state is None or self.entries[index][2] == state:
+                return self.entries[index]
+        return None
+
+    def state_code(self, state):
+        """Returns the abbreviation of a state given by abbreviation or name ('vic', 'Victoria'), or None."""
+        if not isinstance(state, str):
+            return None
+        if state.strip().upper() in STATE_CODES:
+            return state.strip().upper()
+        entry = self.lookup(state)
+        return entry[2] if entry and entry[1] == 'state' else None
+
+    def _best_match(self, tokens, hint, broad_only=False):
+        """
+        Finds the best gazetteer name in the tokens (see the module docstring).
+        Parameters:
+            tokens (tuple): The lowercased words of the location.
+            hint (str): The state whose places are preferred (None if unknown).
+            broad_only (bool): Only consider regions and states whose name is not ambiguous.
+        Returns:
+            tuple: (the entry, or None; whether its name belongs to places in several
+                states and none of them is in the hinted state).
+        """
+        best, best_score, best_ambiguous = None, None, False
+        for start in range(len(tokens)):
+            node = self.trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                indexes = node.get('', ())
+                states = {self.entries[index][2] for index in indexes}
+                ambiguous = len(states) > 1 and hint not in states
+                for index in indexes:
+                    entry = self.entries[index]
+                    if broad_only and (ambiguous or entry[1] == 'suburb'):
+                        continue
+                    followed_by_street = end + 1 < len(tokens) and tokens[end + 1] in STREET_TYPES
+                    score = (hint is None or entry[2] == hint, entry[1] != 'state', not followed_by_street,
+                             end, end - start, -index)
+                    if best_score is None or score > best_score:
+                        best, best_score, best_ambiguous = entry, score, ambiguous
+        return best, best_ambiguous
+
+    def _resolve(self, location, state=None):
+        """
+        Resolves one location string (memoized as `resolve`).
+        Parameters:
+            location (str): The location as scraped.
+            state (str): The state the event is otherwise known to be in (abbreviation), used
+                when the text names no state (see the module docstring).
+        Returns:
+            Place: The resolved location, or None if it names no known Australian place.
+        """
+        if not isinstance(location, str) or _FOREIGN.search(location):
+            return None
+
+        # A Google-style address names its suburb and state in its last part
+        address = _ADDRESS.match(_COUNTRY.sub('', location).split(',')[-1].strip())
+        if address:
+            suburb, state = address.group('suburb').strip(), address.group('state')
+            if not suburb:
+                return self._state_place(state)
+            entry = self.lookup(suburb, state)
+            if entry:
+                return self._place(entry)
+            if ',' in location:
+                # A full address whose suburb the gazetteer does not list keeps the suburb's
+                # name, with its state's coordinates
+                _, _, _, latitude, longitude = self.states[state]
+                return Place(suburb, None, state, latitude, longitude)
+
+        # Otherwise search the whole text, preferring places in the last state abbreviation it
+        # mentions, else in the state the event is known to be in
+        words = _WORD.findall(_ascii(location))
+        tokens = tuple(word.lower() for word in words)
+        states = [word for word in words if word in STATE_CODES]
+        hint = states[-1] if states else None
+        entry, ambiguous = self._best_match(tokens, hint or state)
+        if ambiguous:
+            # Nothing tells which of the places of that name is meant, so rather than guess a
+            # suburb, settle for a region or state the text also names
+            entry, _ = self._best_match(tokens, hint or state, broad_only=True)
+        if entry and (hint is None or (entry[2] == hint and entry[1] != 'state')):
+            return self._place(entry)
+        return self._state_place(hint) if hint else None
+
+
+@lru_cache(maxsize=None)
+def default_gazetteer():
+    """Returns the bundled gazetteer, loaded on first use."""
+    return Gazetteer()
+
+
+def resolve_location(location, state=None):
+    """
+    Resolves a location string with the bundled gazetteer (see Gazetteer.resolve).
+    Parameters:
+        location (str): The location as scraped.
+        state (str): The state the event is otherwise known to be in (abbreviation), if any.
+    Returns:
+        Place: The resolved location, or None.
+    """
+    return default_gazetteer().resolve(location, state)
+
+
+def record_state(extra, source, gazetteer=None):
+    """
+    Returns the state a record is known to be in apart from its location text: its own
+    'state' or 'postcode' field, else the state its source covers (see SOURCE_STATES).
+    Parameters:
+        extra (dict): The record's extras (None if it has none).
+        source (str): The record's source.
+        gazetteer (Gazetteer): Defaults to the bundled gazetteer.
+    Returns:
+        str: The state's abbreviation, or None.
+    """
+    if isinstance(extra, dict):
+        state = (gazetteer or default_gazetteer()).state_code(extra.get('state'))
+        if state is None and extra.get('postcode') is not None:
+            state = postcode_state(extra['postcode'])
+        if state:
+            return state
+    return SOURCE_STATES.get(source) if isinstance(source, str) else None
+
+
+def add_location_fields(df, gazetteer=None):
+    """
+    Adds the resolved suburb, region, state, latitude and longitude of every record
+    to its extras (only the fields that are known). Each distinct location is
+    resolved once per state the record is known to be in (see record_state).
+    Parameters:
+        df (DataFrame): The cleaner's DataFrame (see cleaner.events_to_frame).
+        gazetteer (Gazetteer): Defaults to the bundled gazetteer.
+    Returns:
+        tuple: (the DataFrame with its 'extras' column updated,
+                Counter of records by resolution: 'suburb', 'region', 'state' or 'unresolved')
+    """
+    resolutions = Counter()
+    if 'location' not in df.columns:
+        resolutions['unresolved'] = len(df)
+        return df, resolutions
+    gazetteer = gazetteer or default_gazetteer()
+    extras = df['extras'] if 'extras' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    sources = df['source'] if 'source' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    keys = [(location, record_state(extra, source, gazetteer)) if isinstance(location, str) else None
+            for location, extra, source in zip(df['location'], extras, sources)]
+    places = {key: gazetteer.resolve(*key) for key in set(keys) if key is not None}
+
+    resolved = []
+    for key, extra in zip(keys, extras):
+        place = places[key] if key is not None else None
+        if place is None:
+            resolutions['unresolved'] += 1
+            resolved.append(extra)
+            continue
+        resolutions['suburb' if place.suburb else 'region' if place.region else 'state'] += 1
+        extra = dict(extra) if isinstance(extra, dict) else {}
+        extra.update((field, value) for field, value in zip(LOCATION_FIELDS, place) if value is not None)
+        resolved.append(extra)
+
+    df = df.copy()
+    df['extras'] = pd.Series(resolved, index=df.index, dtype=object)
+    return df, resolutions
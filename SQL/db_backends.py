@@ -0,0 +1,146 @@
+"""
+Database backends for the bulk event loader (SQL/insert_events.py).
+
+Both backends expose the same interface, so the loader (and anything timing
+it) does not care which database it is writing to:
+    stage(rows)   Sends a batch of rows to a staging table in one executemany call.
+    merge()       Upserts the staged rows into 'events' on the natural key and
+                  empties the staging table.
+    commit()      Commits the current transaction.
+    close()       Closes the connection.
+
+SQLServerBackend is the production database (pyodbc with fast_executemany and a
+MERGE statement). SQLiteBackend uses a local file, so the loader can be run and
+benchmarked without SQL Server.
+
+Both bring an existing events table up to the schema in events.py every time
+they connect: missing columns are added, and natural key values that earlier
+loaders stored as NULL are set to '' (as Event.to_row stores them), since NULL
+never matches in the upsert and every such row would be loaded again as a
+copy. A NULL-key row whose key a later load already stored with '' is deleted
+instead, as that later row is the current one.
+"""
+import sqlite3
+
+# Columns of the events table (in insert order) and its natural key come from the event schema
+from events import EVENT_COLUMNS, NATURAL_KEY
+
+_UPDATE_COLUMNS = tuple(column for column in EVENT_COLUMNS if column not in NATURAL_KEY)
+
+# Rows with a NULL natural key value whose key is also stored with '' by another row
+_DELETE_NULL_KEY_COPIES = f"""
+    DELETE FROM events
+    WHERE ({' OR '.join(f"{column} IS NULL" for column in NATURAL_KEY)})
+      AND EXISTS (SELECT 1 FROM events AS loaded
+                  WHERE {' AND '.join(f"loaded.{column} = COALESCE(events.{column}, '')" for column in NATURAL_KEY)})
+"""
+
+
+class SQLServerBackend:
+    """Loads into SQL Server through a #events_staging temp table and MERGE."""
+
+    def __init__(self, connection_string):
+        """
+        Parameters:
+            connection_string (str): ODBC connection string for the events database.
+        """
+        # Imported here so the SQLite backend works on machines without an ODBC driver
+        import pyodbc
+
+        self.connection = pyodbc.connect(connection_string)
+        self.cursor = self.connection.cursor()
+        # Send each batch as one parameter array instead of one round trip per row
+        self.cursor.fast_executemany = True
+
+        for column in EVENT_COLUMNS:
+            if self.cursor.execute("SELECT COL_LENGTH('events', ?)", column).fetchone()[0] is None:
+                self.cursor.execute(f"ALTER TABLE events ADD {column} NVARCHAR(MAX) NULL")
+        # Store the missing key values of rows from earlier loaders as '' (see the module docstring)
+        self.cursor.execute(_DELETE_NULL_KEY_COPIES)
+        for column in NATURAL_KEY:
+            self.cursor.execute(f"UPDATE events SET {column} = '' WHERE {column} IS NULL")
+        self.connection.commit()
+
+        # Staging table with exactly the column types of 'events'
+        columns = ', '.join(EVENT_COLUMNS)
+        self.cursor.execute(f"SELECT TOP 0 {columns} INTO #events_staging FROM events")
+
+        on = ' AND '.join(f"target.{column} = source.{column}" for column in NATURAL_KEY)
+        updates = ', '.join(f"{column} = source.{column}" for column in _UPDATE_COLUMNS)
+        values = ', '.join(f"source.{column}" for column in EVENT_COLUMNS)
+        self.merge_sql = f"""
+            MERGE events WITH (HOLDLOCK) AS target
+            USING #events_staging AS source
+            ON {on}
+            WHEN MATCHED THEN UPDATE SET {updates}
+            WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({values});
+        """
+        self.insert_sql = f"INSERT INTO #events_staging ({columns}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})"
+
+    def stage(self, rows):
+        self.cursor.executemany(self.insert_sql, rows)
+
+    def merge(self):
+        self.cursor.execute(self.merge_sql)
+        self.cursor.execute("TRUNCATE TABLE #events_staging")
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.cursor.close()
+        self.connection.close()
+
+
+class SQLiteBackend:
+    """Loads into a local SQLite file through a temp staging table and INSERT ... ON CONFLICT."""
+
+    def __init__(self, database_path):
+        """
+        Parameters:
+            database_path (str): The SQLite file (created, with its events table, if missing).
+        """
+        self.connection = sqlite3.connect(database_path)
+        self.cursor = self.connection.cursor()
+
+        columns = ', '.join(EVENT_COLUMNS)
+        key = ', '.join(NATURAL_KEY)
+        self.cursor.execute(f"CREATE TABLE IF NOT EXISTS events ({', '.join(f'{column} TEXT' for column in EVENT_COLUMNS)})")
+        existing = {row[1] for row in self.cursor.execute("PRAGMA table_info(events)")}
+        for column in EVENT_COLUMNS:
+            if column not in existing:
+                self.cursor.execute(f"ALTER TABLE events ADD COLUMN {column} TEXT")
+        # Store the missing key values of rows from earlier loaders as '' (see the module docstring);
+        # of two such rows that end up with the same key, one is kept
+        self.cursor.execute(_DELETE_NULL_KEY_COPIES)
+        for column in NATURAL_KEY:
+            self.cursor.execute(f"UPDATE OR REPLACE events SET {column} = '' WHERE {column} IS NULL")
+        # ON CONFLICT needs a unique index on the natural key (rebuilt if the key changed)
+        indexed = [row[2] for row in self.cursor.execute("PRAGMA index_info(events_natural_key)")]
+        if indexed != list(NATURAL_KEY):
+            self.cursor.execute("DROP INDEX IF EXISTS events_natural_key")
+            self.cursor.execute(f"CREATE UNIQUE INDEX events_natural_key ON events ({key})")
+        self.connection.commit()
+        self.cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS events_staging AS SELECT {columns} FROM events WHERE 0")
+
+        updates = ', '.join(f"{column} = excluded.{column}" for column in _UPDATE_COLUMNS)
+        # 'WHERE true' keeps SQLite from reading ON CONFLICT as part of the SELECT
+        self.merge_sql = f"""
+            INSERT INTO events ({columns}) SELECT {columns} FROM events_staging WHERE true
+            ON CONFLICT ({key}) DO UPDATE SET {updates}
+        """
+        self.insert_sql = f"INSERT INTO events_staging ({columns}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})"
+
+    def stage(self, rows):
+        self.cursor.executemany(self.insert_sql, rows)
+
+    def merge(self):
+        self.cursor.execute(self.merge_sql)
+        self.cursor.execute("DELETE FROM events_staging")
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.cursor.close()
+        self.connection.close()
@@ -1,69 +1,137 @@
-import json
-import pyodbc
 import os
+import sys
+import time
 
-def insert_data_into_db(json_file, connection_string):
+# Make the project root importable so the shared SQL/ and Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.combine import iter_events, newest_file
+from SQL.db_backends import NATURAL_KEY, EVENT_COLUMNS, SQLServerBackend, SQLiteBackend
+from SQL.search import update_search_index
+
+# Rows sent to the database per executemany call
+BATCH_SIZE = 1000
+
+# Rows merged between commits, so a failure part way only rolls back the current chunk
+COMMIT_EVERY = 10000
+
+# Natural keys listed when a load finds rows that share one
+MAX_COLLISIONS_SHOWN = 10
+
+def iter_batches(rows, batch_size, keys):
     """
-    Inserts data from a JSON file into the events table in the SQL Server database.
-    
+    Groups rows into batches, keeping only the last row for each natural key within
+    a batch (an upsert cannot match the same target row twice in one statement).
     Parameters:
-    - json_file: Path to the JSON file to be inserted.
-    - connection_string: The connection string to connect to the SQL Server database.
+    - rows: The rows to load.
+    - batch_size: Number of distinct keys per batch.
+    - keys: A dict in which the rows of every natural key are counted ({key: rows}),
+      so keys shared by several rows (of which only the last is kept) can be reported.
     """
-    # Print the current working directory for debugging
-    print(f"Current Working Directory: {os.getcwd()}")
-
-    # Step 1: Read the JSON data from the file
-    try:
-        with open(json_file, 'r', encoding='utf-8') as file:
-            events = json.load(file)
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-        print("Please make sure the JSON file path is correct.")
-        return
+    key_positions = [EVENT_COLUMNS.index(column) for column in NATURAL_KEY]
+    batch = {}
+    for row in rows:
+        key = tuple(row[position] for position in key_positions)
+        keys[key] = keys.get(key, 0) + 1
+        batch[key] = row
+        if len(batch) >= batch_size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
 
-    # Step 2: Establish a connection to the SQL Server
-    conn = pyodbc.connect(connection_string)
-    cursor = conn.cursor()
+def insert_data_into_db(json_file, backend, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY):
+    """
+    Loads the events from a JSON or Parquet file into the events table.
+    Rows are sent in batches to a staging table and upserted into 'events' on the
+    natural key (see events.NATURAL_KEY), so rerunning the load updates rows instead
+    of duplicating them. Rows of the file that share a natural key are reported,
+    since only the last of them is kept. The transaction is committed every
+    `commit_every` rows.
 
-    # Step 3: Insert each event into the events table
-    for event in events:
-        title = event.get('title', '')
-        location = event.get('location', '')
-        description = event.get('description', '')
+    Parameters:
+    - json_file: Path to the JSON file (a JSON array or NDJSON) to be loaded, or a
+      Parquet file, of which only the columns of the events table are read.
+    - backend: A backend from SQL/db_backends.py, or a SQL Server connection string.
+    - batch_size: Number of rows per executemany call.
+    - commit_every: Number of rows between commits.
+    Returns:
+    - The number of distinct rows loaded (None if the file was not found).
+    """
+    # Step 1: Check that the JSON file exists (it is streamed, not loaded at once)
+    if not os.path.exists(json_file):
+        print(f"Error: {json_file} not found")
+        print("Please make sure the JSON file path is correct.")
+        return None
 
-        # Check if the features field is a list before joining
-        features = event.get('features', [])
-        if not isinstance(features, list):
-            features = [features] if isinstance(features, str) else []  # Convert string to list, or use empty list
-        features = ', '.join(features)  # Convert features list to comma-separated string
+    # Step 2: Connect to the database
+    if isinstance(backend, str):
+        backend = SQLServerBackend(backend)
 
-        date_range = event.get('date_range', '')
-        link = event.get('link', '')
+    # Step 3: Stage and merge the events batch by batch, committing in chunks
+    start_time = time.perf_counter()
+    loaded = uncommitted = 0
+    keys = {}
+    try:
+        rows = (event.to_row() for event in iter_events(json_file, EVENT_COLUMNS))
+        for batch in iter_batches(rows, batch_size, keys):
+            backend.stage(batch)
+            backend.merge()
+            loaded += len(batch)
+            uncommitted += len(batch)
+            if uncommitted >= commit_every:
+                with metrics.timed('load_commit_seconds'):
+                    backend.commit()
+                uncommitted = 0
+                elapsed = time.perf_counter() - start_time
+                print(f"Committed {loaded} rows ({loaded / elapsed:.0f} rows/sec)")
 
-        # Execute the insert command
-        cursor.execute("""
-            INSERT INTO events (title, location, description, features, date_range, link)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, title, location, description, features, date_range, link)
+        # Step 4: Commit the last chunk and close the connection
+        with metrics.timed('load_commit_seconds'):
+            backend.commit()
+    finally:
+        backend.close()
 
-    # Step 4: Commit the transaction and close the connection
-    conn.commit()
-    cursor.close()
-    conn.close()
+    elapsed = time.perf_counter() - start_time
+    # Rows that share a natural key were merged into one row
+    loaded = len(keys)
+    collisions = {key: count for key, count in keys.items() if count > 1}
+    replaced = sum(collisions.values()) - len(collisions)
+    metrics.count('rows_loaded_total', loaded)
+    if collisions:
+        metrics.count('load_key_collisions_total', replaced)
+        print(f"Warning: {replaced} rows had the natural key ({', '.join(NATURAL_KEY)}) of an earlier row "
+              f"and replaced it:")
+        for key, count in list(collisions.items())[:MAX_COLLISIONS_SHOWN]:
+            print(f"    {count} rows: {key}")
+        if len(collisions) > MAX_COLLISIONS_SHOWN:
+            print(f"    ... and {len(collisions) - MAX_COLLISIONS_SHOWN} more keys")
+    metrics.set_gauge('load_rows_per_second', loaded / elapsed if elapsed else 0.0)
+    print(f"Loaded {loaded} rows in {elapsed:.2f}s ({loaded / elapsed if elapsed else 0:.0f} rows/sec)")
     print("Data successfully inserted into the database.")
+    return loaded
+
+if __name__ == '__main__':
+    # Define the connection string for your SQL Server
+    connection_string = (
+        "Driver={ODBC Driver 17 for SQL Server};"
+        "Server=DESKTOP-9UFQHR5\\WOOFYASERVER;"  # Update with your server name
+        "Database=events_db;"                     # Update with your database name
+        "Trusted_Connection=yes;"                 # Use Windows Authentication (no username and password required)
+    )
 
-# Define the connection string for your SQL Server
-connection_string = (
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=DESKTOP-9UFQHR5\\WOOFYASERVER;"  # Update with your server name
-    "Database=events_db;"                     # Update with your database name
-    "Trusted_Connection=yes;"                 # Use Windows Authentication (no username and password required)
-)
+    # Use the absolute path for the cleaned JSON file
+    current_directory = os.path.dirname(os.path.abspath(__file__))  # Get the script's current directory
+    json_file = os.path.join(current_directory, "../SQL/cleaned_combined_data.json")  # Updated file path
+    # Load the Parquet output of the cleaner instead if it is newer (combine.py --parquet)
+    json_file = newest_file([json_file, os.path.join(current_directory, "../SQL/cleaned_combined_data.parquet")])
 
-# Use the absolute path for the cleaned JSON file
-current_directory = os.path.dirname(os.path.abspath(__file__))  # Get the script's current directory
-json_file = os.path.join(current_directory, "../SQL/cleaned_combined_data.json")  # Updated file path
+    # Pass --sqlite to load into a local SQLite file (SQL/events.db) instead of SQL Server
+    if '--sqlite' in sys.argv:
+        backend = SQLiteBackend(os.path.join(current_directory, 'events.db'))
+    else:
+        backend = SQLServerBackend(connection_string)
 
-# Run the script to insert data
-insert_data_into_db(json_file, connection_string)
+    # Run the script to insert data, then bring the full-text search index (SQL/search.db) up to date
+    if insert_data_into_db(json_file, backend) is not None:
+        update_search_index(json_file)
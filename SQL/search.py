@@ -0,0 +1,345 @@
+"""
+Full-text search over the cleaned events, in a local SQLite FTS5 index
+(SQL/search.db), whichever database the events are loaded into.
+
+Each event is one document, keyed like the events table on its natural key
+(see events.NATURAL_KEY). The title, description, features and amenities, and location
+(with the resolved suburb or region and state, see Cleaner/locations.py)
+are full-text indexed with the Porter stemmer, so "beaches" finds "beach".
+The state, suburb, region, sources and dates are stored alongside for filters.
+
+insert_events.py updates the index after every load. An update hashes every
+document and only rewrites the ones that are new or changed, so reindexing an
+unchanged dataset writes nothing. Documents of events that are no longer in the
+file (removed, renamed or merged into another event) are deleted.
+
+Results are ranked with BM25, weighting a match in the title above one in the
+features or location, and those above one in the description.
+
+Usage:
+    python SQL/search.py off-leash beach Sydney
+    python SQL/search.py --state NSW --from 2024-10-01 --to 2024-10-31 puppy
+    python SQL/search.py --place "St Kilda" --source Yappack_Dog_Events_Updated --limit 5 pub
+    python SQL/search.py --update SQL/cleaned_combined_data.json     Index a file without loading it
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+from collections import namedtuple
+
+# Make the project root importable so the shared Cleaner/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from Cleaner.combine import iter_events
+from Cleaner.locations import default_gazetteer
+
+SEARCH_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search.db')
+
+# Version of the index's tables; an index built with another version is rebuilt from scratch
+SCHEMA_VERSION = 2
+
+# Documents written per executemany call
+BATCH_SIZE = 5000
+
+# Full-text columns, and the BM25 weight of a match in each
+TEXT_COLUMNS = ('title', 'description', 'features', 'location')
+WEIGHTS = (10.0, 1.0, 3.0, 3.0)
+
+# Columns stored for filtering and display
+FILTER_COLUMNS = ('link', 'location', 'suburb', 'region', 'state', 'sources', 'date_start', 'date_end')
+
+# Event fields an index update reads (for Parquet, only their columns are read)
+INDEX_FIELDS = ('title', 'link', 'description', 'features', 'amenities', 'location', 'suburb', 'region', 'state',
+                'source', 'sources', 'date', 'date_start', 'date_end')
+
+# Default number of results
+LIMIT = 20
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+SearchResult = namedtuple('SearchResult', ['title', 'link', 'location', 'state', 'sources', 'date_start', 'date_end',
+                                           'snippet', 'score'])
+
+
+def _text(value):
+    """Joins a list field (features, amenities) into text; other non-strings are dropped."""
+    if isinstance(value, list):
+        return ', '.join(item for item in value if isinstance(item, str))
+    return value if isinstance(value, str) else ''
+
+
+def document(event):
+    """
+    Builds the index document of an event.
+    Parameters:
+        event (Event): A cleaned event.
+    Returns:
+        tuple: (natural key as JSON, {full-text column: text}, {filter column: value})
+    """
+    state = event.get('state')
+    state_entry = default_gazetteer().states.get(state)
+    place_names = [event.location, event.get('suburb'), event.get('region'), state, state_entry and state_entry[0]]
+    sources = event.sources or ([event.source] if event.source else [])
+    # The cleaner's ISO start date, else the scraped date if it is already ISO
+    date_start = event.date_start or (event.date if isinstance(event.date, str) and _ISO_DATE.match(event.date) else None)
+    text = {
+        'title': _text(event.title),
+        'description': _text(event.description),
+        'features': ', '.join(filter(None, (_text(event.get('features')), _text(event.get('amenities'))))),
+        'location': ' '.join(name for name in dict.fromkeys(place_names) if isinstance(name, str) and name),
+    }
+    filters = {
+        'link': event.link if isinstance(event.link, str) else None,
+        'location': event.location if isinstance(event.location, str) else None,
+        'suburb': event.get('suburb'),
+        'region': event.get('region'),
+        'state': state,
+        'sources': ','.join(sources) or None,
+        'date_start': date_start,
+        'date_end': event.date_end or date_start,
+    }
+    return json.dumps(event.key(), ensure_ascii=False, default=str), text, filters
+
+
+def match_expression(query):
+    """
+    Turns a free-text query into an FTS5 expression matching every word (or
+    hyphenated word) in it, each quoted so FTS5 operators and punctuation are literal.
+    Parameters:
+        query (str): e.g. 'off-leash beach Sydney'.
+    Returns:
+        str: e.g. '"off-leash" "beach" "Sydney"' ('' if the query has no words).
+    """
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class SearchIndex:
+    """
+    The search index in a SQLite file: a 'documents' table with the natural key,
+    filter columns and a content hash of every event, and an FTS5 table with the
+    same rowids holding the searchable text.
+    """
+
+    def __init__(self, database_path=SEARCH_DATABASE):
+        """
+        Parameters:
+            database_path (str): The SQLite file (created, with its tables, if missing).
+        """
+        self.connection = sqlite3.connect(database_path)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # The index only holds derived data, so an older layout is dropped and rebuilt by the next update
+            self.connection.executescript(f"""
+                DROP TABLE IF EXISTS documents;
+                DROP TABLE IF EXISTS documents_fts;
+                PRAGMA user_version = {SCHEMA_VERSION};
+            """)
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
+                {', '.join(f'{column} TEXT' for column in FILTER_COLUMNS)},
+                hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_state ON documents (state);
+            CREATE INDEX IF NOT EXISTS documents_date_start ON documents (date_start);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                {', '.join(TEXT_COLUMNS)}, tokenize = 'porter unicode61 remove_diacritics 2'
+            );
+        """)
+
+    def update(self, events, batch_size=BATCH_SIZE):
+        """
+        Adds new events to the index, reindexes changed ones and deletes the documents of
+        events that are not among `events`. An event whose natural key appears more than
+        once keeps its last version, as in the events table.
+        Parameters:
+            events (iterable): Event objects (e.g. from Cleaner.combine.iter_events).
+            batch_size (int): Documents written per executemany call.
+        Returns:
+            dict: Number of documents (distinct natural keys) 'added', 'updated', 'unchanged'
+                and 'removed'.
+        """
+        # The id and content hash of every indexed document, to find the ones that changed
+        stored = {key: (document_id, digest) for document_id, key, digest
+                  in self.connection.execute("SELECT id, key, hash FROM documents")}
+        next_id = self.connection.execute("SELECT coalesce(max(id), 0) + 1 FROM documents").fetchone()[0]
+        # The id and hash each key has now (including this run's writes), and the hash it ends up with
+        known = dict(stored)
+        final = {}
+
+        # {id: (key, text, filters, hash)} of the batch, and the ids already in the FTS table
+        batch, replaced = {}, set()
+        for event in events:
+            key, text, filters = document(event)
+            digest = hashlib.sha1(json.dumps([text, filters], sort_keys=True).encode('utf-8')).hexdigest()
+            final[key] = digest
+            if key in known:
+                document_id, known_digest = known[key]
+                if digest == known_digest:
+                    continue
+                if document_id not in batch:
+                    replaced.add(document_id)
+            else:
+                document_id = next_id
+                next_id += 1
+            known[key] = (document_id, digest)
+            batch[document_id] = (key, text, filters, digest)
+            if len(batch) >= batch_size:
+                self._write(batch, replaced)
+                batch, replaced = {}, set()
+        if batch:
+            self._write(batch, replaced)
+        removed = [stored[key][0] for key in stored.keys() - final.keys()]
+        for start in range(0, len(removed), batch_size):
+            ids = [(document_id,) for document_id in removed[start:start + batch_size]]
+            self.connection.executemany("DELETE FROM documents WHERE id = ?", ids)
+            self.connection.executemany("DELETE FROM documents_fts WHERE rowid = ?", ids)
+        self.connection.commit()
+
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': len(removed)}
+        for key, digest in final.items():
+            if key not in stored:
+                counts['added'] += 1
+            else:
+                counts['unchanged' if digest == stored[key][1] else 'updated'] += 1
+        return counts
+
+    def _write(self, batch, replaced):
+        columns = ('id', 'key', 'title') + FILTER_COLUMNS + ('hash',)
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO documents ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [(document_id, key, text['title'], *(filters[column] for column in FILTER_COLUMNS), digest)
+             for document_id, (key, text, filters, digest) in batch.items()])
+        self.connection.executemany("DELETE FROM documents_fts WHERE rowid = ?", [(document_id,) for document_id in replaced])
+        self.connection.executemany(
+            f"INSERT INTO documents_fts (rowid, {', '.join(TEXT_COLUMNS)}) VALUES (?{', ?' * len(TEXT_COLUMNS)})",
+            [(document_id, *(text[column] for column in TEXT_COLUMNS))
+             for document_id, (_, text, _, _) in batch.items()])
+
+    def search(self, query, state=None, place=None, source=None, date_from=None, date_to=None, limit=LIMIT):
+        """
+        Finds the events matching every word of a query, best match first.
+        Parameters:
+            query (str): Free text (see match_expression).
+            state (str): Only events in this state (abbreviation, e.g. 'NSW').
+            place (str): Only events whose resolved suburb or region is this one.
+            source (str): Only events found in this source.
+            date_from (str): Only dated events ending on or after this ISO date.
+            date_to (str): Only dated events starting on or before this ISO date.
+            limit (int): Maximum number of results.
+        Returns:
+            list: SearchResult tuples (a lower score is a better match).
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        conditions, parameters = ["documents_fts MATCH ?"], [expression]
+        if state:
+            conditions.append("d.state = ?")
+            parameters.append(state.upper())
+        if place:
+            conditions.append("(d.suburb = ? COLLATE NOCASE OR d.region = ? COLLATE NOCASE)")
+            parameters += [place, place]
+        if source:
+            conditions.append("instr(',' || d.sources || ',', ',' || ? || ',') > 0")
+            parameters.append(source)
+        if date_from:
+            conditions.append("d.date_end >= ?")
+            parameters.append(date_from)
+        if date_to:
+            conditions.append("d.date_start <= ?")
+            parameters.append(date_to)
+        # Rank first and build the snippets of the top results only: every match is scored,
+        # so a broad word costs in proportion to the events it matches, but the snippets
+        # and the join (when nothing is filtered) are paid for `limit` rows instead
+        join = "JOIN documents AS d ON d.id = documents_fts.rowid" if len(conditions) > 1 else ""
+        ranked = self.connection.execute(f"""
+            SELECT documents_fts.rowid, bm25(documents_fts, {', '.join(map(str, WEIGHTS))}) AS score
+            FROM documents_fts {join}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY score
+            LIMIT ?
+        """, parameters + [limit]).fetchall()
+        if not ranked:
+            return []
+        ids = [rowid for rowid, _ in ranked]
+        placeholders = ', '.join('?' * len(ids))
+        rows = {row[0]: row[1:] for row in self.connection.execute(f"""
+            SELECT id, title, link, location, state, sources, date_start, date_end
+            FROM documents WHERE id IN ({placeholders})
+        """, ids)}
+        snippets = dict(self.connection.execute(f"""
+            SELECT rowid, snippet(documents_fts, -1, '[', ']', '...', 12)
+            FROM documents_fts WHERE documents_fts MATCH ? AND rowid IN ({placeholders})
+        """, [expression] + ids))
+        return [SearchResult(*rows[rowid], snippets.get(rowid, ''), score) for rowid, score in ranked]
+
+    def __len__(self):
+        return self.connection.execute("SELECT count(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def update_search_index(file_path, database_path=SEARCH_DATABASE):
+    """
+    Brings the search index up to date with a file of cleaned events.
+    Parameters:
+        file_path (str): A JSON array, NDJSON or Parquet file of events.
+        database_path (str): The index file.
+    Returns:
+        dict: Number of documents 'added', 'updated', 'unchanged' and 'removed'.
+    """
+    index = SearchIndex(database_path)
+    try:
+        with metrics.timed('search_index_seconds'):
+            counts = index.update(iter_events(file_path, INDEX_FIELDS))
+    finally:
+        index.close()
+    for change, count in counts.items():
+        metrics.count('search_documents_total', count, change=change)
+    print(f"Search index updated: {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged, {counts['removed']} removed")
+    return counts
+
+
+# Command-line options that take a value, and the search() parameter each one sets
+OPTIONS = {'--state': 'state', '--place': 'place', '--source': 'source', '--from': 'date_from', '--to': 'date_to',
+           '--limit': 'limit', '--update': None}
+
+
+if __name__ == '__main__':
+    options, words = {}, []
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument in OPTIONS:
+            options[argument] = next(arguments, None)
+        else:
+            words.append(argument)
+
+    if '--update' in options:
+        update_search_index(options['--update'])
+        sys.exit(0)
+    # A query is not a pipeline run, so no metrics are written
+    metrics.disable()
+    if not os.path.exists(SEARCH_DATABASE):
+        print(f"No search index at {SEARCH_DATABASE}; load the events (SQL/insert_events.py) or run with --update.")
+        sys.exit(1)
+
+    filters = {OPTIONS[option]: value for option, value in options.items() if value is not None}
+    if 'limit' in filters:
+        filters['limit'] = int(filters['limit'])
+    index = SearchIndex()
+    try:
+        results = index.search(' '.join(words), **filters)
+    finally:
+        index.close()
+    for result in results:
+        when = result.date_start if result.date_start == result.date_end else f"{result.date_start} to {result.date_end}"
+        print(f"{result.title}\n    {result.location or 'No location'} | {when if result.date_start else 'Undated'} | "
+              f"{result.sources or 'Unknown source'}\n    {result.snippet}")
+    print(f"{len(results)} result(s)")
@@ -0,0 +1,191 @@
+"""
+Content-addressed archive of every page body the scrapers fetched or rendered,
+so the extractors can be re-run over a past crawl without the network (see
+ReplaySession in framework.py and --replay in scrape.py).
+
+Each distinct body is stored once, zstd-compressed, under its SHA-256:
+    Cache/archive/objects/ab/cdef....zst
+and every time a source loads a page, one row is added to the SQLite index
+(Cache/archive/index.db) with the source, URL, variant ('raw' HTTP bodies or
+'rendered' browser output), status code, fetch time and the body's digest. A
+page that has not changed since the last crawl therefore costs one index row.
+
+A snapshot of the archive is the latest version of every page fetched at or
+before a given time, so replaying "as of" a crawl's end time reproduces what the
+scrapers saw during that crawl.
+
+Usage:
+    archive = PageArchive()
+    archive.store('Humantix', url, 200, html)
+    page = archive.find('Humantix', url)          # latest version, or as_of=<unix time>
+    html = archive.read(page.digest)
+
+    python Scrapers/archive.py                    Pages, bodies and size per source
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+from collections import namedtuple
+
+import zstandard
+
+# Make the project root importable so the shared modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+
+# Archive folder in the project root (outside the 'Scrapers' directory)
+ARCHIVE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Cache', 'archive')
+
+# zstd level of the stored bodies: HTML compresses to ~5% at level 10 in about a
+# millisecond per page, while the higher levels are 30x slower for a few percent more
+COMPRESSION_LEVEL = 10
+
+# One archived load of a page; `digest` names the stored body
+ArchivedPage = namedtuple('ArchivedPage', ['source', 'url', 'variant', 'status_code', 'fetched_at', 'digest'])
+
+
+class PageArchive:
+    """
+    The object store and its index (see the module docstring).
+    Bodies are written before their index row, so every row points to a stored body.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIRECTORY, level=COMPRESSION_LEVEL):
+        """
+        Parameters:
+            directory (str): The archive folder (created, with its index, if missing).
+            level (int): zstd compression level of new bodies.
+        """
+        self.directory = directory
+        self.objects_directory = os.path.join(directory, 'objects')
+        os.makedirs(self.objects_directory, exist_ok=True)
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.connection = sqlite3.connect(os.path.join(directory, 'index.db'))
+        # WAL, so a commit after every page does not wait for the disk
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                source TEXT,
+                url TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                status_code INTEGER,
+                fetched_at REAL NOT NULL,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_lookup ON pages (source, url, variant, fetched_at);
+            CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _path(self, digest):
+        return os.path.join(self.objects_directory, digest[:2], f"{digest[2:]}.zst")
+
+    def store(self, source, url, status_code, body, variant='raw', fetched_at=None):
+        """
+        Archives one load of a page; a body already in the archive is not stored again.
+        Parameters:
+            source (str): The source that loaded the page (its Raw_Data name).
+            url (str): The requested URL.
+            status_code (int): The HTTP status code of the response.
+            body (str): The page HTML.
+            variant (str): 'raw' for HTTP bodies, 'rendered' for browser output.
+            fetched_at (float): Unix time of the load (defaults to now).
+        Returns:
+            str: The body's digest.
+        """
+        data = body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            metrics.count('archive_pages_total', source=source, kind='duplicate')
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = self.compressor.compress(data)
+            # Write to a temporary file first so an interrupted run never leaves a half-written body
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(temp_path, path)
+            metrics.count('archive_pages_total', source=source, kind='new')
+            metrics.count('archive_bytes_written_total', len(compressed), source=source)
+
+        self.connection.execute(
+            "INSERT INTO pages (source, url, variant, status_code, fetched_at, digest, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source, url, variant, status_code, time.time() if fetched_at is None else fetched_at, digest, len(data)))
+        self.connection.commit()
+        return digest
+
+    def find(self, source, url, variant='raw', as_of=None):
+        """
+        Looks up the latest archived load of a page.
+        Parameters:
+            source (str): The source that loaded the page.
+            url (str): The requested URL.
+            variant (str): See store().
+            as_of (float): Only consider loads at or before this Unix time (None for the latest).
+        Returns:
+            ArchivedPage: The load, or None if the page was never archived (before `as_of`).
+        """
+        row = self.connection.execute(
+            "SELECT source, url, variant, status_code, fetched_at, digest FROM pages "
+            "WHERE source IS ? AND url = ? AND variant = ? AND fetched_at <= ? "
+            "ORDER BY fetched_at DESC, id DESC LIMIT 1",
+            (source, url, variant, float('inf') if as_of is None else as_of)).fetchone()
+        return ArchivedPage(*row) if row else None
+
+    def read(self, digest):
+        """
+        Returns an archived body (str).
+        Raises:
+            FileNotFoundError: If no body with this digest is stored.
+        """
+        with open(self._path(digest), 'rb') as f:
+            return self.decompressor.decompress(f.read()).decode('utf-8')
+
+    def summary(self):
+        """
+        Returns:
+            list: One (source, pages, distinct bodies, body bytes, first fetch, last fetch)
+                tuple per source, where body bytes counts each distinct body once.
+        """
+        return self.connection.execute("""
+            SELECT source, SUM(loads), COUNT(*), SUM(size), MIN(first_fetch), MAX(last_fetch)
+            FROM (SELECT source, digest, COUNT(*) AS loads, MAX(size) AS size,
+                         MIN(fetched_at) AS first_fetch, MAX(fetched_at) AS last_fetch
+                  FROM pages GROUP BY source, digest)
+            GROUP BY source ORDER BY source
+        """).fetchall()
+
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(timestamp))
+
+
+if __name__ == '__main__':
+    # A report is not a pipeline run, so no metrics are written
+    metrics.disable()
+    with PageArchive() as archive:
+        rows = archive.summary()
+    stored_bytes = sum(entry.stat().st_size for folder in os.scandir(os.path.join(ARCHIVE_DIRECTORY, 'objects'))
+                       if folder.is_dir() for entry in os.scandir(folder.path) if entry.name.endswith('.zst'))
+    print(f"{'Source':<28} {'Pages':>7} {'Bodies':>7} {'MB':>8}  First fetch          Last fetch")
+    for source, pages, bodies, size, first_fetch, last_fetch in rows:
+        print(f"{source or '-':<28} {pages:7} {bodies:7} {size / 1e6:8.2f}  "
+              f"{_format_time(first_fetch)}  {_format_time(last_fetch)}")
+    print(f"Stored: {stored_bytes / 1e6:.2f} MB compressed for "
+          f"{sum(row[3] for row in rows) / 1e6:.2f} MB of bodies")
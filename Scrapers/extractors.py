@@ -0,0 +1,293 @@
+"""
+Extraction logic for every source, callable on a page body.
+
+Each Extractor turns the HTML of one page into that source's records, so the
+same code is used by the scraper scripts (on fetched or rendered pages) and by
+the offline parse benchmark (on recorded fixtures, see Benchmarks/). Selectors
+are compiled once per extractor for the chosen parsing backend (see parsing.py).
+Parse time and the records extracted and dropped are recorded per source in
+the process's metrics (see metrics.py).
+
+Usage:
+    extract = EXTRACTORS['Humantix']()
+    records = extract(html_text)   # None if the page has no result blocks at all
+"""
+import time
+
+import metrics
+from Scrapers.parsing import Selectors
+
+
+class Extractor:
+    """
+    Base class: subclasses name their source, the selectors they use (with
+    `container` naming the one that matches a single record's block) and
+    implement extract_record. Sources whose records need content outside the
+    container blocks set `partial_parse` to False, so the whole page is parsed.
+    """
+    source = None
+    kind = 'record'
+    container = None
+    selectors = {}
+    partial_parse = True
+
+    def __init__(self, backend=None):
+        """
+        Parameters:
+            backend (str): Parsing backend name (see parsing.BACKENDS); defaults to the fastest available.
+        """
+        self.s = Selectors(backend, container=self.container if self.partial_parse else None, **self.selectors)
+
+    def __call__(self, text):
+        """
+        Extracts the records of one page.
+        Parameters:
+            text (str): The page HTML.
+        Returns:
+            list: The records found, or None if the page has no record blocks
+                (e.g. a results page past the last one).
+        """
+        start_time = time.perf_counter()
+        blocks = self.s.select(self.container, self.s.parse(text))
+        if not blocks:
+            metrics.observe('parse_seconds', time.perf_counter() - start_time, source=self.source)
+            return None
+
+        records = []
+        errors = 0
+        for block in blocks:
+            try:
+                record = self.extract_record(block)
+            except Exception as e:
+                print(f"Error while parsing {self.kind}: {e}")
+                errors += 1
+                continue
+            if record is not None:
+                records.append(record)
+
+        metrics.observe('parse_seconds', time.perf_counter() - start_time, source=self.source)
+        metrics.count('records_extracted_total', len(records), source=self.source)
+        if errors:
+            metrics.count('records_dropped_total', errors, source=self.source, reason='parse_error')
+        # Blocks the extractor skipped: filtered out, or not records at all (e.g. layout blocks)
+        skipped = len(blocks) - len(records) - errors
+        if skipped:
+            metrics.count('records_dropped_total', skipped, source=self.source, reason='skipped')
+        return records
+
+    def extract_record(self, block):
+        """Returns the record in one block, or None to skip the block."""
+        raise NotImplementedError
+
+    def text_of(self, name, node, default="N/A"):
+        """Returns the stripped text of the first match of a named selector, or `default`."""
+        match = self.s.first(name, node)
+        return self.s.text(match).strip() if match is not None else default
+
+
+class HumanitixExtractor(Extractor):
+    """Humanitix search results."""
+    source = 'Humantix'
+    kind = 'event'
+    container = 'events'
+    selectors = dict(events='a.sc-eb5cf798-0', title='h6', details='p.sc-8821f522-0')
+
+    def extract_record(self, event):
+        # Title, then the date/time and location paragraphs
+        title = self.s.text(self.s.first('title', event)).strip()
+        details = self.s.select('details', event)
+        return {
+            'title': title,
+            'description': self.s.text(details[0]).strip(),
+            'location': self.s.text(details[1]).strip()
+        }
+
+
+class HumanitixPetsExtractor(HumanitixExtractor):
+    """Humanitix search results for "pets", keeping only events with "pet" in the title."""
+    source = 'Pets_Humantix'
+
+    def extract_record(self, event):
+        # Check the title before extracting anything else from the card
+        title = self.s.text(self.s.first('title', event)).strip()
+        if "pet" not in title.lower():
+            return None
+        return super().extract_record(event)
+
+
+class PupsyExtractor(Extractor):
+    """Pupsy dog-friendly pubs and bars listing."""
+    source = 'pupsytest'
+    kind = 'venue'
+    container = 'venues'
+    selectors = dict(venues='div.fl-module-content', title='h2.geodir-entry-title', link='a',
+                     amenities='h5.fl-callout-title')
+
+    def extract_record(self, venue):
+        # Layout blocks share the container class; only blocks with a title are venues
+        title_tag = self.s.first('title', venue)
+        if title_tag is None:
+            return None
+        venue_name = self.s.text(title_tag).strip()
+        link_tag = self.s.first('link', title_tag)
+
+        # Amenities such as "Dogs Welcome Inside" or "Covered Outdoor"
+        amenities = [self.s.text(amenity).strip().replace('<br>', ' ') for amenity in self.s.select('amenities', venue)]
+
+        # The location and description are set to the title (the listing has neither)
+        return {
+            'title': venue_name,
+            'description': venue_name,
+            'link': self.s.attr(link_tag, 'href') if link_tag is not None else "N/A",
+            'location': venue_name,
+            'amenities': ", ".join(amenities) if amenities else "None"
+        }
+
+
+class YappackExtractor(Extractor):
+    """The Yappack dog-friendly events listing."""
+    source = 'Yappack_Dog_Events_Updated'
+    kind = 'event'
+    container = 'cards'
+    selectors = dict(cards='div.card.h-100.p-0.m-0.mw-100.border-0', title='h3.geodir-entry-title', link='a',
+                     start_date='div.geodir-field-event_start_date', end_date='div.geodir-field-event_end_date',
+                     description='div.excerpt', location='div.geodir-field-suburb')
+
+    def extract_record(self, event):
+        # The title is the link's title attribute (or its text)
+        title_tag = self.s.first('title', event)
+        link_tag = self.s.first('link', title_tag) if title_tag is not None else None
+        if link_tag is None:
+            title = "N/A"
+        else:
+            title = (self.s.attr(link_tag, 'title') or self.s.text(link_tag)).strip()
+
+        # "start - end", or just the start date for one-day events
+        start_date = self.text_of('start_date', event)
+        end_date = self.text_of('end_date', event)
+        date_range = f"{start_date} - {end_date}" if start_date != "N/A" and end_date != "N/A" else start_date
+
+        return {
+            'title': title,
+            'link': self.s.attr(link_tag, 'href') if link_tag is not None else "N/A",
+            'date_range': date_range,
+            'description': self.text_of('description', event),
+            'location': self.text_of('location', event)
+        }
+
+
+class EventbriteExtractor(Extractor):
+    """Eventbrite discover (search) results."""
+    source = 'Eventbrite_Dog_Events'
+    kind = 'event'
+    container = 'cards'
+    selectors = dict(cards='section.event-card-details', link='a.event-card-link', title='h3',
+                     date='p', location='p:nth-of-type(2)',
+                     price='div.DiscoverHorizontalEventCard-module__priceWrapper___3rOUY p')
+
+    def extract_record(self, event):
+        link_tag = self.s.first('link', event)
+        return {
+            'title': self.text_of('title', event),
+            'link': self.s.attr(link_tag, 'href') if link_tag is not None else "N/A",
+            'date': self.text_of('date', event),
+            'location': self.text_of('location', event),
+            # Free events have no price
+            'price': self.text_of('price', event, default="Free")
+        }
+
+
+class SouthAustraliaExtractor(Extractor):
+    """South Australia dog-friendly services search results."""
+    source = 'SouthAustralia_Dog_Services'
+    kind = 'service'
+    container = 'cards'
+    selectors = dict(cards='div.product-card__content', title='h4.product-card__title',
+                     location='span.product-card__location', features='ul.product-card__features',
+                     feature='li.product-card__features-item')
+
+    def extract_record(self, service):
+        features_tag = self.s.first('features', service)
+        features = []
+        if features_tag is not None:
+            features = [self.s.text(feature).strip() for feature in self.s.select('feature', features_tag)]
+        return {
+            'title': self.text_of('title', service),
+            'location': self.text_of('location', service),
+            'features': features
+        }
+
+
+class VisitNSWExtractor(Extractor):
+    """VisitNSW event search results (Phase 1: basic data and the detail page link)."""
+    source = 'VisitNSW_Events_with_Details'
+    kind = 'event'
+    container = 'results'
+    selectors = dict(results='li.search__page-result', link='a.opensearch__result-link', title='h2',
+                     description='p', image='img')
+
+    def extract_record(self, event):
+        link_tag = self.s.first('link', event)
+        image_tag = self.s.first('image', event)
+        return {
+            'title': self.text_of('title', event),
+            'link': self.s.attr(link_tag, 'href') if link_tag is not None else "N/A",
+            'description': self.text_of('description', event),
+            'image': self.s.attr(image_tag, 'src') if image_tag is not None else "N/A",
+        }
+
+
+class VisitNSWHikesExtractor(Extractor):
+    """The VisitNSW dog-friendly hikes article (one <h2> per hike, followed by <p> details)."""
+    source = 'VisitNSW_Hikes'
+    kind = 'hike'
+    container = 'sections'
+    selectors = dict(sections='h2', link='a', label='strong')
+    # The details are in the <p> siblings of each heading, outside the container
+    partial_parse = False
+
+    def extract_record(self, section):
+        # Headings without a link are not hikes
+        title_tag = self.s.first('link', section)
+        if title_tag is None:
+            return None
+
+        description = ""
+        distance = time = leash_policy = "N/A"
+
+        # Read the <p> tags that follow the heading (description, distance, time and leash
+        # policy), stopping at the next non-<p> element so the next hike's details are not included
+        for paragraph in self.s.next_siblings(section):
+            if self.s.tag(paragraph) != 'p':
+                break
+            paragraph_text = self.s.text(paragraph)
+
+            # Distance, time and leash policy are labelled with <strong> tags
+            strong_tag = self.s.first('label', paragraph)
+            if strong_tag is not None:
+                strong_text = self.s.text(strong_tag).lower()
+                if 'distance' in strong_text:
+                    distance = paragraph_text.replace("Distance:", "").strip()
+                elif 'time' in strong_text:
+                    time = paragraph_text.replace("Time:", "").strip()
+                elif 'on-leash' in strong_text:
+                    leash_policy = paragraph_text.replace("On-leash?", "").strip()
+            else:
+                # Accumulate the general description from the paragraph
+                description += paragraph_text.strip() + " "
+
+        return {
+            'title': self.s.text(title_tag).strip(),
+            'link': "https://www.visitnsw.com" + self.s.attr(title_tag, 'href'),  # Full link
+            'description': description.strip(),
+            'distance': distance.strip(),
+            'time': time.strip(),
+            'leash_policy': leash_policy.strip()
+        }
+
+
+# Extractor classes by source name (the name of the source's Raw_Data file)
+EXTRACTORS = {extractor.source: extractor for extractor in (
+    HumanitixExtractor, HumanitixPetsExtractor, PupsyExtractor, YappackExtractor,
+    EventbriteExtractor, SouthAustraliaExtractor, VisitNSWExtractor, VisitNSWHikesExtractor,
+)}
@@ -0,0 +1,214 @@
+"""
+Shared asynchronous fetch engine for the requests-based scrapers.
+
+All requests go through one pooled aiohttp session, so connections to each
+host are kept alive and reused. Concurrency is capped globally and per host,
+and every page of a source is fetched at once while the results come back in
+the same order as the URLs that were passed in.
+
+When an HTTPCache is attached, cached pages are revalidated with conditional
+requests (or served straight from disk within their TTL) instead of being
+downloaded again.
+
+Requests are paced per host by an adaptive RateLimiter (see rate_limiter.py):
+429 and 5xx responses and connection errors are retried after a backoff, up to
+MAX_ATTEMPTS times, and slow that host down.
+
+Pages, bytes received, cache hits, retries and request latency are recorded
+per host in the process's metrics (see metrics.py).
+"""
+import time
+import asyncio
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import metrics
+from Scrapers.http_cache import HTTPCache
+from Scrapers.rate_limiter import RateLimiter, THROTTLE_STATUSES
+
+# Maximum number of open connections across all hosts
+MAX_CONNECTIONS = 20
+
+# Maximum number of open connections to any single host
+MAX_CONNECTIONS_PER_HOST = 4
+
+# Total time allowed for a single request, in seconds
+REQUEST_TIMEOUT = 30
+
+# Attempts per URL when the host throttles us (429/5xx) or the connection fails
+MAX_ATTEMPTS = 4
+
+# Result of fetching a single page. Failed requests set `error` (and leave
+# `status_code` as None) instead of raising, so one bad page never cancels the rest.
+# `from_cache` is True when the body came from the HTTP cache (fresh or 304).
+FetchResult = namedtuple('FetchResult', ['url', 'status_code', 'text', 'error', 'from_cache'],
+                         defaults=(False,))
+
+
+class Fetcher:
+    """
+    Owns the pooled HTTP session used for every request made through it.
+
+    Usage:
+        async with Fetcher() as fetcher:
+            pages = await fetcher.fetch_all(urls)
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_per_host=MAX_CONNECTIONS_PER_HOST,
+                 timeout=REQUEST_TIMEOUT, cache=None, rate_limiter=None, max_attempts=MAX_ATTEMPTS):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_attempts = max_attempts
+        self.session = None
+
+    async def __aenter__(self):
+        # The connector enforces both the global and the per-host connection caps
+        # and keeps idle connections open for reuse (keep-alive)
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host,
+                                         ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def fetch(self, url):
+        """
+        Fetches a single URL.
+        Parameters:
+            url (str): The URL to request.
+        Returns:
+            FetchResult: The status code and body text, or the error raised. A page
+                still throttled after max_attempts is returned with its last status.
+        """
+        host_name = urlsplit(url).netloc
+        entry = self.cache.get(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            metrics.count('cache_hits_total', client='http', host=host_name, kind='fresh')
+            return FetchResult(url, entry['status_code'], entry['body'], None, True)
+
+        start_time = time.perf_counter()
+        result = await self._request(url, entry)
+        metrics.observe('fetch_seconds', time.perf_counter() - start_time, host=host_name)
+        metrics.count('pages_fetched_total', client='http', host=host_name, status=result.status_code or 'error')
+        if result.from_cache:
+            metrics.count('cache_hits_total', client='http', host=host_name, kind='revalidated')
+        return result
+
+    async def _request(self, url, entry):
+        """Requests a URL (conditionally if there is a cache `entry`), retrying as described in fetch."""
+        headers = self.cache.conditional_headers(entry) if self.cache else {}
+        host_name = urlsplit(url).netloc
+        host = self.rate_limiter.for_url(url)
+        for attempt in range(1, self.max_attempts + 1):
+            await host.acquire()
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    # Throttled or overloaded: slow the host down and try again after the backoff
+                    if response.status in THROTTLE_STATUSES:
+                        delay = host.backoff(response.headers.get('Retry-After'))
+                        if attempt < self.max_attempts:
+                            print(f"{url} returned {response.status}, retrying in {delay:.1f}s")
+                            metrics.count('request_retries_total', client='http', host=host_name)
+                            continue
+                    else:
+                        host.record_success()
+
+                    # Not modified since the last run: reuse the cached body
+                    if response.status == 304 and entry:
+                        self.cache.refresh(url, entry)
+                        return FetchResult(url, entry['status_code'], entry['body'], None, True)
+
+                    body = await response.read()
+                    metrics.count('bytes_received_total', len(body), client='http', host=host_name)
+                    text = body.decode(response.get_encoding(), errors='replace')
+                    if self.cache and response.status == 200:
+                        self.cache.store(url, response.status, text, response.headers)
+                    return FetchResult(url, response.status, text, None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = host.backoff()
+                if attempt == self.max_attempts:
+                    metrics.count('request_errors_total', client='http', host=host_name)
+                    return FetchResult(url, None, '', e)
+                print(f"Failed to fetch {url} ({e!r}), retrying in {delay:.1f}s")
+                metrics.count('request_retries_total', client='http', host=host_name)
+
+    async def fetch_all(self, urls):
+        """
+        Fetches all URLs concurrently (within the connection caps).
+        Parameters:
+            urls (list): The URLs to request.
+        Returns:
+            list: One FetchResult per URL, in the same order as `urls`.
+        """
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+
+def fetch_pages(urls, **kwargs):
+    """
+    Synchronous entry point for scripts: fetches all URLs at once and waits for them.
+    Parameters:
+        urls (list): The URLs to request.
+        **kwargs: Passed on to Fetcher (max_connections, max_per_host, timeout, cache,
+            rate_limiter, max_attempts).
+            The shared on-disk HTTPCache is used unless `cache=None` is passed.
+    Returns:
+        list: One FetchResult per URL, in the same order as `urls`.
+    """
+    kwargs.setdefault('cache', HTTPCache())
+
+    async def run():
+        async with Fetcher(**kwargs) as fetcher:
+            return await fetcher.fetch_all(urls)
+
+    return asyncio.run(run())
+
+
+def iterate_pages(client, fetch_one, urls, sequential=False):
+    """
+    Runs an async client (Fetcher or Renderer) from synchronous code and yields
+    its results page by page, so a scraper can stop paginating early.
+    Parameters:
+        client: An async context manager such as Fetcher or Renderer.
+        fetch_one (callable): `fetch_one(client, url)` returning an awaitable result.
+        urls (list): The URLs to request.
+        sequential (bool): If False, every URL is requested at once up front. If True,
+            URLs are requested one at a time over the same client, so pages after
+            the point where the caller stops are never requested.
+    Yields:
+        The result for each URL, in the same order as `urls`.
+    """
+    async def fetch_all():
+        return await asyncio.gather(*(fetch_one(client, url) for url in urls))
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(client.__aenter__())
+    try:
+        if sequential:
+            for url in urls:
+                yield loop.run_until_complete(fetch_one(client, url))
+        else:
+            yield from loop.run_until_complete(fetch_all())
+    finally:
+        loop.run_until_complete(client.__aexit__(None, None, None))
+        loop.close()
+
+
+def iter_pages(urls, sequential=False, **kwargs):
+    """
+    Generator version of fetch_pages (see iterate_pages for `sequential`).
+    Parameters:
+        urls (list): The URLs to request.
+        sequential (bool): Fetch one page at a time instead of all at once.
+        **kwargs: Passed on to Fetcher, as for fetch_pages.
+    Yields:
+        FetchResult: One result per URL, in the same order as `urls`.
+    """
+    kwargs.setdefault('cache', HTTPCache())
+    yield from iterate_pages(Fetcher(**kwargs), lambda fetcher, url: fetcher.fetch(url), urls, sequential)
@@ -0,0 +1,360 @@
+"""
+Common framework for the scrapers.
+
+A source is a Scraper subclass that only declares where its pages are and how
+to read them (see Scrapers/sources.py):
+
+    class HumanitixScraper(Scraper):
+        name = 'Humantix'                       # Name used on the command line
+        extractor = HumanitixExtractor          # Field selectors (Scrapers/extractors.py)
+        url_template = "https://humanitix.com/au/search?query=dogs&page={page}"
+        pages = range(0, 5)
+        stop_on_error = True
+
+Defining the subclass registers it in SCRAPERS. The framework owns everything
+else: fetching (or rendering in the browser), pagination, parsing, the seen
+index for --incremental, and writing the Raw_Data output (JSON, NDJSON or an
+incremental delta).
+
+Any number of sources run concurrently in one process through a single
+ScrapeSession, so they share one HTTP connection pool, one headless browser
+(launched only if a source needs it), one HTTP cache and one rate limiter.
+
+Every page a source loads is also kept in the page archive (see archive.py). A
+ReplaySession serves the pages of an archived crawl in place of the network, so
+the sources can be re-extracted offline after a selector fix (scrape.py --replay).
+"""
+import os
+import json
+import time
+import asyncio
+from collections import namedtuple
+
+import metrics
+from Scrapers.archive import PageArchive
+from Scrapers.fetcher import Fetcher
+from Scrapers.http_cache import HTTPCache
+from Scrapers.ndjson_writer import NDJSONWriter
+from Scrapers.rate_limiter import RateLimiter
+from Scrapers.seen_index import SeenIndex, save_incremental_output
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Folder the sources write their records to (one file per source)
+RAW_DATA_DIRECTORY = os.path.join(PROJECT_ROOT, 'Raw_Data')
+
+# Seconds a source may run before it is cancelled (sources can override it)
+SCRAPER_TIMEOUT = 600
+
+# Registered sources by name (filled in by defining Scraper subclasses)
+SCRAPERS = {}
+
+# One fetched or rendered page: `text` is the page HTML ('' if it could not be loaded)
+Page = namedtuple('Page', ['url', 'status_code', 'text', 'error'])
+
+# Outcome of one source: `error` is None if it succeeded
+ScrapeResult = namedtuple('ScrapeResult', ['name', 'records', 'seconds', 'error'])
+
+
+class ScrapeSession:
+    """
+    The clients shared by every source in a run.
+
+    Usage:
+        async with ScrapeSession() as session:
+            page = await session.fetch(url, source='Humantix')
+            page = await session.render(url, wait_for='li.result', source='VisitNSW_Events_with_Details')
+    """
+
+    def __init__(self, cache=None, rate_limiter=None, archive=None):
+        """
+        Parameters:
+            cache (HTTPCache): Defaults to the shared on-disk cache.
+            rate_limiter (RateLimiter): Defaults to a new adaptive limiter.
+            archive (PageArchive): Where the loaded pages are kept; defaults to the shared archive.
+        """
+        self.cache = cache or HTTPCache()
+        self.archive = archive or PageArchive()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.fetcher = Fetcher(cache=self.cache, rate_limiter=self.rate_limiter)
+        self.renderer = None
+        self.renderer_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.fetcher.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.renderer is not None:
+            await self.renderer.__aexit__(exc_type, exc, tb)
+        await self.fetcher.__aexit__(exc_type, exc, tb)
+        self.archive.close()
+
+    def _archive(self, page, source, variant):
+        # Every response is kept (cache hits included), so the archive holds whole crawls
+        if page.status_code is not None:
+            self.archive.store(source, page.url, page.status_code, page.text, variant)
+        return page
+
+    async def fetch(self, url, source=None):
+        """Fetches a page over the shared connection pool and archives it under `source`."""
+        result = await self.fetcher.fetch(url)
+        return self._archive(Page(url, result.status_code, result.text, result.error), source, 'raw')
+
+    async def render(self, url, wait_for=None, source=None):
+        """Renders a page in the shared browser, launching it on first use, and archives it under `source`."""
+        async with self.renderer_lock:
+            if self.renderer is None:
+                # Imported here so runs without rendered sources never need a browser
+                from Scrapers.renderer import Renderer
+                renderer = Renderer(cache=self.cache, rate_limiter=self.rate_limiter)
+                await renderer.__aenter__()
+                self.renderer = renderer
+        result = await self.renderer.render(url, wait_for)
+        page = Page(url, result.status_code, result.html.html if result.html is not None else '', result.error)
+        return self._archive(page, source, 'rendered')
+
+
+class ReplaySession:
+    """
+    Serves the pages of an archived crawl in place of ScrapeSession, without any
+    network or browser: each page is the latest version its source loaded at or
+    before `as_of`. A page that was never archived comes back as a failed load.
+
+    Usage:
+        async with ReplaySession(as_of=time.time() - 86400) as session:
+            results = await run_scrapers(names, session=session)
+    """
+
+    def __init__(self, as_of=None, archive=None):
+        """
+        Parameters:
+            as_of (float): Unix time of the snapshot (None for the latest version of every page).
+            archive (PageArchive): Defaults to the shared archive.
+        """
+        self.as_of = as_of
+        self.archive = archive or PageArchive()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.archive.close()
+
+    def _replay(self, url, source, variant):
+        archived = self.archive.find(source, url, variant, self.as_of)
+        if archived is None:
+            metrics.count('replay_pages_total', source=source, status='missing')
+            return Page(url, None, '', f"not in the archive ({variant})")
+        metrics.count('replay_pages_total', source=source, status='found')
+        return Page(url, archived.status_code, self.archive.read(archived.digest), None)
+
+    async def fetch(self, url, source=None):
+        """Returns the archived body of a fetched page."""
+        return self._replay(url, source, 'raw')
+
+    async def render(self, url, wait_for=None, source=None):
+        """Returns the archived output of a rendered page."""
+        return self._replay(url, source, 'rendered')
+
+
+class Scraper:
+    """
+    Base class of every source. Subclasses set `name`, `extractor` and
+    `url_template` (with a {page} placeholder) and, where they differ from the
+    defaults, the attributes below.
+    """
+    name = None
+    # Extractor class for the source's pages; its `source` names the Raw_Data file
+    extractor = None
+    source = None
+    # Render the pages in the browser instead of fetching them, waiting for this selector
+    render = False
+    wait_for = None
+    # Page numbers (a single page by default), each formatted into url_template
+    url_template = None
+    pages = (1,)
+    # Stop at the first page without any records (otherwise the page is skipped)
+    stop_when_empty = True
+    # Stop at the first page that fails to load (otherwise the page is skipped)
+    stop_on_error = False
+    # Name of a source whose output this one reads; it runs after that source succeeds
+    depends_on = None
+    timeout = SCRAPER_TIMEOUT
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The source (Raw_Data file) is the extractor's, unless the class names its own
+        if cls.extractor is not None and 'source' not in cls.__dict__:
+            cls.source = cls.extractor.source
+        if cls.name:
+            SCRAPERS[cls.name] = cls
+
+    def log(self, message):
+        """Prints a message prefixed with the source name (sources run side by side)."""
+        print(f"[{self.name}] {message}", flush=True)
+
+    def page_url(self, page):
+        """Returns the URL of a page number from `pages`."""
+        return self.url_template.format(page=page)
+
+    async def get(self, session, url):
+        """Fetches or renders one page, as the source requires."""
+        if self.render:
+            return await session.render(url, self.wait_for, source=self.source)
+        return await session.fetch(url, source=self.source)
+
+    async def iter_pages(self, session, sequential=False):
+        """
+        Yields (page number, page) for every page.
+        Parameters:
+            session (ScrapeSession): The shared clients.
+            sequential (bool): If False, every page is requested at once up front. If True,
+                pages are requested one at a time, so pages after the point where the
+                caller stops are never requested.
+        """
+        pages = list(self.pages)
+        urls = [self.page_url(page) for page in pages]
+        if sequential:
+            for page, url in zip(pages, urls):
+                yield page, await self.get(session, url)
+        else:
+            results = await asyncio.gather(*(self.get(session, url) for url in urls))
+            for page, result in zip(pages, results):
+                yield page, result
+
+    async def run(self, session, incremental=False, ndjson=False):
+        """
+        Scrapes every page and writes the records to Raw_Data/<source>.json.
+        Parameters:
+            session (ScrapeSession): The shared clients.
+            incremental (bool): Stop at the first page with only known records, and emit
+                only new or changed ones (merged into the full file, see seen_index.py).
+            ndjson (bool): Stream each page's records to Raw_Data/<source>.ndjson instead.
+        Returns:
+            int: The number of records emitted.
+        Raises:
+            RuntimeError: If none of the pages could be loaded (the previous output is kept).
+        """
+        kind = self.extractor.kind
+        extract = self.extractor()
+        # A full run rebuilds the seen index from scratch
+        seen_index = SeenIndex(self.source, reset=not incremental)
+        output_file = os.path.join(RAW_DATA_DIRECTORY, f"{self.source}.json")
+        os.makedirs(RAW_DATA_DIRECTORY, exist_ok=True)
+        # Opened once the first page has loaded, so a failed run leaves the previous file in place
+        ndjson_writer = None
+
+        records = []
+        emitted = loaded_pages = 0
+        try:
+            async for page, result in self.iter_pages(session, sequential=incremental):
+                self.log(f"Scraping page {page}: {result.url}")
+                if result.status_code != 200:
+                    self.log(f"Failed to retrieve page {page}. Status code: {result.status_code}, "
+                             f"error: {result.error}")
+                    if self.stop_on_error:
+                        break
+                    continue
+                loaded_pages += 1
+
+                page_records = extract(result.text)
+                if page_records is None:
+                    if self.stop_when_empty:
+                        self.log(f"No more {kind}s found on page {page}, stopping.")
+                        break
+                    self.log(f"No {kind}s found on page {page}.")
+                    page_records = []
+
+                # Record the page in the seen index; in incremental mode keep only new or
+                # changed records, and stop once a page has none
+                new_records = seen_index.filter_new(page_records)
+                if incremental:
+                    metrics.count('records_dropped_total', len(page_records) - len(new_records),
+                                  source=self.source, reason='unchanged')
+                    page_records = new_records
+                    if not page_records:
+                        self.log(f"Only known {kind}s on page {page}, stopping.")
+                        break
+
+                metrics.count('records_emitted_total', len(page_records), source=self.source)
+                emitted += len(page_records)
+                if ndjson:
+                    # Stream the records from the current page straight to disk
+                    if ndjson_writer is None:
+                        ndjson_writer = NDJSONWriter(os.path.splitext(output_file)[0] + '.ndjson')
+                    ndjson_writer.write(page_records)
+                if incremental or not ndjson:
+                    records.extend(page_records)
+        finally:
+            if ndjson_writer is not None:
+                ndjson_writer.close()
+
+        if not loaded_pages:
+            raise RuntimeError("none of the pages could be loaded; the previous output was kept")
+
+        if incremental:
+            # Save the new or changed records and merge them into the full JSON file
+            save_incremental_output(output_file, records, seen_index)
+        elif ndjson:
+            # The records were already streamed to the NDJSON file page by page
+            if ndjson_writer is None:
+                ndjson_writer = NDJSONWriter(os.path.splitext(output_file)[0] + '.ndjson')
+                ndjson_writer.close()
+            output_file = ndjson_writer.path
+            seen_index.save()
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(records, f, indent=4)
+            seen_index.save()
+
+        self.log(f"{emitted} {kind}s saved to {output_file}")
+        return emitted
+
+
+async def run_scrapers(names, incremental=False, ndjson=False, session=None):
+    """
+    Runs the given sources concurrently over one shared session. A source with
+    `depends_on` waits for that source (when it is also being run) and is
+    skipped if it failed. Each source is cancelled after its `timeout`.
+    Parameters:
+        names (list): Source names (keys of SCRAPERS).
+        incremental (bool): Passed on to every source's run.
+        ndjson (bool): Passed on to every source's run.
+        session (ScrapeSession): Defaults to a new session, closed at the end (pass a
+            ReplaySession to re-extract an archived crawl).
+    Returns:
+        list: One ScrapeResult per source, in the order given.
+    """
+    tasks = {}
+
+    async def run_source(name, session):
+        scraper = SCRAPERS[name]()
+        if scraper.depends_on in tasks:
+            dependency = await tasks[scraper.depends_on]
+            if dependency.error:
+                return ScrapeResult(name, 0, 0.0, f"skipped because {scraper.depends_on} failed")
+
+        start_time = time.perf_counter()
+        try:
+            records = await asyncio.wait_for(scraper.run(session, incremental, ndjson), scraper.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            records, error = 0, f"timed out after {scraper.timeout}s"
+        except Exception as e:
+            # One broken source must not stop the others
+            records, error = 0, f"{type(e).__name__}: {e}"
+        if error:
+            scraper.log(f"Failed: {error}")
+        return ScrapeResult(name, records, time.perf_counter() - start_time, error)
+
+    async def run_all(session):
+        for name in names:
+            tasks[name] = asyncio.ensure_future(run_source(name, session))
+        return list(await asyncio.gather(*tasks.values()))
+
+    if session is not None:
+        return await run_all(session)
+    async with ScrapeSession() as session:
+        return await run_all(session)
+
@@ -0,0 +1,108 @@
+"""
+Persistent on-disk HTTP cache shared by all scrapers.
+
+Each response body is stored on disk together with its validators (ETag and
+Last-Modified), keyed by URL. Later runs send If-None-Match / If-Modified-Since
+and reuse the stored body when the server answers 304 Not Modified. Responses
+without any validators are reused for a fixed time-to-live instead.
+"""
+import os
+import json
+import time
+import hashlib
+
+# Cache folder in the project root (outside the 'Scrapers' directory)
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Cache', 'http')
+
+# Seconds a response without validators is reused before it is downloaded again
+DEFAULT_TTL = 6 * 60 * 60
+
+
+class HTTPCache:
+    """
+    Stores one JSON file per cached URL:
+        {"url", "status_code", "body", "etag", "last_modified", "stored_at"}
+    """
+
+    def __init__(self, directory=CACHE_DIRECTORY, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, url, variant):
+        key = hashlib.sha256(f"{variant}:{url}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, url, variant='raw'):
+        """
+        Looks up the cached entry for a URL.
+        Parameters:
+            url (str): The requested URL.
+            variant (str): Keeps different representations of one URL apart
+                (e.g. 'raw' HTTP bodies and 'rendered' browser output).
+        Returns:
+            dict: The cached entry, or None if the URL is not cached.
+        """
+        try:
+            with open(self._path(url, variant), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_fresh(self, entry):
+        """
+        Returns True if an entry can be used without contacting the server.
+        Only entries without validators are served from the TTL; entries with an
+        ETag or Last-Modified are always revalidated with a conditional request.
+        """
+        if entry.get('etag') or entry.get('last_modified'):
+            return False
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """
+        Builds the If-None-Match / If-Modified-Since headers for revalidating an entry.
+        Parameters:
+            entry (dict): A cached entry returned by get(), or None.
+        Returns:
+            dict: The request headers to send (empty if there is nothing to validate).
+        """
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, status_code, body, headers=None, variant='raw'):
+        """
+        Saves a response body and its validators.
+        Parameters:
+            url (str): The requested URL.
+            status_code (int): The HTTP status code of the response.
+            body (str): The response body.
+            headers (Mapping): The response headers (ETag / Last-Modified are read from here).
+            variant (str): See get().
+        """
+        headers = headers or {}
+        entry = {
+            'url': url,
+            'status_code': status_code,
+            'body': body,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'stored_at': time.time()
+        }
+        self._write(self._path(url, variant), entry)
+
+    def refresh(self, url, entry, variant='raw'):
+        """Marks an entry as just revalidated (after a 304 Not Modified)."""
+        entry['stored_at'] = time.time()
+        self._write(self._path(url, variant), entry)
+
+    def _write(self, path, entry):
+        # Write to a temporary file first so an interrupted run never leaves a half-written entry
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp_path, path)
@@ -0,0 +1,41 @@
+"""
+Streaming newline-delimited JSON (NDJSON) output for the scrapers.
+
+Records are written one JSON object per line as soon as a page has been
+parsed, and the file is flushed after every batch. Memory stays flat no matter
+how many pages a source has, a crash only loses the page being parsed, and
+downstream stages (Cleaner/combine.py) can read the file while it grows.
+"""
+import json
+
+
+class NDJSONWriter:
+    """
+    Usage:
+        with NDJSONWriter(path) as writer:
+            writer.write(page_records)
+    """
+
+    def __init__(self, path, mode='w'):
+        """
+        Parameters:
+            path (str): The .ndjson file to write.
+            mode (str): 'w' to start a new file, 'a' to append to an existing one.
+        """
+        self.path = path
+        self.file = open(path, mode, encoding='utf-8')
+
+    def write(self, records):
+        """Appends records (one per line) and flushes them to disk."""
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
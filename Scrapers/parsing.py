@@ -0,0 +1,184 @@
+"""
+Pluggable HTML parsing backends for the scrapers.
+
+Extraction code is written once against a small backend interface (parse,
+compiled selectors, text, attr, siblings) and runs on any registered backend:
+    lxml         lxml.html (libxml2, in C) with selectors compiled to XPath.
+                 The default whenever lxml is installed.
+    html.parser  BeautifulSoup with Python's html.parser and soupsieve. Parsing
+                 is limited to the source's card containers (SoupStrainer), so
+                 the rest of the page is never turned into a tree.
+
+Each source declares its CSS selectors once in a Selectors object, which
+compiles them for the chosen backend up front instead of on every lookup.
+Selectors use the subset of CSS the scrapers need: a tag and/or classes per
+step ("div.card.h-100"), optionally ":nth-of-type(n)" after a tag, with steps
+separated by spaces (descendants).
+"""
+import re
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # Fall back to BeautifulSoup's html.parser
+    lxml = None
+
+# One step of a selector: an optional tag, any number of .classes and an optional :nth-of-type(n)
+SELECTOR_STEP = re.compile(r'^(?P<tag>[A-Za-z][\w-]*|\*)?(?P<classes>(?:\.[\w-]+)*)'
+                           r'(?::nth-of-type\((?P<nth>\d+)\))?$')
+
+
+def parse_selector(selector):
+    """
+    Splits a selector into (tag, classes) steps.
+    Parameters:
+        selector (str): e.g. 'div.card.h-100 h3.geodir-entry-title'
+    Returns:
+        list: One (tag or None, list of classes, nth-of-type or None) tuple per step.
+    Raises:
+        ValueError: If the selector uses syntax outside the supported subset.
+    """
+    steps = []
+    for step in selector.split():
+        match = SELECTOR_STEP.match(step)
+        tag = match.group('tag') if match and match.group('tag') not in (None, '*') else None
+        if not match or (match.group('nth') and not tag):
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        nth = int(match.group('nth')) if match.group('nth') else None
+        steps.append((tag, match.group('classes').split('.')[1:], nth))
+    return steps
+
+
+def selector_to_xpath(selector):
+    """Translates a selector to the equivalent XPath, relative to the node it is applied to."""
+    steps = []
+    for tag, classes, nth in parse_selector(selector):
+        predicates = ''.join(f"[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+                             for name in classes)
+        if nth:
+            predicates += f"[count(preceding-sibling::{tag}) = {nth - 1}]"
+        steps.append(f"descendant::{tag or '*'}{predicates}")
+    return '/'.join(steps)
+
+
+class LxmlBackend:
+    """lxml.html parsing with selectors compiled to XPath."""
+    name = 'lxml'
+
+    def parse(self, text, container=None):
+        # libxml2 parses the whole page faster than any partial Python parse, so `container` is unused
+        if not text or not text.strip():
+            text = '<html></html>'
+        # Always the <html> root, so selectors also match the top element of a fragment
+        return lxml.html.document_fromstring(text)
+
+    def compile(self, selector):
+        return etree.XPath(selector_to_xpath(selector))
+
+    def text(self, node):
+        return node.text_content()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def tag(self, node):
+        return node.tag
+
+    def next_siblings(self, node):
+        # Elements only (comments and processing instructions are skipped, as in BeautifulSoup)
+        return node.itersiblings(etree.Element)
+
+
+class SoupBackend:
+    """BeautifulSoup with html.parser, parsing only the card containers."""
+    name = 'html.parser'
+
+    def parse(self, text, container=None):
+        strainer = None
+        if container:
+            # Keep only the subtrees under the first step of the container selector
+            tag, classes, _ = parse_selector(container)[0]
+            # The class attribute is still one string while parsing, so match the class as a word
+            class_pattern = re.compile(rf'(?:^|\s){re.escape(classes[0])}(?:\s|$)') if classes else None
+            strainer = SoupStrainer(tag, class_=class_pattern)
+        return BeautifulSoup(text, 'html.parser', parse_only=strainer)
+
+    def compile(self, selector):
+        return soupsieve.compile(selector).select
+
+    def text(self, node):
+        return node.get_text()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def tag(self, node):
+        return node.name
+
+    def next_siblings(self, node):
+        return (sibling for sibling in node.next_siblings if isinstance(sibling, Tag))
+
+
+# Registered backends by name
+BACKENDS = {'html.parser': SoupBackend}
+if lxml is not None:
+    BACKENDS['lxml'] = LxmlBackend
+
+# Backend used when a source does not ask for a specific one
+DEFAULT_BACKEND = 'lxml' if lxml is not None else 'html.parser'
+
+
+class Selectors:
+    """
+    The CSS selectors of one source, compiled once for a parsing backend.
+
+    Usage:
+        selectors = Selectors(container='cards', cards='a.event-card', title='h6')
+        page = selectors.parse(html_text)
+        for card in selectors.select('cards', page):
+            title = selectors.text(selectors.first('title', card))
+    """
+
+    def __init__(self, backend=None, container=None, **selectors):
+        """
+        Parameters:
+            backend (str): A name from BACKENDS (defaults to DEFAULT_BACKEND).
+            container (str): Name of the selector matching the blocks records are
+                extracted from; backends that support it parse only those blocks.
+            **selectors: CSS selectors by name.
+        """
+        self.backend = BACKENDS[backend or DEFAULT_BACKEND]()
+        self.container = selectors[container] if container else None
+        self.compiled = {name: self.backend.compile(selector) for name, selector in selectors.items()}
+
+    def parse(self, text):
+        """Parses a page and returns its root node."""
+        return self.backend.parse(text, self.container)
+
+    def select(self, name, node):
+        """Returns every descendant of `node` matching the named selector."""
+        return self.compiled[name](node)
+
+    def first(self, name, node):
+        """Returns the first descendant of `node` matching the named selector, or None."""
+        matches = self.compiled[name](node)
+        return matches[0] if matches else None
+
+    def text(self, node):
+        """Returns the text content of a node."""
+        return self.backend.text(node)
+
+    def attr(self, node, name):
+        """Returns an attribute of a node (None if it is not set)."""
+        return self.backend.attr(node, name)
+
+    def tag(self, node):
+        """Returns the tag name of a node."""
+        return self.backend.tag(node)
+
+    def next_siblings(self, node):
+        """Yields the element siblings that follow a node."""
+        return self.backend.next_siblings(node)
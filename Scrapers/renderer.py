@@ -0,0 +1,211 @@
+"""
+Pooled headless-browser renderer for the JavaScript-heavy scrapers.
+
+One Chromium instance is launched per run and kept alive with a fixed pool of
+tabs. Pages are rendered in parallel (one per tab) and each render waits for a
+readiness selector to appear instead of sleeping for a fixed amount of time.
+Rendered pages are returned as requests_html HTML objects, so the existing
+`.find(...)` extraction code keeps working unchanged.
+
+Rendered output carries no HTTP validators, so when an HTTPCache is attached
+rendered pages are reused for the cache's TTL before being rendered again.
+
+Navigations are paced per host by the same adaptive RateLimiter as the fetcher,
+and 429/5xx responses are retried after a backoff like failed navigations.
+
+Pages, bytes rendered, cache hits, retries and render time are recorded per
+host in the process's metrics (see metrics.py).
+"""
+import time
+import asyncio
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import pyppeteer
+from requests_html import HTML
+
+import metrics
+from Scrapers.fetcher import iterate_pages
+from Scrapers.http_cache import HTTPCache
+from Scrapers.rate_limiter import RateLimiter, THROTTLE_STATUSES
+
+# Number of browser tabs rendering pages at the same time
+RENDER_POOL_SIZE = 8
+
+# Time allowed for navigation and for the readiness selector, in seconds
+RENDER_TIMEOUT = 20
+
+# Number of attempts per page when navigation fails or times out
+MAX_RETRIES = 3
+
+# Resource types that are never needed for extraction and are skipped to speed up rendering
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font'}
+
+# Result of rendering a single page. `html` is a requests_html HTML object (None if
+# the page could not be loaded) and `ready` says whether the readiness selector appeared.
+RenderResult = namedtuple('RenderResult', ['url', 'status_code', 'html', 'ready', 'error'])
+
+
+async def _filter_request(request):
+    """Aborts requests for resources the scrapers never look at; lets everything else through."""
+    if request.resourceType in BLOCKED_RESOURCE_TYPES:
+        await request.abort()
+    else:
+        await request.continue_()
+
+
+class Renderer:
+    """
+    Keeps one headless browser alive with a pool of reusable tabs.
+
+    Usage:
+        async with Renderer() as renderer:
+            pages = await renderer.render_all(urls, wait_for='li.search__page-result')
+    """
+
+    def __init__(self, pool_size=RENDER_POOL_SIZE, timeout=RENDER_TIMEOUT, max_retries=MAX_RETRIES, cache=None,
+                 rate_limiter=None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.browser = None
+        self.tabs = None
+
+    async def __aenter__(self):
+        self.browser = await pyppeteer.launch(headless=True, args=['--no-sandbox'])
+        self.tabs = asyncio.Queue()
+        for _ in range(self.pool_size):
+            tab = await self.browser.newPage()
+            await tab.setRequestInterception(True)
+            tab.on('request', lambda request: asyncio.ensure_future(_filter_request(request)))
+            self.tabs.put_nowait(tab)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.browser.close()
+
+    async def render(self, url, wait_for=None):
+        """
+        Renders a single URL in the next free tab.
+        Parameters:
+            url (str): The URL to render.
+            wait_for (str): CSS selector that marks the page as ready. If it does not
+                appear within the timeout, the page is returned as-is with ready=False
+                (e.g. a search page past the last result).
+        Returns:
+            RenderResult: The status code and rendered HTML, or the error raised.
+        """
+        host_name = urlsplit(url).netloc
+        entry = self.cache.get(url, variant='rendered') if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            metrics.count('cache_hits_total', client='browser', host=host_name, kind='fresh')
+            return RenderResult(url, entry['status_code'], HTML(html=entry['body'], url=url), True, None)
+
+        start_time = time.perf_counter()
+        result = await self._render(url, wait_for)
+        metrics.observe('render_seconds', time.perf_counter() - start_time, host=host_name)
+        metrics.count('pages_fetched_total', client='browser', host=host_name, status=result.status_code or 'error')
+        return result
+
+    async def _render(self, url, wait_for):
+        """Renders a URL in the next free tab, retrying as described in render."""
+        host_name = urlsplit(url).netloc
+        timeout_ms = self.timeout * 1000
+        host = self.rate_limiter.for_url(url)
+        tab = await self.tabs.get()
+        try:
+            error = None
+            for attempt in range(self.max_retries):
+                await host.acquire()
+                try:
+                    response = await tab.goto(url, {'waitUntil': 'domcontentloaded', 'timeout': timeout_ms})
+                except pyppeteer.errors.PyppeteerError as e:
+                    host.backoff()
+                    print(f"Failed to load {url} ({e}), attempt {attempt + 1} of {self.max_retries}")
+                    if attempt + 1 < self.max_retries:
+                        metrics.count('request_retries_total', client='browser', host=host_name)
+                    error = e
+                    continue
+                # Throttled or overloaded: slow the host down and retry (the last attempt is kept as-is)
+                if response and response.status in THROTTLE_STATUSES:
+                    delay = host.backoff(response.headers.get('retry-after'))
+                    if attempt + 1 < self.max_retries:
+                        print(f"{url} returned {response.status}, retrying in {delay:.1f}s")
+                        metrics.count('request_retries_total', client='browser', host=host_name)
+                        continue
+                else:
+                    host.record_success()
+                break
+            else:
+                metrics.count('request_errors_total', client='browser', host=host_name)
+                return RenderResult(url, None, None, False, error)
+
+            # Wait for the content we are going to extract rather than a fixed sleep
+            ready = True
+            if wait_for:
+                try:
+                    await tab.waitForSelector(wait_for, {'timeout': timeout_ms})
+                except pyppeteer.errors.TimeoutError:
+                    ready = False
+
+            content = await tab.content()
+            metrics.count('bytes_received_total', len(content.encode('utf-8')), client='browser', host=host_name)
+            status_code = response.status if response else None
+            # Only cache complete pages, so a page that never became ready is retried next run
+            if self.cache and ready and status_code == 200:
+                self.cache.store(url, status_code, content, variant='rendered')
+            return RenderResult(url, status_code, HTML(html=content, url=url), ready, None)
+        except pyppeteer.errors.PyppeteerError as e:
+            metrics.count('request_errors_total', client='browser', host=host_name)
+            return RenderResult(url, None, None, False, e)
+        finally:
+            self.tabs.put_nowait(tab)
+
+    async def render_all(self, urls, wait_for=None):
+        """
+        Renders all URLs in parallel across the tab pool.
+        Parameters:
+            urls (list): The URLs to render.
+            wait_for (str): CSS selector that marks each page as ready.
+        Returns:
+            list: One RenderResult per URL, in the same order as `urls`.
+        """
+        return await asyncio.gather(*(self.render(url, wait_for) for url in urls))
+
+
+def render_pages(urls, wait_for=None, **kwargs):
+    """
+    Synchronous entry point for scripts: renders all URLs and waits for them.
+    Parameters:
+        urls (list): The URLs to render.
+        wait_for (str): CSS selector that marks each page as ready.
+        **kwargs: Passed on to Renderer (pool_size, timeout, max_retries, cache, rate_limiter).
+            The shared on-disk HTTPCache is used unless `cache=None` is passed.
+    Returns:
+        list: One RenderResult per URL, in the same order as `urls`.
+    """
+    kwargs.setdefault('cache', HTTPCache())
+
+    async def run():
+        async with Renderer(**kwargs) as renderer:
+            return await renderer.render_all(urls, wait_for)
+
+    return asyncio.run(run())
+
+
+def iter_rendered_pages(urls, wait_for=None, sequential=False, **kwargs):
+    """
+    Generator version of render_pages (see fetcher.iterate_pages for `sequential`).
+    Parameters:
+        urls (list): The URLs to render.
+        wait_for (str): CSS selector that marks each page as ready.
+        sequential (bool): Render one page at a time instead of all at once.
+        **kwargs: Passed on to Renderer, as for render_pages.
+    Yields:
+        RenderResult: One result per URL, in the same order as `urls`.
+    """
+    kwargs.setdefault('cache', HTTPCache())
+    yield from iterate_pages(Renderer(**kwargs), lambda renderer, url: renderer.render(url, wait_for),
+                             urls, sequential)
@@ -0,0 +1,93 @@
+"""
+Runs the scrapers (see Scrapers/sources.py) in one process, all at the same
+time, sharing one connection pool, one headless browser and one HTTP cache.
+
+Usage:
+    python Scrapers/scrape.py                          Every source
+    python Scrapers/scrape.py --only Humantix,pupsy    Just these sources
+    python Scrapers/scrape.py --incremental --ndjson   Incremental / NDJSON output (see framework.py)
+    python Scrapers/scrape.py --results <file>         Also write each source's outcome to a JSON file
+    python Scrapers/scrape.py --replay                 Re-extract the latest archived pages, offline
+    python Scrapers/scrape.py --replay 2024-10-01T18:00   ... as they were archived at that (local) time
+
+With --replay no request is made: every source reads its pages from the page
+archive (see archive.py) and writes its Raw_Data output as a live run would.
+
+The per-source scripts (Scrapers/Humantix.py etc.) run a single source the same way.
+"""
+import os
+import sys
+import json
+import asyncio
+from datetime import datetime
+
+# Make the project root importable so the shared Scrapers/ modules can be used
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Scrapers.framework import ReplaySession, run_scrapers
+from Scrapers.sources import SCRAPERS
+
+
+def parse_sources(argv):
+    """Returns the sources selected with --only (all of them by default)."""
+    if '--only' not in argv:
+        return list(SCRAPERS)
+    index = argv.index('--only')
+    selected = argv[index + 1].split(',') if index + 1 < len(argv) else []
+    unknown = [name for name in selected if name not in SCRAPERS]
+    if unknown:
+        raise SystemExit(f"Unknown source(s): {', '.join(unknown)}. Choose from: {', '.join(SCRAPERS)}")
+    return selected
+
+
+def parse_replay(argv):
+    """
+    Returns the session given by --replay [time], or None without --replay.
+    Raises:
+        SystemExit: If the time is not an ISO date or date and time.
+    """
+    if '--replay' not in argv:
+        return None
+    index = argv.index('--replay')
+    value = argv[index + 1] if index + 1 < len(argv) and not argv[index + 1].startswith('--') else None
+    try:
+        as_of = datetime.fromisoformat(value).timestamp() if value else None
+    except ValueError:
+        raise SystemExit(f"Invalid --replay time {value!r}; use e.g. 2024-10-01T18:00") from None
+    return ReplaySession(as_of)
+
+
+def save_results(results, results_file):
+    """Writes each source's outcome ({name: {records, seconds, error}}) to a JSON file."""
+    os.makedirs(os.path.dirname(os.path.abspath(results_file)), exist_ok=True)
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump({result.name: result._asdict() for result in results}, f, indent=4)
+
+
+def main(names, argv):
+    """
+    Runs the given sources with the flags in `argv`, prints a report and exits
+    with code 1 if any of them failed.
+    Parameters:
+        names (list): Source names (keys of SCRAPERS).
+        argv (list): The command-line arguments (--incremental, --ndjson, --replay [time],
+            --results <file>).
+    """
+    async def run(session):
+        if session is None:
+            return await run_scrapers(names, incremental='--incremental' in argv, ndjson='--ndjson' in argv)
+        async with session:
+            return await run_scrapers(names, '--incremental' in argv, '--ndjson' in argv, session)
+
+    results = asyncio.run(run(parse_replay(argv)))
+
+    print("Sources:")
+    for result in results:
+        print(f"  {result.name:<16} {result.seconds:8.1f}s {result.records:6} records  {result.error or 'ok'}")
+
+    if '--results' in argv and argv.index('--results') + 1 < len(argv):
+        save_results(results, argv[argv.index('--results') + 1])
+    sys.exit(1 if any(result.error for result in results) else 0)
+
+
+if __name__ == '__main__':
+    main(parse_sources(sys.argv), sys.argv)
@@ -0,0 +1,116 @@
+"""
+Persistent per-source index of already-seen events, used by the scrapers'
+incremental mode (`--incremental`).
+
+Each event is identified by its link where one is available, and by its title
+plus date otherwise. The index stores a fingerprint of every event's content,
+so a scraper can tell new and changed events apart from ones it has already
+emitted, and stop paginating once a page contains nothing but known events.
+"""
+import os
+import json
+import hashlib
+
+# Index folder in the project root (clearing the cache forces a full refresh)
+INDEX_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Cache', 'seen')
+
+# Fields tried, in order, as the "date" part of the key when an event has no link.
+# Humanitix packs its date into `description`; venues without any date fall back to `location`.
+DATE_FIELDS = ('date', 'date_range', 'description', 'location')
+
+
+def event_key(record):
+    """
+    Builds the identity key of an event.
+    Parameters:
+        record (dict): A scraped event.
+    Returns:
+        str: The event link, or "title|date" when there is no usable link.
+    """
+    link = record.get('link')
+    if link and link != "N/A":
+        return link
+    date = next((record[field] for field in DATE_FIELDS if record.get(field)), '')
+    return f"{record.get('title', '')}|{date}"
+
+
+def event_fingerprint(record):
+    """Returns a short hash of the event's full content, used to detect changed events."""
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class SeenIndex:
+    """Maps event keys to content fingerprints for a single source."""
+
+    def __init__(self, source, directory=INDEX_DIRECTORY, reset=False):
+        """
+        Parameters:
+            source (str): Name of the source (one index file per source).
+            directory (str): Folder holding the index files.
+            reset (bool): Start from an empty index instead of loading the saved one
+                (used by full runs, which re-record every event they see).
+        """
+        self.path = os.path.join(directory, f"{source}.json")
+        self.fingerprints = {}
+        if reset:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.fingerprints = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.fingerprints = {}
+
+    def filter_new(self, records):
+        """
+        Returns only the new or changed records, and marks them as seen.
+        Parameters:
+            records (list): Events parsed from one page.
+        Returns:
+            list: The records whose key is unknown or whose content changed.
+        """
+        new_records = []
+        for record in records:
+            key, fingerprint = event_key(record), event_fingerprint(record)
+            if self.fingerprints.get(key) != fingerprint:
+                self.fingerprints[key] = fingerprint
+                new_records.append(record)
+        return new_records
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.fingerprints, f)
+
+
+def save_incremental_output(output_file, new_records, seen_index):
+    """
+    Saves the result of an incremental run.
+    The new or changed records are written on their own to Raw_Data/Incremental/,
+    and merged (by event key) into the source's full Raw_Data file so the rest of
+    the pipeline still sees every event.
+    Parameters:
+        output_file (str): The source's full Raw_Data JSON file.
+        new_records (list): The new or changed records found by this run.
+        seen_index (SeenIndex): The index to persist once the output is written.
+    """
+    # Write the delta on its own
+    delta_directory = os.path.join(os.path.dirname(output_file), 'Incremental')
+    os.makedirs(delta_directory, exist_ok=True)
+    delta_file = os.path.join(delta_directory, os.path.basename(output_file))
+    with open(delta_file, 'w') as f:
+        json.dump(new_records, f, indent=4)
+
+    # Merge into the full file, replacing changed events in place and appending new ones
+    try:
+        with open(output_file, 'r') as f:
+            existing_records = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        existing_records = []
+    merged = {event_key(record): record for record in existing_records}
+    merged.update((event_key(record), record) for record in new_records)
+    with open(output_file, 'w') as f:
+        json.dump(list(merged.values()), f, indent=4)
+
+    seen_index.save()
+    print(f"{len(new_records)} new or changed records saved to {delta_file}")
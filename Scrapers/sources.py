@@ -0,0 +1,226 @@
+"""
+Every source the pipeline scrapes, declared on the Scraper framework (see
+framework.py): where its pages are, how it paginates and which extractor
+(field selectors, see extractors.py) reads them.
+
+Importing this module registers the sources in SCRAPERS.
+"""
+import os
+import asyncio
+
+import metrics
+from Cleaner.combine import find_source_files, iter_records
+from Scrapers.extractors import (HumanitixExtractor, HumanitixPetsExtractor, PupsyExtractor, YappackExtractor,
+                                 EventbriteExtractor, SouthAustraliaExtractor, VisitNSWExtractor,
+                                 VisitNSWHikesExtractor)
+from Scrapers.framework import SCRAPERS, RAW_DATA_DIRECTORY, Scraper
+from Scrapers.ndjson_writer import NDJSONWriter
+from Scrapers.parsing import Selectors
+
+
+class HumanitixScraper(Scraper):
+    """Humanitix search results for "dogs"; stops at the first empty or failed page."""
+    name = 'Humantix'
+    extractor = HumanitixExtractor
+    url_template = "https://humanitix.com/au/search?query=dogs&page={page}"
+    pages = range(0, 5)
+    stop_on_error = True
+
+
+class HumanitixPetsScraper(HumanitixScraper):
+    """Humanitix search results for "pets" (events with "pet" in the title)."""
+    name = 'HumantixPets'
+    extractor = HumanitixPetsExtractor
+    url_template = "https://humanitix.com/au/search?query=pets&page={page}"
+
+
+class EventbriteScraper(Scraper):
+    """Eventbrite's discover pages (rendered); pages without results are skipped."""
+    name = 'eventbrite'
+    extractor = EventbriteExtractor
+    render = True
+    wait_for = 'section.event-card-details'
+    url_template = "https://www.eventbrite.com.au/d/australia/dog/?page={page}"
+    pages = range(1, 7)
+    stop_when_empty = False
+
+
+class PupsyScraper(Scraper):
+    """Pupsy's dog-friendly pubs and bars category."""
+    name = 'pupsy'
+    extractor = PupsyExtractor
+    base_url = "https://pupsy.com.au/places/category/dog-friendly-pubs-bars/"
+    url_template = base_url + "page/{page}/"
+    pages = range(1, 3)
+
+    def page_url(self, page):
+        # The first page has no /page/1/ suffix
+        return super().page_url(page) if page > 1 else self.base_url
+
+
+class YappackScraper(Scraper):
+    """The Yappack dog-friendly events listing."""
+    name = 'yappack'
+    extractor = YappackExtractor
+    url_template = "https://theyappack.com.au/dog-friendly-events/page/{page}"
+    pages = range(1, 3)
+
+
+class SouthAustraliaScraper(Scraper):
+    """South Australia's search results for "dogs" (rendered); pages without results are skipped."""
+    name = 'southAustralia'
+    extractor = SouthAustraliaExtractor
+    render = True
+    wait_for = 'div.product-card__content'
+    url_template = "https://southaustralia.com/search?Search=&q=dogs&page={page}"
+    pages = range(1, 7)
+    stop_when_empty = False
+
+
+class VisitNSWScraper(Scraper):
+    """VisitNSW event search results (rendered), Phase 1: basic data and the detail page links."""
+    name = 'visitNSW'
+    extractor = VisitNSWExtractor
+    render = True
+    wait_for = 'li.search__page-result'
+    url_template = "https://www.visitnsw.com/search?query=dogs&type=events&page={page}"
+    pages = range(1, 13)
+
+
+class VisitNSWHikesScraper(Scraper):
+    """The VisitNSW dog-friendly hikes article (a single page)."""
+    name = 'visitNSW_Hikes'
+    extractor = VisitNSWHikesExtractor
+    url_template = "https://www.visitnsw.com/articles/dog-friendly-hikes-and-walks-in-nsw"
+
+
+class VisitNSWDetailsScraper(Scraper):
+    """
+    VisitNSW Phase 2: renders the detail page of every event found by Phase 1 and
+    adds its date and location. Each event is written as soon as it finishes, so a
+    crashed run resumes where it stopped; --incremental and --ndjson do not apply.
+    Events whose page could not be loaded, or whose date never appeared, go to the
+    failed file and are retried on the next run.
+    """
+    name = 'visitNSW_Phase2'
+    source = 'VisitNSW_Details'
+    depends_on = 'visitNSW'
+    render = True
+    wait_for = 'span.event-date'
+    timeout = 1800
+
+    # Detail pages rendered at the same time by this scraper, whatever the size of the
+    # shared browser's tab pool (the other rendered sources use the same tabs)
+    max_concurrent_details = 8
+
+    # Successes sit next to the other sources so combine.py picks them up; dedup merges each
+    # with the Phase 1 record of the same link and keeps the more complete Phase 2 one.
+    # Failures are kept in their own folder, which combine.py does not read
+    successful_file = os.path.join(RAW_DATA_DIRECTORY, f"{source}.ndjson")
+    output_directory = os.path.join(RAW_DATA_DIRECTORY, 'VisitNSW_Details')
+    failed_file = os.path.join(output_directory, 'VisitNSW_Failed_Events.ndjson')
+
+    selectors = Selectors(date='span.event-date', location='span.event-location')
+
+    def load_events(self):
+        """Returns the Phase 1 events (from the newer of its .json and .ndjson files)."""
+        input_stem = os.path.join(RAW_DATA_DIRECTORY, VisitNSWExtractor.source)
+        input_file = next((path for path in find_source_files(RAW_DATA_DIRECTORY)
+                           if os.path.splitext(path)[0] == input_stem), None)
+        if input_file is None:
+            self.log(f"File not found: {input_stem}.json")
+            return []
+        return list(iter_records(input_file))
+
+    def load_completed_links(self, events):
+        """
+        Rebuilds the successful file from the current Phase 1 events, so it only holds
+        events Phase 1 still lists: each one already scraped by a previous (possibly
+        interrupted) run keeps its scraped date and location, and takes its other
+        fields from Phase 1.
+        Parameters:
+            events (list): The Phase 1 events.
+        Returns:
+            set: The links whose details are already scraped.
+        """
+        if not os.path.exists(self.successful_file):
+            return set()
+        details = {record.get('link'): record for record in iter_records(self.successful_file)}
+        completed = {}
+        for event in events:
+            link = event.get('link')
+            if link in details and link not in completed:
+                completed[link] = dict(event, date=details[link].get('date'), location=details[link].get('location'))
+
+        # Written next to the failures first, so an interrupted rewrite never loses the scraped details
+        os.makedirs(self.output_directory, exist_ok=True)
+        temporary_path = os.path.join(self.output_directory, f"{self.source}.{os.getpid()}.tmp")
+        with NDJSONWriter(temporary_path) as writer:
+            writer.write(completed.values())
+        os.replace(temporary_path, self.successful_file)
+        if len(details) > len(completed):
+            self.log(f"Dropped the details of {len(details) - len(completed)} events Phase 1 no longer lists")
+        return set(completed)
+
+    async def scrape_event(self, session, event, successful, failed):
+        """
+        Renders one event's detail page and writes the event with its date and location.
+        Returns:
+            bool: True if the page was rendered and ready (the event went to the successful file).
+        """
+        self.log(f"Scraping event details from {event['link']}")
+        page = await self.get(session, event['link'])
+        # A status still failing after the retries (429, 5xx) or a page whose date never appeared
+        # (the readiness selector, also checked on replayed pages) is a failure, not a "TBD" event
+        root = self.selectors.parse(page.text) if not page.error and page.status_code == 200 else None
+        date_tag = self.selectors.first('date', root) if root is not None else None
+        if date_tag is None:
+            if page.error:
+                error, reason = page.error, 'render_error'
+            elif page.status_code != 200:
+                error, reason = f"status code {page.status_code}", 'http_status'
+            else:
+                error, reason = f"{self.wait_for} never appeared", 'not_ready'
+            self.log(f"Error while scraping details for event {event['title']}: {error}")
+            event['date'] = 'Failed to Scrape'
+            event['location'] = 'Failed to Scrape'
+            failed.write([event])
+            metrics.count('records_dropped_total', source=self.source, reason=reason)
+            return False
+
+        location_tag = self.selectors.first('location', root)
+        event['date'] = self.selectors.text(date_tag).strip()
+        event['location'] = self.selectors.text(location_tag).strip() if location_tag is not None else "TBD"
+        successful.write([event])
+        metrics.count('records_emitted_total', source=self.source)
+        return True
+
+    async def run(self, session, incremental=False, ndjson=False):
+        # Skip events whose details were already scraped by an earlier run
+        events = self.load_events()
+        completed_links = self.load_completed_links(events)
+        events = [event for event in events
+                  if event.get('link') not in completed_links and event.get('link') not in (None, "N/A")]
+        if not events:
+            self.log("No events to process.")
+            return 0
+
+        # Successes are appended to the rebuilt file; failures are retried on every run.
+        # A fixed number of workers take the events in turn, so at most
+        # max_concurrent_details pages are in flight and each is logged when it starts
+        pending = iter(events)
+
+        async def worker(successful, failed):
+            scraped = 0
+            for event in pending:
+                scraped += await self.scrape_event(session, event, successful, failed)
+            return scraped
+
+        os.makedirs(self.output_directory, exist_ok=True)
+        with NDJSONWriter(self.successful_file, mode='a') as successful, NDJSONWriter(self.failed_file) as failed:
+            scraped = await asyncio.gather(*(worker(successful, failed)
+                                             for _ in range(min(self.max_concurrent_details, len(events)))))
+
+        self.log(f"Successfully scraped events saved to {self.successful_file}")
+        self.log(f"Failed events saved to {self.failed_file}")
+        return sum(scraped)
@@ -0,0 +1,175 @@
+"""
+Columnar (Parquet) storage for events, the compact alternative to the JSON
+files passed between combine, clean and load (see `--parquet` in combine.py).
+
+Each CORE_FIELD of the event schema (see events.py) is one column, and the
+extras are one JSON-encoded string column, so:
+    - files are zstd-compressed per column and far smaller than indented JSON,
+    - a reader asks only for the columns it needs (e.g. the loader skips the
+      dates and provenance columns), and the file is memory-mapped,
+    - analytics tools (pandas, DuckDB, Arrow) can query the files directly.
+
+pyarrow is only needed when Parquet files are actually read or written.
+
+Usage:
+    write_events('SQL/combined_data.parquet', events)
+    for event in read_events('SQL/combined_data.parquet', columns=storage_columns(['title', 'features'])):
+        ...
+"""
+import json
+
+from events import CORE_FIELDS, Event
+
+# Compression codec for every column
+COMPRESSION = 'zstd'
+
+# Events per row group (the unit a reader loads at a time)
+ROW_GROUP_SIZE = 10000
+
+# Core fields that are not plain strings
+LIST_FIELDS = ('sources',)
+INTEGER_FIELDS = ('duplicate_count',)
+
+# Every column of an events file, in order
+COLUMNS = CORE_FIELDS + ('extras',)
+
+
+def arrow_schema():
+    """Returns the Arrow schema of an events file."""
+    # Imported here so the JSON pipeline works without pyarrow installed
+    import pyarrow as pa
+
+    fields = []
+    for field in CORE_FIELDS:
+        if field in LIST_FIELDS:
+            fields.append(pa.field(field, pa.list_(pa.string())))
+        elif field in INTEGER_FIELDS:
+            fields.append(pa.field(field, pa.int64()))
+        else:
+            fields.append(pa.field(field, pa.string()))
+    fields.append(pa.field('extras', pa.string()))
+    return pa.schema(fields)
+
+
+def storage_columns(fields):
+    """
+    Returns the columns to read for the given fields (extras are all in the 'extras' column).
+    Parameters:
+        fields (iterable): Core field or extra names.
+    Returns:
+        list: Column names, without duplicates.
+    """
+    columns = [field if field in CORE_FIELDS else 'extras' for field in fields]
+    return list(dict.fromkeys(columns))
+
+
+def _string(value):
+    # Scrapers occasionally put a number or a list in a text field; the column stays text
+    return value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _to_batch(events, schema):
+    import pyarrow as pa
+
+    columns = {}
+    for field in CORE_FIELDS:
+        values = [getattr(event, field) for event in events]
+        if field not in LIST_FIELDS and field not in INTEGER_FIELDS:
+            values = [_string(value) for value in values]
+        columns[field] = values
+    columns['extras'] = [json.dumps(event.extras, ensure_ascii=False) if event.extras else None for event in events]
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def write_events(path, events, row_group_size=ROW_GROUP_SIZE):
+    """
+    Writes events to a Parquet file, one row group at a time, so the events can
+    come from a generator and are never all held in memory.
+    Parameters:
+        path (str): The file to write.
+        events (iterable): Event objects.
+        row_group_size (int): Events per row group.
+    Returns:
+        int: The number of events written.
+    """
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    written = 0
+    with pq.ParquetWriter(path, schema, compression=COMPRESSION) as writer:
+        batch = []
+        for event in events:
+            batch.append(event)
+            if len(batch) >= row_group_size:
+                writer.write_batch(_to_batch(batch, schema))
+                written += len(batch)
+                batch = []
+        if batch or not written:
+            # An empty file still gets the schema (and one empty row group)
+            writer.write_batch(_to_batch(batch, schema))
+            written += len(batch)
+    return written
+
+
+def concatenate_files(path, part_paths):
+    """
+    Concatenates Parquet files of events into one, copying their record batches
+    without decoding them into events.
+    Parameters:
+        path (str): The file to write.
+        part_paths (list): Files written by write_events, in order.
+    """
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    with pq.ParquetWriter(path, schema, compression=COMPRESSION) as writer:
+        for part_path in part_paths:
+            for batch in pq.ParquetFile(part_path, memory_map=True).iter_batches(batch_size=ROW_GROUP_SIZE):
+                writer.write_batch(batch)
+        if not part_paths:
+            writer.write_batch(_to_batch([], schema))
+
+
+def _decode_columns(data, num_rows):
+    """Returns a batch's columns (a to_pydict() result) as lists in COLUMNS order, with the extras decoded."""
+    missing = [None] * num_rows
+    columns = [data.get(field, missing) for field in CORE_FIELDS]
+    columns.append([json.loads(extras) if extras else None for extras in data.get('extras', missing)])
+    return columns
+
+
+def read_columns(path, columns=None):
+    """
+    Reads whole columns of a Parquet file of events, without building Event objects.
+    Parameters:
+        path (str): The file to read (memory-mapped).
+        columns (list): Columns to read (see storage_columns); defaults to all of them.
+    Returns:
+        dict: {column: list of values} for the columns read (extras decoded into dicts).
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    data = {name: table.column(name).to_pylist() for name in table.column_names}
+    if 'extras' in data:
+        data['extras'] = [json.loads(extras) if extras else None for extras in data['extras']]
+    return data
+
+
+def read_events(path, columns=None):
+    """
+    Yields the events of a Parquet file, reading only the given columns.
+    Parameters:
+        path (str): The file to read (memory-mapped).
+        columns (list): Columns to read (see storage_columns); defaults to all of them.
+            Fields that are not read are None.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    available = set(parquet_file.schema_arrow.names)
+    columns = [column for column in (columns or COLUMNS) if column in available]
+    for batch in parquet_file.iter_batches(columns=columns):
+        # The Event constructor takes the columns in COLUMNS order
+        for values in zip(*_decode_columns(batch.to_pydict(), batch.num_rows)):
+            yield Event(*values)
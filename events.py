@@ -0,0 +1,141 @@
+"""
+The event record shared by every stage after scraping (combine, clean, load).
+
+Scrapers emit plain dicts whose keys differ by source, and a table built from
+them has a column for every key any source uses, mostly empty. An Event
+instead keeps a fixed set of core fields in __slots__ and puts everything
+source-specific (features, amenities, price, distance, ...) in one `extras`
+dict that only holds the values the record actually has.
+
+The schema below is the single description of an event: the cleaner builds
+its table from CORE_FIELDS and validates REQUIRED_FIELDS, and the loader
+builds its rows from EVENT_COLUMNS and upserts on NATURAL_KEY, which the
+search index and the read API also identify events by (Event.key).
+
+Encoded records (Event.to_dict) hold only the fields that are set:
+    {"title": ..., "location": ..., "source": ..., "extras": {"price": "Free"}}
+Event.from_dict reads both that form and the flat dicts the scrapers write.
+"""
+
+# Fields every event has (None when its source does not provide them)
+CORE_FIELDS = (
+    'title', 'location', 'description', 'link',
+    'date', 'date_range', 'date_start', 'date_end',
+    # Provenance: the source file the record came from, and after cleaning, every
+    # source the event was found in and the number of records merged into it
+    'source', 'sources', 'duplicate_count',
+)
+
+# Fields an event must have to be kept by the cleaner
+REQUIRED_FIELDS = ('title', 'location')
+
+# Columns of the events table, in insert order (read from the core fields or the extras)
+EVENT_COLUMNS = ('title', 'location', 'description', 'features', 'date_range', 'date_start', 'link')
+
+# Natural key of an event: reloading a row with the same key updates it instead of adding a copy.
+# Title and link alone are not unique: a source without links lists one event per session
+# (same title, different dates) or per venue (same title, different locations)
+NATURAL_KEY = ('title', 'link', 'location', 'date_start')
+
+_CORE = frozenset(CORE_FIELDS + ('extras',))
+
+# Each table column, and whether it is a core field (otherwise it is read from the extras)
+_ROW_FIELDS = tuple((column, column in CORE_FIELDS) for column in EVENT_COLUMNS)
+
+
+class Event:
+    """
+    One event: the CORE_FIELDS as attributes, plus an `extras` dict (None if empty).
+    The constructor takes the CORE_FIELDS in order and then the extras, so an event
+    can be built straight from a row of column values.
+    """
+    __slots__ = CORE_FIELDS + ('extras',)
+
+    def __init__(self, title=None, location=None, description=None, link=None,
+                 date=None, date_range=None, date_start=None, date_end=None,
+                 source=None, sources=None, duplicate_count=None, extras=None):
+        self.title = title
+        self.location = location
+        self.description = description
+        self.link = link
+        self.date = date
+        self.date_range = date_range
+        self.date_start = date_start
+        self.date_end = date_end
+        self.source = source
+        self.sources = sources
+        self.duplicate_count = duplicate_count
+        self.extras = extras or None
+
+    @classmethod
+    def from_dict(cls, record, source=None):
+        """
+        Decodes a scraped or encoded record.
+        Parameters:
+            record (dict): Core fields at the top level; any other key (or the keys of a
+                nested 'extras' dict) becomes an extra. None values are dropped from the extras.
+            source (str): Overrides the record's source.
+        Returns:
+            Event: The event.
+        """
+        event = cls.__new__(cls)
+        get = record.get
+        for field in CORE_FIELDS:
+            setattr(event, field, get(field))
+        extras = {key: value for key, value in record.items() if key not in _CORE and value is not None}
+        nested = get('extras')
+        if nested:
+            extras.update((key, value) for key, value in nested.items() if value is not None)
+        event.extras = extras or None
+        if source is not None:
+            event.source = source
+        return event
+
+    def to_dict(self):
+        """Encodes the event as a dict holding only the fields that are set (see the module docstring)."""
+        record = {}
+        for field in CORE_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                record[field] = value
+        if self.extras:
+            record['extras'] = self.extras
+        return record
+
+    def get(self, name, default=None):
+        """Returns a core field or an extra by name, or `default` if it is not set."""
+        value = getattr(self, name, None) if name in _CORE else (self.extras or {}).get(name)
+        return default if value is None else value
+
+    def key(self):
+        """Returns the natural key: the NATURAL_KEY values, with missing ones as '' (as in to_row)."""
+        return tuple('' if getattr(self, field) is None else getattr(self, field) for field in NATURAL_KEY)
+
+    def to_row(self):
+        """
+        Converts the event into a row of the events table.
+        Returns:
+            tuple: The values of EVENT_COLUMNS, with list fields (features) joined by
+                commas and missing natural key values stored as ''.
+        """
+        row = []
+        for column, is_core in _ROW_FIELDS:
+            value = getattr(self, column) if is_core else (self.extras or {}).get(column)
+            if column == 'features':
+                # A single feature may be a plain string; anything else that is not a list is dropped
+                if not isinstance(value, list):
+                    value = [value] if isinstance(value, str) else []
+                value = ', '.join(value)
+            elif value is None and column in NATURAL_KEY:
+                # NULL would never match in the upsert, so a missing key value is stored as ''
+                value = ''
+            row.append(value)
+        return tuple(row)
+
+    def __eq__(self, other):
+        if not isinstance(other, Event):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f"Event({self.to_dict()!r})"
@@ -1,53 +1,248 @@
-import requests
-from bs4 import BeautifulSoup
+"""
+Runs the whole Woofya pipeline with one command:
+
+    scrape   All scrapers run at the same time in one process (Scrapers/scrape.py),
+             sharing one connection pool, browser and HTTP cache. Each source
+             has its own timeout and errors are caught per source, so one slow or
+             broken source cannot hold up or break the others. A source that reads
+             another's output (visitNSW_Phase2) starts as soon as that source finishes.
+    combine  Cleaner/combine.py, once every scraper has finished.
+    clean    Cleaner/cleaner.py, if combine succeeded (with --incremental, only the
+             records that changed since its last incremental run are cleaned).
+    load     SQL/insert_events.py, if clean succeeded.
+
+Usage:
+    python main.py                          Full refresh
+    python main.py --only Humantix,pupsy    Re-run just these sources, then combine/clean/load
+    python main.py --retry-failed           Re-run the sources that failed last time
+    python main.py --incremental --ndjson   Passed on to the scrapers (--incremental also to clean,
+                                            --ndjson to combine)
+    python main.py --parquet                Pass combined and cleaned data as Parquet (see columnar.py)
+    python main.py --sqlite                 Load into SQL/events.db instead of SQL Server
+    python main.py --no-load                Stop after cleaning
+    python main.py --replay [time]          Re-extract archived pages instead of scraping
+                                            (see Scrapers/archive.py), then combine/clean/load
+
+Every line a stage prints is shown prefixed with its name, and a wall-clock
+report per source and per stage is printed at the end. The status of each
+source is saved to Cache/pipeline/last_run.json for --retry-failed.
+
+Each source and stage writes its metrics (pages, bytes, cache hits, latencies,
+records emitted and dropped, rows/sec) to Cache/metrics/<name>.json and .prom;
+the run's metrics are merged into Cache/metrics/pipeline.json (see metrics.py).
+"""
+import os
+import sys
 import json
+import time
+import signal
+import asyncio
+from collections import namedtuple
+
+import metrics
+from Scrapers.sources import SCRAPERS
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Flags passed on to the scrapers
+SCRAPER_FLAGS = ('--incremental', '--ndjson')
+
+# Seconds the scrape process may run before it is killed. Each source is cancelled after
+# its own timeout (see Scrapers/framework.py); this only catches a hung process, and
+# allows for visitNSW (600s) followed by visitNSW_Phase2 (1800s)
+SCRAPE_TIMEOUT = 2700
+
+# Seconds each downstream stage may run
+STAGE_TIMEOUT = 1800
+
+# Status of the last run, used by --retry-failed
+STATUS_FILE = os.path.join(PROJECT_ROOT, 'Cache', 'pipeline', 'last_run.json')
+
+# Outcome of each source in the scrape process, written by Scrapers/scrape.py
+SCRAPE_RESULTS_FILE = os.path.join(PROJECT_ROOT, 'Cache', 'pipeline', 'scrape_results.json')
+
+# Outcome of one script: returncode is None if it timed out
+StepResult = namedtuple('StepResult', ['name', 'returncode', 'seconds', 'error'])
+
+async def _relay_output(name, stream):
+    """Prints a child's output line by line, prefixed with its name."""
+    async for line in stream:
+        print(f"[{name}] {line.decode('utf-8', errors='replace').rstrip()}", flush=True)
+
+async def run_script(name, script, args=(), timeout=STAGE_TIMEOUT):
+    """
+    Runs one script in its own process.
+    Parameters:
+        name (str): Name shown in the output and report.
+        script (str): Script path relative to the project root.
+        args (iterable): Command-line arguments for the script.
+        timeout (float): Seconds before the process (and anything it started,
+            such as a headless browser) is killed.
+    Returns:
+        StepResult: The exit code, wall-clock seconds and error (if any).
+    """
+    start_time = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-u', os.path.join(PROJECT_ROOT, script), *args,
+        cwd=PROJECT_ROOT, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        # The script's metrics are written under the same name as in the report
+        env=dict(os.environ, WOOFYA_METRICS_STAGE=name),
+        # Own process group, so a timeout also kills the browsers a scraper launched
+        start_new_session=hasattr(os, 'killpg'))
+    relay = asyncio.ensure_future(_relay_output(name, process.stdout))
 
-# URL of the page to scrape
-url = "https://humanitix.com/au/search?query=dogs&page=0"
+    try:
+        returncode = await asyncio.wait_for(process.wait(), timeout)
+        error = None if returncode == 0 else f"exited with code {returncode}"
+    except asyncio.TimeoutError:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+        await process.wait()
+        returncode, error = None, f"timed out after {timeout}s"
+    await relay
 
-# Send a GET request to fetch the HTML content of the page
-response = requests.get(url)
+    return StepResult(name, returncode, time.perf_counter() - start_time, error)
 
-# Check if the request was successful (status code 200)
-if response.status_code == 200:
-    # Parse the HTML content using BeautifulSoup
-    soup = BeautifulSoup(response.text, 'html.parser')
+async def run_scrapers(sources, scraper_args):
+    """
+    Runs the given sources in one scrape process (see Scrapers/scrape.py).
+    Parameters:
+        sources (list): Source names (keys of SCRAPERS).
+        scraper_args (list): Flags passed to the scrapers.
+    Returns:
+        tuple: (StepResult of the scrape process, list of one StepResult per source in
+            the order given). Sources with no recorded outcome (e.g. the process was
+            killed) get the process's error.
+    """
+    if not sources:
+        return StepResult('scrape', 0, 0.0, None), []
+    if os.path.exists(SCRAPE_RESULTS_FILE):
+        os.remove(SCRAPE_RESULTS_FILE)
+    process_result = await run_script('scrape', 'Scrapers/scrape.py',
+                                      ['--only', ','.join(sources), *scraper_args, '--results', SCRAPE_RESULTS_FILE],
+                                      SCRAPE_TIMEOUT)
 
-    # List to store the event data
-    events_list = []
+    outcomes = {}
+    if os.path.exists(SCRAPE_RESULTS_FILE):
+        with open(SCRAPE_RESULTS_FILE, 'r', encoding='utf-8') as f:
+            outcomes = json.load(f)
+    source_results = []
+    for name in sources:
+        outcome = outcomes.get(name)
+        if outcome is None:
+            source_results.append(StepResult(name, None, process_result.seconds,
+                                             process_result.error or "no result recorded"))
+        else:
+            source_results.append(StepResult(name, 0 if outcome['error'] is None else 1,
+                                             outcome['seconds'], outcome['error']))
+    return process_result, source_results
 
-    # Find all event blocks
-    events = soup.find_all('a', class_='sc-eb5cf798-0')
+def load_failed_sources():
+    """Returns the sources that failed in the last run (empty if there is no record of one)."""
+    if not os.path.exists(STATUS_FILE):
+        return []
+    with open(STATUS_FILE, 'r', encoding='utf-8') as f:
+        return [name for name, status in json.load(f).items() if status != 'ok']
 
-    for event in events:
-        try:
-            # Extract the title
-            title = event.find('h6').text.strip()
+def save_source_status(results):
+    """Records the outcome of each source, keeping earlier results for sources that were not run."""
+    status = {}
+    if os.path.exists(STATUS_FILE):
+        with open(STATUS_FILE, 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    status.update({result.name: result.error or 'ok' for result in results})
+    os.makedirs(os.path.dirname(STATUS_FILE), exist_ok=True)
+    with open(STATUS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(status, f, indent=4)
 
-            # Extract the description (date and time)
-            description = event.find('p', class_='sc-8821f522-0').text.strip()
+def print_report(source_results, stage_times):
+    """Prints the wall-clock time and outcome of every source and stage."""
+    print("\nSources:")
+    for result in source_results:
+        print(f"  {result.name:<16} {result.seconds:8.1f}s  {result.error or 'ok'}")
+    print("Stages:")
+    for stage, (seconds, error) in stage_times.items():
+        print(f"  {stage:<16} {seconds:8.1f}s  {error or 'ok'}")
+    print(f"Total: {sum(seconds for seconds, _ in stage_times.values()):.1f}s")
 
-            # Extract the location
-            location = event.find_all('p', class_='sc-8821f522-0')[1].text.strip()
+async def run_pipeline(sources, scraper_args, ndjson=False, parquet=False, sqlite=False, load=True):
+    """
+    Runs the scrape, combine, clean and load stages.
+    Parameters:
+        sources (list): Sources to scrape (an empty list skips straight to combine).
+        scraper_args (list): Flags passed to the scrapers.
+        ndjson (bool): Have combine write NDJSON.
+        parquet (bool): Have combine write Parquet (clean and load then read and write Parquet).
+        sqlite (bool): Load into the local SQLite database instead of SQL Server.
+        load (bool): Run the load stage.
+    Returns:
+        bool: True if every source and stage succeeded.
+    """
+    stage_times = {}
+    started_at = time.time()
 
-            # Store the event data in a dictionary
-            event_data = {
-                'title': title,
-                'description': description,
-                'location': location
-            }
+    # Stage 1: all sources at once; a failed source keeps its previous output for the later stages
+    start_time = time.perf_counter()
+    scrape_result, source_results = await run_scrapers(sources, scraper_args)
+    save_source_status(source_results)
+    failed_sources = [result.name for result in source_results if result.error]
+    stage_times['scrape'] = (time.perf_counter() - start_time,
+                             f"{len(failed_sources)} failed: {', '.join(failed_sources)}" if failed_sources else None)
 
-            # Append the event data to the list
-            events_list.append(event_data)
+    # Stages 2-4 depend on each other: stop at the first one that fails
+    combine_args = ['--parquet'] if parquet else ['--ndjson'] if ndjson else []
+    clean_args = ['--incremental'] if '--incremental' in scraper_args else []
+    downstream = [('combine', 'Cleaner/combine.py', combine_args),
+                  ('clean', 'Cleaner/cleaner.py', clean_args)]
+    if load:
+        downstream.append(('load', 'SQL/insert_events.py', ['--sqlite'] if sqlite else []))
+    for stage, script, args in downstream:
+        result = await run_script(stage, script, args, STAGE_TIMEOUT)
+        stage_times[stage] = (result.seconds, result.error)
+        if result.error:
+            print(f"{stage} failed ({result.error}); skipping the remaining stages.")
+            break
 
-        except Exception as e:
-            print(f"Error while parsing event: {e}")
+    print_report(source_results, stage_times)
+    stage_results = {result.name: result.error for result in source_results}
+    stage_results['scrape'] = scrape_result.error
+    stage_results.update((stage, error) for stage, (_, error) in stage_times.items() if stage != 'scrape')
+    print(f"Metrics written to {metrics.write_pipeline_report(stage_results, started_at)}")
+    return not failed_sources and all(error is None for _, error in stage_times.values())
 
-    # Save the event data to a JSON file
-    with open('events.json', 'w') as f:
-        json.dump(events_list, f, indent=4)
+def parse_sources(argv):
+    """Returns the sources selected on the command line (all of them by default)."""
+    if '--retry-failed' in argv:
+        return load_failed_sources()
+    if '--only' in argv:
+        index = argv.index('--only')
+        selected = argv[index + 1].split(',') if index + 1 < len(argv) else []
+        unknown = [name for name in selected if name not in SCRAPERS]
+        if unknown:
+            raise SystemExit(f"Unknown source(s): {', '.join(unknown)}. Choose from: {', '.join(SCRAPERS)}")
+        return selected
+    return list(SCRAPERS)
 
-    print("Events data saved to events.json")
+def replay_args(argv):
+    """Returns --replay and its time (if one is given), to pass on to the scrapers."""
+    if '--replay' not in argv:
+        return []
+    index = argv.index('--replay')
+    if index + 1 < len(argv) and not argv[index + 1].startswith('--'):
+        return argv[index:index + 2]
+    return ['--replay']
 
-else:
-    print(f"Failed to retrieve the webpage. Status code: {response.status_code}")
+if __name__ == '__main__':
+    sources = parse_sources(sys.argv)
+    print(f"Scraping: {', '.join(sources) if sources else 'nothing'}")
+    succeeded = asyncio.run(run_pipeline(
+        sources,
+        scraper_args=[flag for flag in SCRAPER_FLAGS if flag in sys.argv] + replay_args(sys.argv),
+        ndjson='--ndjson' in sys.argv,
+        parquet='--parquet' in sys.argv,
+        sqlite='--sqlite' in sys.argv,
+        load='--no-load' not in sys.argv,
+    ))
+    sys.exit(0 if succeeded else 1)
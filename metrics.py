@@ -0,0 +1,285 @@
+"""
+Structured metrics for every stage of the pipeline (scrapers, combine, clean, load).
+
+Each process keeps one in-memory registry of counters, timings and gauges.
+When the process exits, the registry is written to the metrics directory
+(Cache/metrics/ unless WOOFYA_METRICS_DIR is set) as:
+    <stage>.json   Every metric with its labels, plus when the stage ran
+    <stage>.prom   The same metrics in the Prometheus text format, for
+                   node_exporter's textfile collector
+The stage name is taken from WOOFYA_METRICS_STAGE (set by main.py for each
+stage it runs) or else from the script's file name. main.py merges the stage
+files of a run into pipeline.json and pipeline.prom (see write_pipeline_report).
+
+Usage:
+    import metrics
+    metrics.count('pages_fetched_total', host=host, status=200)
+    metrics.observe('fetch_seconds', elapsed, host=host)
+    with metrics.timed('clean_step_seconds', step='dedup'):
+        ...
+"""
+import os
+import sys
+import json
+import time
+import atexit
+from contextlib import contextmanager
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Where stage metrics are written, and the environment variables that override it and the stage name
+METRICS_DIR = os.environ.get('WOOFYA_METRICS_DIR') or os.path.join(PROJECT_ROOT, 'Cache', 'metrics')
+STAGE = os.environ.get('WOOFYA_METRICS_STAGE') or os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+
+# Prefix of every metric in the Prometheus output
+PREFIX = 'woofya_'
+
+# Description of each metric, used for the Prometheus HELP lines
+METRIC_HELP = {
+    'pages_fetched_total': "Pages requested over HTTP or rendered in the browser, by final status.",
+    'bytes_received_total': "Bytes of page bodies received (excluding cache hits).",
+    'cache_hits_total': "Pages served from the HTTP cache, fresh or revalidated with a 304.",
+    'request_retries_total': "Requests retried after a throttled response or a failed connection.",
+    'request_errors_total': "Requests that still failed after every attempt.",
+    'fetch_seconds': "Time taken by each HTTP request, including retries.",
+    'render_seconds': "Time taken to render each page in the browser, including retries.",
+    'parse_seconds': "Time taken to extract the records from each page.",
+    'archive_pages_total': "Pages added to the page archive, by whether their body was new or already stored.",
+    'archive_bytes_written_total': "Compressed bytes of new page bodies written to the page archive.",
+    'replay_pages_total': "Pages requested from the page archive by a replay, by whether they were found.",
+    'records_extracted_total': "Records extracted from pages.",
+    'records_dropped_total': "Records dropped, by reason.",
+    'records_emitted_total': "Records written to the stage's output.",
+    'combine_source_seconds': "Time taken to combine each source file.",
+    'source_errors_total': "Source files skipped by combine because they could not be read.",
+    'clean_step_seconds': "Time taken by each cleaning step.",
+    'clean_records_new_total': "Records cleaned by an incremental clean because they were new or changed.",
+    'clean_records_removed_total': "Records removed from the cleaned data by an incremental clean (deleted or changed).",
+    'clean_events_rebuilt_total': "Merged events rebuilt by an incremental clean.",
+    'clean_locations_total': "Records cleaned, by how precisely their location was resolved (suburb, region, state or unresolved).",
+    'rows_loaded_total': "Rows upserted into the events table.",
+    'load_key_collisions_total': "Rows of a load replaced by a later row with the same natural key.",
+    'load_commit_seconds': "Time taken by each database commit.",
+    'load_rows_per_second': "Rows loaded per second over the whole load.",
+    'search_index_seconds': "Time taken to update the full-text search index after a load.",
+    'search_documents_total': "Documents handled by a search index update, by whether they were added, updated, unchanged or removed.",
+    'stage_duration_seconds': "Wall-clock duration of the stage's process.",
+    'stage_last_run_timestamp_seconds': "Unix time at which the stage finished.",
+    'stage_success': "1 if the stage succeeded in the last pipeline run, 0 if it failed.",
+    'pipeline_duration_seconds': "Wall-clock duration of the last pipeline run.",
+    'pipeline_last_run_timestamp_seconds': "Unix time at which the last pipeline run finished.",
+}
+
+
+class Metrics:
+    """In-memory registry of counters, timing summaries and gauges, keyed by name and labels."""
+
+    def __init__(self, stage=STAGE):
+        self.stage = stage
+        self.enabled = True
+        self.started_at = time.time()
+        self.start_time = time.perf_counter()
+        self.counters = {}
+        self.summaries = {}
+        self.gauges = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def count(self, name, value=1, **labels):
+        """Adds `value` to a counter."""
+        key = self.key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Records one timing (count, sum and max are kept)."""
+        key = self.key(name, labels)
+        summary = self.summaries.get(key)
+        if summary is None:
+            self.summaries[key] = [1, seconds, seconds]
+        else:
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+
+    def set_gauge(self, name, value, **labels):
+        """Sets a gauge to `value`."""
+        self.gauges[self.key(name, labels)] = value
+
+    def to_dict(self):
+        """Returns the registry as a JSON-serializable dict."""
+        return {
+            'stage': self.stage,
+            'started_at': self.started_at,
+            'finished_at': time.time(),
+            'counters': [dict(name=name, labels=dict(labels), value=value)
+                         for (name, labels), value in sorted(self.counters.items())],
+            'summaries': [dict(name=name, labels=dict(labels), count=count, sum=total, max=maximum)
+                          for (name, labels), (count, total, maximum) in sorted(self.summaries.items())],
+            'gauges': [dict(name=name, labels=dict(labels), value=value)
+                       for (name, labels), value in sorted(self.gauges.items())],
+        }
+
+
+def _escape(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _series(name, labels, extra=None):
+    """
+    Formats a metric name with its labels, e.g. woofya_fetch_seconds_sum{stage="pupsy",host="a"}.
+    Labels in `extra` override those in `labels`.
+    """
+    labels = dict(labels, **(extra or {}))
+    if not labels:
+        return PREFIX + name
+    return PREFIX + name + '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in labels.items()) + '}'
+
+
+def to_prometheus(reports):
+    """
+    Renders stage reports (see Metrics.to_dict) in the Prometheus text exposition format.
+    Parameters:
+        reports (list): Stage reports; each sample is labelled with its report's stage.
+    Returns:
+        str: The textfile contents.
+    """
+    # Group the samples of every report by metric, so each metric has one HELP/TYPE header
+    families = {}
+    for report in reports:
+        stage_label = {'stage': report['stage']}
+        for sample in report['counters']:
+            families.setdefault((sample['name'], 'counter'), []).append(
+                (_series(sample['name'], stage_label, sample['labels']), sample['value']))
+        for sample in report['summaries']:
+            labels = {**stage_label, **sample['labels']}
+            family = families.setdefault((sample['name'], 'summary'), [])
+            family.append((_series(sample['name'] + '_count', labels), sample['count']))
+            family.append((_series(sample['name'] + '_sum', labels), sample['sum']))
+            families.setdefault((sample['name'] + '_max', 'gauge'), []).append(
+                (_series(sample['name'] + '_max', labels), sample['max']))
+        for sample in report['gauges']:
+            families.setdefault((sample['name'], 'gauge'), []).append(
+                (_series(sample['name'], stage_label, sample['labels']), sample['value']))
+
+    lines = []
+    for (name, kind), samples in sorted(families.items()):
+        help_text = METRIC_HELP.get(name, '')
+        if name not in METRIC_HELP and name.endswith('_max'):
+            help_text = f"Longest single observation: {METRIC_HELP.get(name[:-len('_max')], '')}"
+        lines.append(f"# HELP {PREFIX}{name} {help_text}".rstrip())
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        lines.extend(f"{series} {value!r}" for series, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    """Writes a file via a temporary file and a rename, so readers never see it half written."""
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+
+
+def write_report(registry=None, directory=None):
+    """
+    Writes a registry's <stage>.json and <stage>.prom files.
+    Parameters:
+        registry (Metrics): Defaults to this process's registry.
+        directory (str): Defaults to METRICS_DIR.
+    Returns:
+        dict: The report written (None if the registry is disabled or empty).
+    """
+    registry = registry or _registry
+    directory = directory or METRICS_DIR
+    if not registry.enabled or not (registry.counters or registry.summaries or registry.gauges):
+        return None
+    registry.set_gauge('stage_duration_seconds', time.perf_counter() - registry.start_time)
+    registry.set_gauge('stage_last_run_timestamp_seconds', time.time())
+    report = registry.to_dict()
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, f"{registry.stage}.json"), json.dumps(report, indent=4))
+    _write_atomic(os.path.join(directory, f"{registry.stage}.prom"), to_prometheus([report]))
+    return report
+
+
+def load_reports(stages, since=0.0, directory=None):
+    """
+    Reads the stage reports written since a given time.
+    Parameters:
+        stages (iterable): Stage names.
+        since (float): Unix time; older reports (from earlier runs) are skipped.
+        directory (str): Defaults to METRICS_DIR.
+    Returns:
+        list: The reports found, in the order of `stages`.
+    """
+    directory = directory or METRICS_DIR
+    reports = []
+    for stage in stages:
+        try:
+            with open(os.path.join(directory, f"{stage}.json"), 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        if report.get('finished_at', 0) >= since:
+            reports.append(report)
+    return reports
+
+
+def write_pipeline_report(stage_results, started_at, directory=None):
+    """
+    Merges the reports of one pipeline run into pipeline.json, and writes the
+    run's own metrics (duration and success of each stage) to pipeline.prom.
+    Parameters:
+        stage_results (dict): {stage name: error message or None} for every stage run.
+        started_at (float): Unix time the run started.
+        directory (str): Defaults to METRICS_DIR.
+    Returns:
+        str: Path of pipeline.json.
+    """
+    directory = directory or METRICS_DIR
+    registry = Metrics(stage='pipeline')
+    finished_at = time.time()
+    for stage, error in stage_results.items():
+        registry.set_gauge('stage_success', 0 if error else 1, stage=stage)
+    registry.set_gauge('pipeline_duration_seconds', finished_at - started_at)
+    registry.set_gauge('pipeline_last_run_timestamp_seconds', finished_at)
+    pipeline = registry.to_dict()
+
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, 'pipeline.prom'), to_prometheus([pipeline]))
+    path = os.path.join(directory, 'pipeline.json')
+    _write_atomic(path, json.dumps({
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'stages': {stage: error or 'ok' for stage, error in stage_results.items()},
+        'metrics': pipeline,
+        'stage_metrics': load_reports(stage_results, since=started_at, directory=directory),
+    }, indent=4))
+    return path
+
+
+# This process's registry, written out when the process exits
+_registry = Metrics()
+atexit.register(write_report)
+
+count = _registry.count
+observe = _registry.observe
+set_gauge = _registry.set_gauge
+
+
+@contextmanager
+def timed(name, **labels):
+    """Records the time spent in a `with` block as one observation of `name`."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registry.observe(name, time.perf_counter() - start_time, **labels)
+
+
+def disable():
+    """Stops this process from writing a metrics report (e.g. for benchmarks)."""
+    _registry.enabled = False